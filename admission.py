@@ -0,0 +1,140 @@
+"""Admission control: per-stage concurrency limits with bounded, deadline-limited wait queues (load shedding)."""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from config import settings
+from resilience import remaining
+
+
+class Overloaded(Exception):
+    """A stage is saturated (wait queue full, or no slot within the queue deadline). Retry after retry_after_sec."""
+
+    def __init__(self, stage: str, reason: str, retry_after_sec: int) -> None:
+        super().__init__(f"{stage} saturated ({reason}); retry after {retry_after_sec}s")
+        self.stage = stage
+        self.reason = reason
+        self.retry_after_sec = retry_after_sec
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"stage": self.stage, "reason": self.reason, "retry_after_sec": self.retry_after_sec}
+
+
+class StageLimiter:
+    """
+    At most limit holders at once; up to max_queue callers wait (FIFO) for at most max_wait_sec (or what is left
+    of the request's budget), the rest are rejected immediately. limit <= 0 disables the stage's limit.
+    Event-loop only (no thread safety needed).
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_sec: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait_sec = max_wait_sec
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0}
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._service_ewma_sec = 0.0
+        self._waits_ms: deque[float] = deque(maxlen=512)
+
+    def _retry_after(self) -> int:
+        """Seconds until the queue ahead would likely drain: service time x (queued + 1) / limit, 1..60."""
+        drain = self._service_ewma_sec * (len(self._waiters) + 1) / max(self.limit, 1)
+        return min(max(math.ceil(drain), 1), 60)
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected[reason] += 1
+        return Overloaded(self.name, reason, self._retry_after())
+
+    async def _acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        stage = f"{self.name}_queue"
+        left = remaining(stage)
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout=self.max_wait_sec if left is None else min(self.max_wait_sec, left))
+        except asyncio.TimeoutError:
+            remaining(stage)  # raises DeadlineExceeded when the request's budget, not the queue limit, ran out
+            raise self._reject("queue_timeout") from None
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():  # slot was handed over just as we were cancelled
+                self._release()
+            raise
+        finally:
+            if not fut.done() or fut.cancelled():
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1  # handed straight to the next waiter, so newcomers cannot jump the queue
+                fut.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one slot for the body. Raises Overloaded instead of waiting past the queue limits."""
+        if self.limit <= 0:
+            yield
+            return
+        queued = time.perf_counter()
+        await self._acquire()
+        started = time.perf_counter()
+        self.admitted += 1
+        self._waits_ms.append((started - queued) * 1000)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._service_ewma_sec = elapsed if not self._service_ewma_sec else 0.8 * self._service_ewma_sec + 0.2 * elapsed
+            self._release()
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits_ms)
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_wait_sec": self.max_wait_sec,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected["queue_full"],
+            "rejected_queue_timeout": self.rejected["queue_timeout"],
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None,
+        }
+
+
+def _db_limit() -> int:
+    """ADMISSION_DB_CONCURRENCY, or the active pool's size + overflow (more would only wait on pool checkout)."""
+    if settings.admission_db_concurrency:
+        return settings.admission_db_concurrency
+    if settings.db_backend == "async":
+        return settings.async_db_pool_size + settings.async_db_max_overflow
+    return settings.db_pool_size + settings.db_max_overflow
+
+
+llm_limiter = StageLimiter(
+    "llm", settings.admission_llm_concurrency, settings.admission_llm_queue, settings.admission_llm_max_wait_sec
+)
+db_limiter = StageLimiter("db", _db_limit(), settings.admission_db_queue, settings.admission_db_max_wait_sec)
+
+
+def admission_stats() -> dict[str, Any]:
+    return {"llm": llm_limiter.stats(), "db": db_limiter.stats()}
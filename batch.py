@@ -0,0 +1,155 @@
+"""Batch execution: dedupe identical SQLRequests, merge single-location variants into one grouped query, split back."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from config import settings
+from schemas import SQLRequest, SQLResponse
+from sql_builder import build_sql
+
+Runner = Callable[[SQLRequest, str], Awaitable[SQLResponse]]
+
+
+@dataclass
+class BatchStats:
+    requests: int = 0
+    unique_requests: int = 0
+    merged_groups: int = 0
+    merge_fallbacks: int = 0
+    db_queries: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(self.__dict__)
+
+
+@dataclass
+class _MergeGroup:
+    """Unique requests that differ only in a single filters.location value."""
+    members: list[SQLRequest] = field(default_factory=list)
+
+
+def _request_key(req: SQLRequest) -> str:
+    return req.model_dump_json()
+
+
+def _merge_key(req: SQLRequest) -> str | None:
+    """Key with the location removed; None when the request is not mergeable."""
+    f = req.filters
+    if req.dataset != "gov_jobs" or not f or not f.location or len(f.location) != 1 or req.approx is not None:
+        return None  # approximate answers carry per-row intervals that a merged query would not split
+    return req.model_copy(update={"filters": f.model_copy(update={"location": None})}).model_dump_json()
+
+
+def _merged_request(members: list[SQLRequest]) -> tuple[SQLRequest, bool] | None:
+    """One request over all member locations, grouped by jurisdiction. Returns (request, jurisdiction_added)."""
+    first = members[0]
+    locations: list[str] = []
+    seen: set[str] = set()
+    for m in members:
+        loc = m.filters.location[0]
+        if loc.casefold() not in seen:
+            seen.add(loc.casefold())
+            locations.append(loc)
+    added = "jurisdiction" not in first.dimensions
+    dimensions = first.dimensions + ["jurisdiction"] if added else list(first.dimensions)
+    if len(dimensions) > settings.sql_max_group_by:
+        return None
+    merged = first.model_copy(
+        update={
+            "filters": first.filters.model_copy(update={"location": locations}),
+            "dimensions": dimensions,
+            "limit": settings.sql_max_limit,
+        }
+    )
+    return merged, added
+
+
+def _split(
+    member: SQLRequest,
+    merged: SQLResponse,
+    added: bool,
+    request_id: str,
+) -> SQLResponse:
+    """Rows of the merged result belonging to member's location, shaped like a direct run of member."""
+    loc = member.filters.location[0].casefold()
+    j = merged.columns.index("jurisdiction")
+    rows = [r for r in merged.rows if isinstance(r[j], str) and r[j].casefold() == loc]
+    columns = list(merged.columns)
+    if added:
+        columns.pop(j)
+        rows = [r[:j] + r[j + 1:] for r in rows]
+    if not rows and not member.dimensions:
+        # Ungrouped aggregates always return one row, even over zero matches.
+        rows = [[0 if m.agg == "count" else None for m in member.metrics]]
+    _, _, build_warnings = build_sql(member)
+    rows = rows[: min(member.limit, settings.sql_max_limit)]
+    return SQLResponse(
+        ok=True,
+        request_id=request_id,
+        query=merged.query,
+        params=merged.params,
+        columns=columns,
+        rows=rows,
+        row_count=len(rows),
+        elapsed_ms=merged.elapsed_ms,
+        warnings=build_warnings + [w for w in merged.warnings if w != "truncated_to_limit"] + ["merged_batch_query"],
+        fingerprint=merged.fingerprint,
+        cache_hit=merged.cache_hit,
+    )
+
+
+async def run_batch(
+    reqs: list[SQLRequest],
+    request_id: str,
+    run: Runner,
+) -> tuple[list[SQLResponse], BatchStats]:
+    """
+    Execute many requests with the fewest DB round trips.
+    Identical requests run once; single-location variants of the same request run as one grouped query
+    and fall back to individual runs if that query fails or hits the row cap.
+    """
+    stats = BatchStats(requests=len(reqs))
+    unique: dict[str, SQLRequest] = {}
+    for req in reqs:
+        unique.setdefault(_request_key(req), req)
+    stats.unique_requests = len(unique)
+
+    groups: dict[str, _MergeGroup] = {}
+    singles: list[SQLRequest] = []
+    for req in unique.values():
+        key = _merge_key(req)
+        if key is None:
+            singles.append(req)
+        else:
+            groups.setdefault(key, _MergeGroup()).members.append(req)
+
+    results: dict[str, SQLResponse] = {}
+    sem = asyncio.Semaphore(settings.batch_max_concurrency)
+
+    async def bounded(req: SQLRequest) -> SQLResponse:
+        stats.db_queries += 1
+        async with sem:
+            return await run(req, request_id)
+
+    async def run_one(req: SQLRequest) -> None:
+        results[_request_key(req)] = await bounded(req)
+
+    async def run_group(group: _MergeGroup) -> None:
+        planned = _merged_request(group.members) if len(group.members) > 1 else None
+        if planned is None:
+            await asyncio.gather(*(run_one(m) for m in group.members))
+            return
+        merged_req, added = planned
+        merged = await bounded(merged_req)
+        if not merged.ok or merged.row_count >= merged_req.limit:
+            stats.merge_fallbacks += 1
+            await asyncio.gather(*(run_one(m) for m in group.members))
+            return
+        stats.merged_groups += 1
+        for m in group.members:
+            results[_request_key(m)] = _split(m, merged, added, request_id)
+
+    await asyncio.gather(*(run_one(r) for r in singles), *(run_group(g) for g in groups.values()))
+    return [results[_request_key(r)] for r in reqs], stats
@@ -0,0 +1,285 @@
+"""
+End-to-end benchmark: replay a JSONL workload through the real /mcp/ endpoint in-process.
+
+LLM intent is replaced by a deterministic stub and MySQL by a SQLite copy of data/raw-data/*.csv,
+so runs are repeatable on a laptop or CI box. Usage:
+
+    python benchmark.py --workload bench/workload.jsonl --concurrency 1,8,32 --repeat 5 \\
+        --out bench_results.json [--baseline bench/baseline.json] [--save-baseline]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any
+
+# ---------------------------------------------------------------------------
+# Local database + deterministic intent stub
+# ---------------------------------------------------------------------------
+
+_TABLES = {
+    "job_descriptions": "jurisdiction TEXT, code TEXT, title TEXT, description TEXT",
+    "salaries": "id INTEGER, jurisdiction TEXT, job_code TEXT, grade TEXT, amount REAL",
+}
+
+
+def seed_sqlite(path: str, data_dir: str = "data/raw-data") -> None:
+    """Create job_descriptions / salaries in a SQLite file from the newest CSV exports."""
+    conn = sqlite3.connect(path)
+    try:
+        for table, columns in _TABLES.items():
+            files = sorted(glob.glob(os.path.join(data_dir, f"{table}_*.csv")))
+            if not files:
+                raise FileNotFoundError(f"no {table}_*.csv in {data_dir}")
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"CREATE TABLE {table} ({columns})")
+            with open(files[-1], newline="", encoding="utf-8") as fh:
+                reader = csv.reader(fh)
+                header = next(reader)
+                marks = ", ".join("?" for _ in header)
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(header)}) VALUES ({marks})",
+                    ([v if v != "" else None for v in row] for row in reader),
+                )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jd_key ON job_descriptions (jurisdiction, code)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sal_key ON salaries (jurisdiction, job_code)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def stub_request(question: str) -> dict[str, Any]:
+    """Deterministic question → SQLRequest dict (stands in for the LLM)."""
+    q = question.lower()
+    loc = re.search(r"\bin ([a-z][a-z ]*?)(?:[?.!,]|$| by | for )", q)
+    limit = re.search(r"\b(\d{1,3})\b", q)
+    agg = next((a for w, a in (("average", "avg"), ("avg", "avg"), ("max", "max"), ("min", "min"),
+                               ("total", "sum"), ("how many", "count")) if w in q), "avg")
+    dims = ["jurisdiction", "title"]
+    if "by grade" in q:
+        dims = ["jurisdiction", "grade"]
+    return {
+        "version": "v1",
+        "dataset": "gov_jobs",
+        "metrics": [{"name": "amount", "agg": agg}],
+        "dimensions": dims,
+        "filters": {"location": [loc.group(1).replace(" ", "")] if loc else None, "job_title_contains": None},
+        "limit": int(limit.group(1)) if limit else 10,
+        "order_by": [],
+    }
+
+
+def load_workload(path: str) -> list[dict[str, Any]]:
+    """JSONL records with "question" (or "title"), optional "sql_request" overriding the stub."""
+    out = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                rec = json.loads(line)
+                rec["question"] = rec.get("question") or rec.get("title") or ""
+                out.append(rec)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+def _pct(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))], 3)
+
+
+def _tool_result(body: str) -> dict[str, Any]:
+    """Extract the tool envelope from a JSON or SSE MCP response."""
+    for line in body.splitlines():
+        if line.startswith("data:"):
+            body = line[len("data:"):]
+    msg = json.loads(body)
+    if "error" in msg:
+        raise RuntimeError(msg["error"])
+    result = msg["result"]
+    if result.get("structuredContent"):
+        sc = result["structuredContent"]
+        return sc.get("result", sc)
+    return json.loads(result["content"][0]["text"])
+
+
+async def run_level(client: Any, workload: list[dict[str, Any]], concurrency: int, repeat: int) -> dict[str, Any]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {"intent": [], "sql": [], "overhead": []}
+    server_stages: dict[str, list[float]] = {}
+    errors = 0
+
+    async def call(rec: dict[str, Any]) -> None:
+        nonlocal errors
+        rid = f"bench-{uuid.uuid4().hex[:12]}"
+        body = {
+            "jsonrpc": "2.0",
+            "id": rid,
+            "method": "tools/call",
+            "params": {"name": "sql_agent", "arguments": {"question": rec["question"], "request_id": rid}},
+        }
+        async with sem:
+            t0 = time.perf_counter()
+            resp = await client.post("/mcp/", json=body, headers={"Accept": "application/json, text/event-stream"})
+            total = (time.perf_counter() - t0) * 1000
+        try:
+            env = _tool_result(resp.text)
+        except Exception:
+            errors += 1
+            return
+        if env.get("error") or not env["metadata"].get("ok", False):
+            errors += 1
+        latencies.append(total)
+        timings = env["metadata"].get("timings_ms", {})
+        intent = float(timings.get("intent", 0.0))
+        sql = float(env["metadata"].get("elapsed_ms", 0))
+        stages["intent"].append(intent)
+        stages["sql"].append(sql)
+        stages["overhead"].append(max(0.0, total - intent - sql))
+        for name, ms in timings.items():
+            server_stages.setdefault(name, []).append(float(ms))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(call(rec) for _ in range(repeat) for rec in workload))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": len(workload) * repeat,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": {"p50": _pct(latencies, 50), "p95": _pct(latencies, 95), "p99": _pct(latencies, 99)},
+        "stages_ms": {
+            name: {"mean": round(statistics.fmean(v), 3) if v else None, "p95": _pct(v, 95)}
+            for name, v in stages.items()
+        },
+        # Server-side per-stage breakdown from metadata.timings_ms (intent, build, checkout, execute, ...).
+        "server_stages_ms": {
+            name: {"mean": round(statistics.fmean(v), 3), "p95": _pct(v, 95)} for name, v in server_stages.items()
+        },
+    }
+
+
+async def run_benchmark(workload: list[dict[str, Any]], levels: list[int], repeat: int, llm_ms: float,
+                        warmup: bool) -> dict[str, Any]:
+    import httpx
+
+    import main
+    from schemas import SQLRequest
+
+    by_question = {r["question"]: r.get("sql_request") for r in workload}
+
+    async def stub(question: str, request_id: str | None = None, session_id: str | None = None) -> SQLRequest:
+        if llm_ms:
+            await asyncio.sleep(llm_ms / 1000)
+        return SQLRequest.model_validate(by_question.get(question) or stub_request(question))
+
+    main.question_to_sql_request_async = stub
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            if warmup:
+                await run_level(client, workload, 1, 1)
+            for c in levels:
+                results.append(await run_level(client, workload, c, repeat))
+    return {"levels": results, "repeat": repeat, "workload_size": len(workload), "llm_ms": llm_ms}
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Regressions vs baseline: latency percentiles up or throughput down by more than tolerance (fraction)."""
+    regressions = []
+    base_levels = {lvl["concurrency"]: lvl for lvl in baseline.get("levels", [])}
+    for lvl in current["levels"]:
+        base = base_levels.get(lvl["concurrency"])
+        if base is None:
+            continue
+        for p in ("p50", "p95", "p99"):
+            new, old = lvl["latency_ms"][p], base["latency_ms"][p]
+            if new is not None and old and new > old * (1 + tolerance):
+                regressions.append(f"c={lvl['concurrency']} {p}: {old} → {new} ms")
+        new_t, old_t = lvl["throughput_rps"], base["throughput_rps"]
+        if new_t is not None and old_t and new_t < old_t * (1 - tolerance):
+            regressions.append(f"c={lvl['concurrency']} throughput: {old_t} → {new_t} rps")
+    return regressions
+
+
+def _print(report: dict[str, Any]) -> None:
+    print(f"{'conc':>5} {'reqs':>6} {'err':>4} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'intent':>8} {'sql':>8} {'other':>8}")
+    for lvl in report["levels"]:
+        lat, st = lvl["latency_ms"], lvl["stages_ms"]
+        print(f"{lvl['concurrency']:>5} {lvl['requests']:>6} {lvl['errors']:>4} {lvl['throughput_rps']:>9} "
+              f"{lat['p50']:>9} {lat['p95']:>9} {lat['p99']:>9} "
+              f"{st['intent']['mean']:>8} {st['sql']['mean']:>8} {st['overhead']['mean']:>8}")
+
+
+def main_cli(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default="bench/workload.jsonl")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the workload per level")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="simulated LLM latency in the stub")
+    parser.add_argument("--data-dir", default="data/raw-data")
+    parser.add_argument("--no-cache", action="store_true", help="disable intent and result caches")
+    parser.add_argument("--no-fast-intent", action="store_true", help="send every question to the (stubbed) LLM")
+    parser.add_argument("--no-warmup", action="store_true")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression fraction")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time: configure the environment before importing the app.
+    db_path = os.path.join(tempfile.mkdtemp(prefix="mcp-bench-"), "gov_jobs.db")
+    seed_sqlite(db_path, args.data_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ.setdefault("OPENAI_API_KEY", "bench-stub")
+    if args.no_cache:
+        os.environ["INTENT_CACHE_ENABLED"] = "false"
+        os.environ["RESULT_CACHE_ENABLED"] = "false"
+    if args.no_fast_intent:
+        os.environ["FAST_INTENT_ENABLED"] = "false"
+
+    workload = load_workload(args.workload)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    report = asyncio.run(run_benchmark(workload, levels, args.repeat, args.llm_ms, not args.no_warmup))
+    report["config"] = {"db_backend": os.environ.get("DB_BACKEND", "sync"), "no_cache": args.no_cache,
+                        "fast_intent": not args.no_fast_intent}
+    _print(report)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
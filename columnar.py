@@ -0,0 +1,221 @@
+"""In-process columnar engine for gov_jobs (DB_BACKEND=local): raw CSVs → NumPy arrays → SQLRequest results, no MySQL."""
+from __future__ import annotations
+
+import csv
+import glob
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from config import settings
+from schemas import SQLRequest
+
+# job_descriptions columns carried into the join; salaries contributes id, job_code, grade, amount.
+_JD_COLUMNS = ["jurisdiction", "code", "title", "description"]
+
+
+@dataclass
+class DictColumn:
+    """Dictionary-encoded column: codes index into values (None = NULL)."""
+    codes: np.ndarray
+    values: list[Any]
+
+
+@dataclass
+class ColumnStore:
+    """gov_jobs join (job_descriptions ⋈ salaries), one array per column."""
+    n_rows: int
+    dims: dict[str, DictColumn] = field(default_factory=dict)
+    amount: np.ndarray = field(default_factory=lambda: np.empty(0))
+    sources: list[str] = field(default_factory=list)
+
+
+def _latest(pattern: str) -> str:
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"no CSV matches {pattern}")
+    return files[-1]  # exports are named <table>_<YYYYmmddHHMM>.csv
+
+
+def _read_csv(path: str) -> list[dict[str, str]]:
+    with open(path, newline="", encoding="utf-8") as fh:
+        return list(csv.DictReader(fh))
+
+
+def _nullable(values: list[str | None]) -> list[str | None]:
+    """Empty CSV field → NULL."""
+    return [v if v not in (None, "") else None for v in values]
+
+
+def _encode(values: list[Any]) -> DictColumn:
+    index: dict[Any, int] = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(index)
+        codes[i] = code
+    return DictColumn(codes=codes, values=list(index))
+
+
+def load_store(data_dir: str | None = None) -> ColumnStore:
+    """Load the newest job_descriptions_*.csv and salaries_*.csv and precompute the join once."""
+    data_dir = data_dir or settings.local_data_dir
+    jd_path = _latest(os.path.join(data_dir, "job_descriptions_*.csv"))
+    sal_path = _latest(os.path.join(data_dir, "salaries_*.csv"))
+    jd_rows = _read_csv(jd_path)
+    sal_rows = _read_csv(sal_path)
+
+    # Inner join on (jurisdiction, code = job_code); keys compared as text like the CSV source.
+    by_key: dict[tuple[str, str], list[dict[str, str]]] = {}
+    for jd in jd_rows:
+        by_key.setdefault((jd["jurisdiction"], jd["code"]), []).append(jd)
+    joined: dict[str, list[Any]] = {c: [] for c in ("jurisdiction", "code", "title", "description", "id", "job_code", "grade")}
+    amounts: list[float] = []
+    for s in sal_rows:
+        for jd in by_key.get((s["jurisdiction"], s["job_code"]), ()):
+            for c in _JD_COLUMNS:
+                joined[c].append(jd[c])
+            joined["id"].append(s["id"])
+            joined["job_code"].append(s["job_code"])
+            joined["grade"].append(s["grade"])
+            amt = s["amount"]
+            amounts.append(float(amt) if amt not in (None, "") else np.nan)
+
+    store = ColumnStore(n_rows=len(amounts), sources=[jd_path, sal_path])
+    for name, values in joined.items():
+        store.dims[name] = _encode(_nullable(values))
+    store.amount = np.asarray(amounts, dtype=np.float64)
+    return store
+
+
+_store: ColumnStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ColumnStore:
+    """Get or load the process-wide store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_store()
+    return _store
+
+
+def reload_store() -> ColumnStore:
+    """Rebuild from the newest CSVs (data reload)."""
+    global _store
+    store = load_store()
+    with _store_lock:
+        _store = store
+    return store
+
+
+def _like_regex(substring: str) -> re.Pattern[str]:
+    """MySQL LIKE '%sub%' (default case-insensitive collation): % and _ stay wildcards."""
+    parts = [".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in substring]
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def _matching_codes(col: DictColumn, predicate) -> np.ndarray:
+    return np.asarray([i for i, v in enumerate(col.values) if v is not None and predicate(v)], dtype=np.int32)
+
+
+def filter_mask(store: ColumnStore, req: SQLRequest) -> np.ndarray:
+    """Rows of store passing req's location and job_title_contains filters (SQL LIKE semantics). Also used on samples."""
+    mask = np.ones(store.n_rows, dtype=bool)
+    f = req.filters
+    if not f:
+        return mask
+    if f.location:
+        wanted = {v.casefold() for v in f.location}
+        col = store.dims["jurisdiction"]
+        mask &= np.isin(col.codes, _matching_codes(col, lambda v: str(v).casefold() in wanted))
+    if f.job_title_contains:
+        patterns = [_like_regex(sub) for sub in f.job_title_contains]
+        col = store.dims["title"]
+        mask &= np.isin(col.codes, _matching_codes(col, lambda v: any(p.search(str(v)) for p in patterns)))
+    return mask
+
+
+def _aggregate(agg: str, values: np.ndarray, inverse: np.ndarray, n_groups: int) -> list[Any]:
+    """Vectorized per-group aggregate over non-NULL amounts; SQL NULL for empty groups (count → 0)."""
+    valid = ~np.isnan(values)
+    counts = np.bincount(inverse[valid], minlength=n_groups)
+    if agg == "count":
+        return counts.tolist()
+    if agg in ("sum", "avg"):
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=n_groups)
+        out = sums / np.maximum(counts, 1) if agg == "avg" else sums
+    elif agg == "min":
+        out = np.full(n_groups, np.inf)
+        np.minimum.at(out, inverse[valid], values[valid])
+    else:  # max
+        out = np.full(n_groups, -np.inf)
+        np.maximum.at(out, inverse[valid], values[valid])
+    return [v if c else None for v, c in zip(out.tolist(), counts.tolist())]
+
+
+def _sort_key(value: Any) -> tuple:
+    """MySQL ordering: NULL first ascending; strings compare case-insensitively."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, str):
+        return (1, value.casefold())
+    return (1, value)
+
+
+def execute_request(req: SQLRequest, limit: int) -> tuple[list[str], list[list[Any]], list[str]]:
+    """
+    Evaluate an already-validated SQLRequest against the store.
+    Same (columns, rows, warnings) contract and column order as db.execute_query on build_sql output.
+    """
+    store = get_store()
+    mask = filter_mask(store, req)
+    idx = np.flatnonzero(mask)
+    amount = store.amount[idx]
+
+    if req.dimensions:
+        keys = np.stack([store.dims[d].codes[idx] for d in req.dimensions], axis=1)
+        uniq, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        # Emit groups in scan order of their first row.
+        order = np.argsort(first, kind="stable")
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        inverse = remap[inverse]
+        uniq = uniq[order]
+        n_groups = len(uniq)
+    else:
+        inverse = np.zeros(len(idx), dtype=np.int64)
+        n_groups = 1  # aggregate without GROUP BY always yields one row
+
+    columns: list[str] = []
+    data: list[list[Any]] = []
+    for m in req.metrics:
+        columns.append(f"{m.agg}_{m.name}")
+        data.append(_aggregate(m.agg, amount, inverse, n_groups))
+    for j, d in enumerate(req.dimensions):
+        col = store.dims[d]
+        columns.append(d)
+        data.append([col.values[c] for c in uniq[:, j].tolist()])
+
+    rows = [list(r) for r in zip(*data)] if data else []
+
+    for ob in reversed(req.order_by):
+        if ob.field not in columns:
+            raise ValueError(f"order_by field not in select list: {ob.field}")
+        pos = columns.index(ob.field)
+        rows.sort(key=lambda r: _sort_key(r[pos]), reverse=ob.dir == "desc")
+
+    warnings: list[str] = []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        warnings.append("truncated_to_limit")
+    return columns, rows, warnings
+
@@ -11,6 +11,20 @@ def _env(key: str, default: str = "") -> str:
     return os.environ.get(key, default)
 
 
+def _env_float_map(key: str, default: str = "") -> Dict[str, float]:
+    """Parse "name=value,name2=value2" into a dict of floats."""
+    out: Dict[str, float] = {}
+    for item in _env(key, default).split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = float(value)
+    return out
+
+
+def _env_bool(key: str, default: str = "true") -> bool:
+    return _env(key, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 class Settings:
     """Single source for all app configuration."""
 
@@ -21,10 +35,47 @@ class Settings:
     mysql_password: str = _env("MYSQL_PASSWORD", "")
     mysql_database: str = _env("MYSQL_DATABASE", "")
 
+    # Execution backend: "sync" (SQLAlchemy + PyMySQL in a worker thread), "async" (async engine, aiomysql)
+    # or "local" (in-process columnar engine over the raw CSVs in local_data_dir)
+    db_backend: str = _env("DB_BACKEND", "sync")
+    local_data_dir: str = _env("LOCAL_DATA_DIR", "data/raw-data")
+    # Optional URI overrides (e.g. sqlite:///gov_jobs.db, sqlite+aiosqlite:///gov_jobs.db) for local runs
+    database_url: str = _env("DATABASE_URL", "")
+    async_database_url: str = _env("ASYNC_DATABASE_URL", "")
+    db_pool_size: int = int(_env("DB_POOL_SIZE", "2"))
+    db_max_overflow: int = int(_env("DB_MAX_OVERFLOW", "2"))
+    async_db_pool_size: int = int(_env("ASYNC_DB_POOL_SIZE", "10"))
+    async_db_max_overflow: int = int(_env("ASYNC_DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout_sec: float = float(_env("DB_POOL_TIMEOUT_SEC", "30"))
+    db_pool_recycle_sec: int = int(_env("DB_POOL_RECYCLE_SEC", "1800"))  # below MySQL wait_timeout
+    db_warmup_connections: int = int(_env("DB_WARMUP_CONNECTIONS", "2"))  # opened in lifespan
+    db_health_check_interval_sec: float = float(_env("DB_HEALTH_CHECK_INTERVAL_SEC", "30"))
+    # Failed startup steps that retry (DB connections, local store, jurisdictions): first delay, doubling up to the max
+    startup_retry_initial_sec: float = float(_env("STARTUP_RETRY_INITIAL_SEC", "1"))
+    startup_retry_max_sec: float = float(_env("STARTUP_RETRY_MAX_SEC", "30"))
+    # Read routing (DB_BACKEND=sync or async; async then queries through sync engines in worker threads): replicas
+    # are read copies of the primary; shards own whole jurisdictions.
+    # DB_REPLICA_URLS="url,url"; DB_SHARDS="ventura=url|url;sanbernardino,sdcounty=url" (unlisted → primary)
+    db_replica_urls: str = _env("DB_REPLICA_URLS", "")
+    db_shards: str = _env("DB_SHARDS", "")
+    db_failover_cooldown_sec: float = float(_env("DB_FAILOVER_COOLDOWN_SEC", "30"))
+    db_fanout_max_groups: int = int(_env("DB_FANOUT_MAX_GROUPS", "10000"))  # partial groups per shard to re-aggregate
+    # Check out and ping a pooled connection while the LLM extracts intent, so execution finds it ready
+    db_speculative_checkout: bool = _env_bool("DB_SPECULATIVE_CHECKOUT", "true")
+
     # OpenAI
     openai_api_key: str = _env("OPENAI_API_KEY", "")
     openai_model: str = _env("OPENAI_MODEL", "gpt-4o-mini")
     openai_temperature: float = float(_env("OPENAI_TEMPERATURE", "0"))
+    openai_base_url: str = _env("OPENAI_BASE_URL", "")  # any OpenAI-compatible endpoint (proxy, local fake server)
+    openai_timeout_sec: float = float(_env("OPENAI_TIMEOUT_SEC", "20"))
+    openai_connect_timeout_sec: float = float(_env("OPENAI_CONNECT_TIMEOUT_SEC", "5"))
+    openai_max_retries: int = int(_env("OPENAI_MAX_RETRIES", "2"))
+    openai_max_connections: int = int(_env("OPENAI_MAX_CONNECTIONS", "20"))  # shared keep-alive pool
+    # Hedged requests: start a duplicate LLM call if the first has not answered after this long (0 = off)
+    openai_hedge_after_sec: float = float(_env("OPENAI_HEDGE_AFTER_SEC", "0"))
+    # Startup: open the client's first connection in the background so the first question skips the handshake
+    openai_warmup_connect: bool = _env_bool("OPENAI_WARMUP_CONNECT", "true")
 
     # App & MCP
     db_name: str = _env("DB_NAME", "hunter")
@@ -43,6 +94,97 @@ class Settings:
     sql_timeout_sec: int = 2
     sql_max_group_by: int = 4
     sql_max_filters: int = 20
+    # Streaming export (sql_agent_export): keyset pages over a server-side cursor
+    sql_page_max_rows: int = int(_env("SQL_PAGE_MAX_ROWS", "10000"))
+    sql_stream_chunk_rows: int = int(_env("SQL_STREAM_CHUNK_ROWS", "500"))
+    sql_stream_timeout_sec: int = int(_env("SQL_STREAM_TIMEOUT_SEC", "30"))
+    batch_max_questions: int = int(_env("BATCH_MAX_QUESTIONS", "50"))
+    batch_max_concurrency: int = int(_env("BATCH_MAX_CONCURRENCY", "8"))  # parallel LLM calls / queries per batch
+    # Admission control: concurrent LLM calls / DB executions, bounded wait queues with a queue-time deadline;
+    # beyond that calls fail fast with "Overloaded ... retry after". Concurrency 0 = unlimited (LLM) or pool size (DB).
+    admission_llm_concurrency: int = int(_env("ADMISSION_LLM_CONCURRENCY", "16"))
+    admission_llm_queue: int = int(_env("ADMISSION_LLM_QUEUE", "64"))
+    admission_llm_max_wait_sec: float = float(_env("ADMISSION_LLM_MAX_WAIT_SEC", "5"))
+    admission_db_concurrency: int = int(_env("ADMISSION_DB_CONCURRENCY", "0"))
+    admission_db_queue: int = int(_env("ADMISSION_DB_QUEUE", "32"))
+    admission_db_max_wait_sec: float = float(_env("ADMISSION_DB_MAX_WAIT_SEC", "1"))
+    # Deadlines: default time budget per tool call when it passes no budget_ms (0 = unbounded)
+    request_budget_ms: int = int(_env("REQUEST_BUDGET_MS", "0"))
+    # Circuit breakers (llm, db): open when >= breaker_failure_ratio of the last breaker_window calls failed or were
+    # slower than BREAKER_SLOW_SEC (needs breaker_min_calls); half-open after breaker_open_sec
+    breaker_enabled: bool = _env_bool("BREAKER_ENABLED", "true")
+    breaker_window: int = int(_env("BREAKER_WINDOW", "20"))
+    breaker_min_calls: int = int(_env("BREAKER_MIN_CALLS", "10"))
+    breaker_failure_ratio: float = float(_env("BREAKER_FAILURE_RATIO", "0.5"))
+    breaker_open_sec: float = float(_env("BREAKER_OPEN_SEC", "10"))
+    breaker_half_open_probes: int = int(_env("BREAKER_HALF_OPEN_PROBES", "2"))  # successes needed to close
+    breaker_slow_sec: Dict[str, float] = _env_float_map("BREAKER_SLOW_SEC", "llm=10,db=1")
+    # Rollups: grains are ";"-separated dimension lists; refreshed at startup / after data loads
+    rollups_enabled: bool = _env_bool("ROLLUPS_ENABLED", "false")
+    rollup_grains: str = _env("ROLLUP_GRAINS", "jurisdiction,title,grade,job_code;jurisdiction,grade")
+    plan_cache_size: int = int(_env("PLAN_CACHE_SIZE", "512"))  # compiled statements per query shape
+    # EXPLAIN cost gate: "off", "warn" (add a cost_warning) or "reject" shapes estimated above explain_max_rows
+    explain_gate: str = _env("EXPLAIN_GATE", "off")
+    explain_max_rows: int = int(_env("EXPLAIN_MAX_ROWS", "1000000"))  # estimated rows examined per query
+    index_advisor_enabled: bool = _env_bool("INDEX_ADVISOR_ENABLED", "true")  # report missing indexes at startup
+    # Trigram index over job titles: job_title_contains → (jurisdiction, code) IN (...) unless too many keys match
+    title_index_enabled: bool = _env_bool("TITLE_INDEX_ENABLED", "true")
+    title_index_max_keys: int = int(_env("TITLE_INDEX_MAX_KEYS", "256"))
+
+    # Approximate answers (SQLRequest.approx): sample of the gov_jobs join, built on the first approx request
+    # (which runs exact meanwhile) and rebuilt after loads
+    approx_enabled: bool = _env_bool("APPROX_ENABLED", "true")
+    approx_sample_strategy: str = _env("APPROX_SAMPLE_STRATEGY", "stratified")  # or "uniform"
+    approx_sample_rows: int = int(_env("APPROX_SAMPLE_ROWS", "10000"))  # per jurisdiction (stratified) or in total
+    approx_sample_seed: int = int(_env("APPROX_SAMPLE_SEED", "0"))
+    approx_confidence: float = float(_env("APPROX_CONFIDENCE", "0.95"))
+
+    # CSV ingest (python ingest.py): staged bulk loads swapped in atomically, versioned in dataset_versions
+    ingest_data_dir: str = _env("INGEST_DATA_DIR", "data/raw-data")
+    ingest_chunk_rows: int = int(_env("INGEST_CHUNK_ROWS", "5000"))  # rows per multi-row insert batch
+    ingest_poll_interval_sec: float = float(_env("INGEST_POLL_INTERVAL_SEC", "30"))  # 0 disables the version poller
+
+    # Profiling: sampled stacks of one tool call (profile=true / X-Profile header, or a profile_sample_rate fraction
+    # of calls) written to profile_dir/<request_id> as "speedscope" JSON or "collapsed" stacks. Off = no overhead.
+    profile_enabled: bool = _env_bool("PROFILE_ENABLED", "false")
+    profile_sample_rate: float = float(_env("PROFILE_SAMPLE_RATE", "0"))
+    profile_interval_ms: float = float(_env("PROFILE_INTERVAL_MS", "5"))
+    profile_dir: str = _env("PROFILE_DIR", "profiles")
+    profile_format: str = _env("PROFILE_FORMAT", "speedscope")
+    profile_max_files: int = int(_env("PROFILE_MAX_FILES", "200"))  # oldest profiles deleted beyond this
+
+    # Request log: sampled JSONL records of sql_agent / sql_query traffic, written by a background thread and
+    # rotated at request_log_max_bytes (request_log_backups old files kept). Records are dropped when the queue is full.
+    request_log_enabled: bool = _env_bool("REQUEST_LOG_ENABLED", "false")
+    request_log_path: str = _env("REQUEST_LOG_PATH", "logs/requests.jsonl")
+    request_log_sample_rate: float = float(_env("REQUEST_LOG_SAMPLE_RATE", "1"))
+    request_log_max_bytes: int = int(_env("REQUEST_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+    request_log_backups: int = int(_env("REQUEST_LOG_BACKUPS", "3"))
+    request_log_queue: int = int(_env("REQUEST_LOG_QUEUE", "10000"))
+    # Prewarmer: after startup and each data reload, replay the request log's hottest questions into the intent
+    # cache and its hottest fingerprints through execution (result cache, connections)
+    prewarm_enabled: bool = _env_bool("PREWARM_ENABLED", "true")
+    prewarm_top_n: int = int(_env("PREWARM_TOP_N", "50"))
+    prewarm_concurrency: int = int(_env("PREWARM_CONCURRENCY", "4"))
+
+    # Intent cache (normalized question → SQLRequest)
+    intent_cache_enabled: bool = _env_bool("INTENT_CACHE_ENABLED", "true")
+    intent_cache_max_entries: int = int(_env("INTENT_CACHE_MAX_ENTRIES", "1024"))
+    intent_cache_ttl_sec: float = float(_env("INTENT_CACHE_TTL_SEC", "3600"))
+    intent_cache_max_question_chars: int = int(_env("INTENT_CACHE_MAX_QUESTION_CHARS", "500"))
+
+    # Fast-path intent parser: template questions answered without the LLM when confidence is high enough
+    fast_intent_enabled: bool = _env_bool("FAST_INTENT_ENABLED", "true")
+    fast_intent_min_confidence: float = float(_env("FAST_INTENT_MIN_CONFIDENCE", "0.85"))
+    # Extra names for jurisdiction codes, "alias=code,..." (matched with spaces removed)
+    fast_intent_aliases: str = _env("FAST_INTENT_ALIASES", "san diego=sdcounty,san diego county=sdcounty")
+
+    # Result cache (fingerprint → rows); TTL per dataset, e.g. RESULT_CACHE_TTL_BY_DATASET="gov_jobs=3600"
+    result_cache_enabled: bool = _env_bool("RESULT_CACHE_ENABLED", "true")
+    result_cache_max_bytes: int = int(_env("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    result_cache_max_entry_bytes: int = int(_env("RESULT_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+    result_cache_ttl_sec: float = float(_env("RESULT_CACHE_TTL_SEC", "300"))
+    result_cache_ttl_by_dataset: Dict[str, float] = _env_float_map("RESULT_CACHE_TTL_BY_DATASET", "gov_jobs=3600")
 
     def require_openai_api_key(self) -> str:
         if not self.openai_api_key:
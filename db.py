@@ -1,58 +1,421 @@
 """Database connection and setup."""
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
 
-from sqlalchemy import text
-from sqlalchemy.engine import create_engine
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, create_engine
 from sqlalchemy.engine.base import Engine
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
 
 from config import settings
+from metrics import stage
 
+logger = logging.getLogger(__name__)
 
-def mysql_uri() -> str:
+T = TypeVar("T")
+
+
+def mysql_uri(driver: str = "pymysql") -> str:
     """Build MySQL connection URI from settings."""
     return (
-        f"mysql+pymysql://{settings.mysql_user}:{settings.mysql_password}"
+        f"mysql+{driver}://{settings.mysql_user}:{settings.mysql_password}"
         f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_database}"
     )
 
 
+def database_uri() -> str:
+    """Sync URI: DATABASE_URL if set (e.g. sqlite:///gov_jobs.db), else MySQL via PyMySQL."""
+    return settings.database_url or mysql_uri("pymysql")
+
+
+def async_database_uri() -> str:
+    """Async URI: ASYNC_DATABASE_URL if set (e.g. sqlite+aiosqlite:///gov_jobs.db), else MySQL via aiomysql."""
+    return settings.async_database_url or mysql_uri("aiomysql")
+
+
+def _pool_kwargs(uri: str, pool_size: int, max_overflow: int) -> dict[str, Any]:
+    """
+    Queue-pool sizing; in-memory SQLite uses a single shared connection and takes none. LIFO so the most
+    recently used (or speculatively pinged) connection is the next one handed out.
+    """
+    if uri.startswith("sqlite") and (":memory:" in uri or uri.rstrip("/").endswith(":")):
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout_sec,
+        "pool_recycle": settings.db_pool_recycle_sec,
+        "pool_use_lifo": True,
+    }
+
+
+@lru_cache(maxsize=settings.plan_cache_size)
+def _statement(sql: str) -> TextClause:
+    """Parsed text() construct per SQL string, reused so SQLAlchemy's compiled cache hits on every repeat."""
+    return text(sql)
+
+
+def _hint_ms(timeout_sec: float) -> int:
+    """
+    timeout_sec in ms on a power of two: rounded down below the session default (a request budget is never
+    exceeded), up above it (an export's SQL_STREAM_TIMEOUT_SEC is never cut short).
+    """
+    ms = max(int(timeout_sec * 1000), 1)
+    if timeout_sec > settings.sql_timeout_sec:
+        return 1 << (ms - 1).bit_length()
+    return 1 << (ms.bit_length() - 1)
+
+
+def _with_timeout_hint(sql: str, dialect: str, timeout_sec: float) -> str:
+    """
+    MySQL optimizer hint for statements whose timeout differs from the per-connection session default
+    (_on_connect). The remaining request budget differs on nearly every call, so the hint is bucketed (_hint_ms):
+    a statement has a handful of hinted texts, not one per call, and _statement and the server's caches keep hitting.
+    """
+    if dialect != "mysql" or timeout_sec == settings.sql_timeout_sec or not sql.startswith("SELECT "):
+        return sql
+    return f"SELECT /*+ MAX_EXECUTION_TIME({_hint_ms(timeout_sec)}) */ " + sql[len("SELECT "):]
+
+
+def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    """Session setup once per physical MySQL connection (replaces a SET round trip per query)."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET SESSION max_execution_time = {int(settings.sql_timeout_sec * 1000)}")
+    except Exception:
+        logger.warning("max_execution_time not supported; relying on app-level timeouts")
+    finally:
+        cursor.close()
+
+
+def _sqlite_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    """pysqlite: turn off the driver's own BEGIN, which it skips before DDL (a DROP TABLE would commit at once)."""
+    dbapi_connection.isolation_level = None
+
+
+def _sqlite_begin(conn: Connection) -> None:
+    """pysqlite: BEGIN whenever SQLAlchemy begins, so DDL commits or rolls back with the rest (ingest / rollup swaps)."""
+    conn.exec_driver_sql("BEGIN")
+
+
+# ---------------------------------------------------------------------------
+# Pool monitoring: waiters, checkout latency, background health checks
+# ---------------------------------------------------------------------------
+
+
+class PoolMonitor:
+    """Counters for /health: callers waiting on checkout and recent checkout latencies."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self._latencies_ms: deque[float] = deque(maxlen=512)
+        self.health_checks = 0
+        self.health_failures = 0
+        self.last_health_check: float | None = None
+        self.primes = 0
+        self.prime_failures = 0
+
+    def begin(self) -> float:
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def end(self, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self._latencies_ms.append(elapsed)
+
+    def primed(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.primes += 1
+            else:
+                self.prime_failures += 1
+
+    def health_checked(self, failures: int) -> None:
+        with self._lock:
+            self.health_checks += 1
+            self.health_failures += failures
+            self.last_health_check = time.time()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            lat = sorted(self._latencies_ms)
+            return {
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_ms_p50": round(statistics.median(lat), 3) if lat else None,
+                "checkout_ms_p95": round(lat[int(0.95 * (len(lat) - 1))], 3) if lat else None,
+                "checkout_ms_max": round(lat[-1], 3) if lat else None,
+                "health_checks": self.health_checks,
+                "health_failures": self.health_failures,
+                "last_health_check": self.last_health_check,
+                "primes": self.primes,
+                "prime_failures": self.prime_failures,
+            }
+
+
+pool_monitor = PoolMonitor()
+
+
 _engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+
+
+def create_sync_engine(uri: str) -> Engine:
+    """Pooled sync engine for uri with the app's pool sizing and MySQL session setup (primary, replicas, shards)."""
+    engine = create_engine(
+        uri,
+        pool_pre_ping=False,  # stale connections are found by the background health check instead
+        **_pool_kwargs(uri, settings.db_pool_size, settings.db_max_overflow),
+    )
+    if engine.dialect.name == "mysql":
+        event.listen(engine, "connect", _on_connect)
+    elif engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_connect)
+        event.listen(engine, "begin", _sqlite_begin)
+    return engine
 
 
 def get_engine() -> Engine:
     """Get or create SQLAlchemy engine for deterministic SQL execution."""
     global _engine
     if _engine is None:
-        _engine = create_engine(
-            mysql_uri(),
-            pool_pre_ping=True,
-            pool_size=2,
-            max_overflow=2,
-        )
+        _engine = create_sync_engine(database_uri())
     return _engine
 
 
-def execute_query(
-    sql: str,
-    params: dict[str, Any],
-    timeout_sec: int,
-    limit: int,
-) -> tuple[list[str], list[list[Any]], list[str]]:
+def get_async_engine() -> AsyncEngine:
+    """Get or create the async engine (DB_BACKEND=async). Pool sized for many concurrent tool calls."""
+    global _async_engine
+    if _async_engine is None:
+        uri = async_database_uri()
+        engine = create_async_engine(
+            uri,
+            pool_pre_ping=False,
+            **_pool_kwargs(uri, settings.async_db_pool_size, settings.async_db_max_overflow),
+        )
+        if engine.dialect.name == "mysql":
+            event.listen(engine.sync_engine, "connect", _on_connect)
+        _async_engine = engine
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    """Close pooled async connections (app shutdown)."""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+@contextmanager
+def _connect(engine: Engine | None = None) -> Iterator[Connection]:
+    """Checkout from the sync pool (the primary's unless engine is given), timed for pool stats."""
+    engine = engine or get_engine()
+    started = pool_monitor.begin()
+    try:
+        with stage("checkout"):
+            conn = engine.connect()
+    finally:
+        pool_monitor.end(started)
+    with conn:
+        yield conn
+
+
+@asynccontextmanager
+async def _connect_async() -> AsyncIterator[AsyncConnection]:
+    """Checkout from the async pool, timed for pool stats."""
+    conn = get_async_engine().connect()
+    started = pool_monitor.begin()
+    try:
+        with stage("checkout"):
+            await conn.start()
+    finally:
+        pool_monitor.end(started)
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+def warmup(n: int) -> int:
+    """Open n sync connections at once and return them to the pool (startup). Returns how many succeeded."""
+    engine = get_engine()
+    conns: list[Connection] = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    except Exception:
+        logger.exception("connection warmup failed after %d connections", len(conns))
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
+
+
+async def warmup_async(n: int) -> int:
+    """Async-engine counterpart of warmup."""
+    engine = get_async_engine()
+    conns: list[AsyncConnection] = []
+    try:
+        for _ in range(n):
+            conn = await engine.connect()
+            conns.append(conn)
+            await conn.exec_driver_sql("SELECT 1")
+    except Exception:
+        logger.exception("async connection warmup failed after %d connections", len(conns))
+    finally:
+        for conn in conns:
+            await conn.close()
+    return len(conns)
+
+
+def _has_idle_capacity(engine: Engine) -> bool:
+    """True when a checkout would not dip into overflow (priming must not take a connection a query needs)."""
+    pool = engine.pool
+    return not hasattr(pool, "checkedout") or pool.checkedout() < pool.size()
+
+
+def prime_connection() -> bool:
     """
-    Execute parameterized SELECT with timeout and row limit.
-    Returns (columns, rows, warnings). Rows may be truncated to limit.
+    Speculative checkout while intent extraction runs: take a pooled connection (opening or recycling it if needed),
+    ping it, and return it to the front of the (LIFO) pool; a broken one is invalidated so the query reconnects
+    now rather than later. Not timed as a request stage. Returns False if skipped or failed.
     """
     engine = get_engine()
-    warnings: list[str] = []
-    with engine.connect() as conn:
-        # MySQL: set statement timeout (ms). Some versions use max_execution_time.
+    if not _has_idle_capacity(engine):
+        return False
+    try:
+        with engine.connect() as conn:
+            try:
+                conn.exec_driver_sql("SELECT 1")
+            except Exception:
+                conn.invalidate()
+                raise
+    except Exception:
+        pool_monitor.primed(False)
+        return False
+    pool_monitor.primed(True)
+    return True
+
+
+async def prime_connection_async() -> bool:
+    """Async-engine counterpart of prime_connection."""
+    engine = get_async_engine()
+    if not _has_idle_capacity(engine.sync_engine):
+        return False
+    try:
+        async with engine.connect() as conn:
+            try:
+                await conn.exec_driver_sql("SELECT 1")
+            except Exception:
+                await conn.invalidate()
+                raise
+    except Exception:
+        pool_monitor.primed(False)
+        return False
+    pool_monitor.primed(True)
+    return True
+
+
+def check_pool_health() -> int:
+    """
+    Ping every idle pooled connection (checked out together so each is distinct); broken ones are invalidated
+    and replaced on next checkout. Returns the number of failures.
+    """
+    engine = get_engine()
+    idle = engine.pool.checkedin() if hasattr(engine.pool, "checkedin") else 0
+    failures = 0
+    conns: list[Connection] = []
+    try:
+        for _ in range(idle):
+            conns.append(engine.connect())
+        for conn in conns:
+            try:
+                conn.exec_driver_sql("SELECT 1")
+            except Exception:
+                failures += 1
+                conn.invalidate()
+    finally:
+        for conn in conns:
+            conn.close()
+    return failures
+
+
+async def check_pool_health_async() -> int:
+    """Async-engine counterpart of check_pool_health."""
+    engine = get_async_engine()
+    idle = engine.pool.checkedin() if hasattr(engine.pool, "checkedin") else 0
+    failures = 0
+    conns: list[AsyncConnection] = []
+    try:
+        for _ in range(idle):
+            conns.append(await engine.connect())
+        for conn in conns:
+            try:
+                await conn.exec_driver_sql("SELECT 1")
+            except Exception:
+                failures += 1
+                await conn.invalidate()
+    finally:
+        for conn in conns:
+            await conn.close()
+    return failures
+
+
+async def health_check_loop(interval_sec: float, use_async: bool) -> None:
+    """Background task: periodic idle-connection pings (replaces pool_pre_ping on every checkout)."""
+    while True:
+        await asyncio.sleep(interval_sec)
         try:
-            conn.execute(text("SET max_execution_time = :ms"), {"ms": timeout_sec * 1000})
+            if use_async:
+                failures = await check_pool_health_async()
+            else:
+                failures = await asyncio.to_thread(check_pool_health)
         except Exception:
-            pass  # older MySQL may not support; rely on app-level timeout if needed
-        result = conn.execute(text(sql), params)
+            logger.exception("pool health check failed")
+            failures = 1
+        pool_monitor.health_checked(failures)
+
+
+def pool_stats() -> dict[str, Any]:
+    """Pool occupancy + checkout stats for /health."""
+    out: dict[str, Any] = {}
+    for name, engine in (("sync", _engine), ("async", _async_engine)):
+        pool = engine.pool if engine is not None else None
+        if pool is None or not hasattr(pool, "checkedout"):
+            continue
+        out[name] = {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+    out.update(pool_monitor.snapshot())
+    return out
+
+
+def _collect(result: Any, limit: int) -> tuple[list[str], list[list[Any]], list[str]]:
+    """Read at most limit rows from a result; flag truncation."""
+    warnings: list[str] = []
+    with stage("fetch"):
         columns = list(result.keys())
         rows_raw = result.fetchmany(limit + 1)
         if len(rows_raw) > limit:
@@ -61,3 +424,80 @@ def execute_query(
         else:
             rows = [list(r) for r in rows_raw]
     return columns, rows, warnings
+
+
+def execute_query(
+    sql: str,
+    params: dict[str, Any],
+    timeout_sec: int,
+    limit: int,
+    engine: Engine | None = None,
+) -> tuple[list[str], list[list[Any]], list[str]]:
+    """
+    Execute parameterized SELECT with timeout and row limit, on engine (default: the primary).
+    Returns (columns, rows, warnings). Rows may be truncated to limit.
+    MySQL timeout comes from the per-connection session variable (or a hint when timeout_sec differs).
+    """
+    with _connect(engine) as conn:
+        sql = _with_timeout_hint(sql, conn.dialect.name, timeout_sec)
+        with stage("execute"):
+            result = conn.execute(_statement(sql), params)
+        return _collect(result, limit)
+
+
+def stream_query(
+    sql: str,
+    params: dict[str, Any],
+    timeout_sec: int,
+    chunk_size: int,
+) -> Iterator[tuple[list[str], list[list[Any]]]]:
+    """
+    Execute a SELECT on a server-side cursor and yield (columns, rows) chunks of up to chunk_size.
+    Memory stays bounded by one chunk regardless of result size.
+    """
+    with _connect() as conn:
+        sql = _with_timeout_hint(sql, conn.dialect.name, timeout_sec)
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+        with stage("execute"):
+            result = conn.execute(_statement(sql), params)
+        columns = list(result.keys())
+        partitions = result.partitions(chunk_size)
+        while True:
+            with stage("fetch"):  # timed per chunk, excluding time the consumer holds it
+                partition = next(partitions, None)
+                rows = [list(r) for r in partition] if partition is not None else None
+            if rows is None:
+                return
+            yield columns, rows
+
+
+async def execute_query_async(
+    sql: str,
+    params: dict[str, Any],
+    timeout_sec: int,
+    limit: int,
+) -> tuple[list[str], list[list[Any]], list[str]]:
+    """
+    Async variant of execute_query on the async engine (no worker thread).
+    Server-side timeout on MySQL, plus an app-level timeout for every dialect.
+    """
+    async with _connect_async() as conn:
+        sql = _with_timeout_hint(sql, conn.dialect.name, timeout_sec)
+        try:
+            with stage("execute"):
+                result = await asyncio.wait_for(conn.execute(_statement(sql), params), timeout=timeout_sec)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"query exceeded {timeout_sec}s") from None
+        return _collect(result, limit)
+
+
+def run_on_connection(fn: Callable[[Connection], T]) -> T:
+    """fn(conn) on a timed checkout from the primary's sync pool (dialect-level work such as EXPLAIN)."""
+    with _connect() as conn:
+        return fn(conn)
+
+
+async def run_on_connection_async(fn: Callable[[Connection], T]) -> T:
+    """run_on_connection on the async pool: fn gets a sync Connection facade via AsyncConnection.run_sync."""
+    async with _connect_async() as conn:
+        return await conn.run_sync(fn)
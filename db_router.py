@@ -0,0 +1,383 @@
+"""Read routing for run_request: primary, read replicas and jurisdiction shards, with fan-out, re-aggregation and failover."""
+from __future__ import annotations
+
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.base import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from config import settings
+from db import create_sync_engine, database_uri, execute_query, get_engine
+from schemas import MetricSpec, SQLRequest
+from sql_builder import build_sql
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Result = tuple[list[str], list[list[Any]], list[str]]
+
+# MySQL errors that mean "this query", not "this server": max_execution_time exceeded, query interrupted.
+_QUERY_ERRNOS = {3024, 1317}
+# MySQL server errors about the connection rather than the statement (client-side CR_* errors are 2000-2999):
+# too many connections, shutdown, host blocked / not allowed, aborted or network-level failures, killed, idle.
+_CONNECTION_ERRNOS = {1040, 1053, 1077, 1129, 1130, 1152, 1153, 1158, 1159, 1160, 1161, 1927, 4031}
+# SQLite primary result codes for a file that cannot be used right now: BUSY, LOCKED, IOERR, CANTOPEN.
+_SQLITE_CONNECTION_CODES = {5, 6, 10, 14}
+
+
+def _is_connectivity_error(e: Exception) -> bool:
+    """
+    Failures worth failing over for: lost / refused connections, not bad or slow queries. PyMySQL raises
+    OperationalError for many statement errors (unknown column, ...), so the error code decides.
+    """
+    if isinstance(e, DBAPIError) and e.connection_invalidated:
+        return True
+    if not isinstance(e, OperationalError):
+        return False
+    sqlite_code = getattr(e.orig, "sqlite_errorcode", None)
+    if sqlite_code is not None:
+        return sqlite_code & 0xFF in _SQLITE_CONNECTION_CODES
+    args = getattr(e.orig, "args", ())
+    if args and isinstance(args[0], int):
+        return 2000 <= args[0] < 3000 or args[0] in _CONNECTION_ERRNOS
+    return True  # no error code: the driver failed before the server saw the statement
+
+
+def is_db_failure(e: Exception) -> bool:
+    """
+    What the db circuit breaker holds against the database: connectivity errors and timeouts (MySQL
+    max_execution_time, pool checkout, the async wait_for). Errors caused by the request itself are not counted.
+    """
+    if isinstance(e, (TimeoutError, PoolTimeout)):
+        return True
+    if isinstance(e, OperationalError):
+        args = getattr(e.orig, "args", ())
+        if args and args[0] in _QUERY_ERRNOS:
+            return True
+    return _is_connectivity_error(e)
+
+
+def _redact(url: str) -> str:
+    try:
+        return make_url(url).render_as_string(hide_password=True)
+    except Exception:
+        return "<invalid url>"
+
+
+class Backend:
+    """One database. After a connectivity failure it is skipped for DB_FAILOVER_COOLDOWN_SEC, then tried again."""
+
+    def __init__(self, name: str, url: str, primary: bool = False) -> None:
+        self.name = name
+        self.url = url
+        self.primary = primary
+        self._engine: Engine | None = None
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_error: str | None = None
+
+    @property
+    def engine(self) -> Engine:
+        if self.primary:
+            return get_engine()  # shares the primary's pool with everything else
+        with self._lock:
+            if self._engine is None:
+                self._engine = create_sync_engine(self.url)
+            return self._engine
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def mark_ok(self) -> None:
+        with self._lock:
+            self.queries += 1
+            self.down_until = 0.0
+
+    def mark_failed(self, e: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.down_until = time.monotonic() + settings.db_failover_cooldown_sec
+            self.last_error = f"{type(e).__name__}: {e}"[:200]
+        logger.warning("db backend %s marked down for %ss: %s", self.name, settings.db_failover_cooldown_sec, e)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "url": _redact(self.url),
+                "healthy": self.healthy(time.monotonic()),
+                "queries": self.queries,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+class ShardGroup:
+    """
+    Backends holding the same data. members take reads round-robin; fallback (the primary behind its replicas)
+    only when no member is healthy. jurisdictions is empty for the default group.
+    """
+
+    def __init__(self, name: str, jurisdictions: frozenset[str], members: list[Backend],
+                 fallback: list[Backend] | None = None) -> None:
+        self.name = name
+        self.jurisdictions = jurisdictions
+        self.members = members
+        self.fallback = fallback or []
+        self._rr = itertools.count()
+
+    def candidates(self) -> list[Backend]:
+        """Healthy backends in round-robin order, then fallbacks, then unhealthy ones (soonest to recover first)."""
+        now = time.monotonic()
+        start = next(self._rr) % len(self.members)
+        ordered = self.members[start:] + self.members[:start] + self.fallback
+        down = sorted((b for b in ordered if not b.healthy(now)), key=lambda b: b.down_until)
+        return [b for b in ordered if b.healthy(now)] + down
+
+    def run(self, fn: Callable[[Engine], T]) -> T:
+        """fn(engine) on the first backend that answers; connectivity errors mark it down and move on."""
+        last: Exception | None = None
+        for backend in self.candidates():
+            try:
+                out = fn(backend.engine)
+            except Exception as e:
+                if not _is_connectivity_error(e):
+                    raise
+                backend.mark_failed(e)
+                last = e
+                continue
+            backend.mark_ok()
+            return out
+        raise last if last is not None else RuntimeError(f"no backends in {self.name}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "jurisdictions": sorted(self.jurisdictions),
+            "backends": [b.stats() for b in self.members + self.fallback],
+        }
+
+
+# ---------------------------------------------------------------------------
+# Re-aggregation across shards
+# ---------------------------------------------------------------------------
+
+
+def _partial_aggs(req: SQLRequest) -> list[tuple[str, str]]:
+    """(metric, agg) partials that merge exactly across shards: avg becomes sum + count."""
+    out: list[tuple[str, str]] = []
+    for m in req.metrics:
+        for agg in (("sum", "count") if m.agg == "avg" else (m.agg,)):
+            if (m.name, agg) not in out:
+                out.append((m.name, agg))
+    return out
+
+
+def _combine(agg: str, a: Any, b: Any) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if agg in ("sum", "count"):
+        return a + b
+    return min(a, b) if agg == "min" else max(a, b)
+
+
+def _final(req: SQLRequest, aggs: list[tuple[str, str]], acc: list[Any]) -> list[Any]:
+    """Metric values of req from merged partials (same order as the single-database SELECT list)."""
+    pos = {a: i for i, a in enumerate(aggs)}
+    out: list[Any] = []
+    for m in req.metrics:
+        if m.agg == "avg":
+            total, count = acc[pos[(m.name, "sum")]], acc[pos[(m.name, "count")]]
+            out.append(total / count if total is not None and count else None)
+        elif m.agg == "count":
+            out.append(acc[pos[(m.name, "count")]] or 0)
+        else:
+            out.append(acc[pos[(m.name, m.agg)]])
+    return out
+
+
+def _order_and_limit(req: SQLRequest, columns: list[str], rows: list[list[Any]], limit: int) -> list[list[Any]]:
+    """ORDER BY in Python (NULLs sort first ascending, like MySQL and SQLite), then LIMIT."""
+    for ob in reversed(req.order_by):
+        if ob.field not in columns:
+            continue
+        j = columns.index(ob.field)
+        rows.sort(key=lambda r: (r[j] is not None, r[j]), reverse=ob.dir == "desc")
+    return rows[:limit]
+
+
+# ---------------------------------------------------------------------------
+# Router
+# ---------------------------------------------------------------------------
+
+
+class Router:
+    """Shard groups (default group first) and the jurisdiction → group map."""
+
+    def __init__(self, groups: list[ShardGroup]) -> None:
+        self.groups = groups
+        self.default = groups[0]
+        self._by_jurisdiction = {j: g for g in groups[1:] for j in g.jurisdictions}
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.fanouts = 0
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.groups) > 1
+
+    @property
+    def enabled(self) -> bool:
+        return self.sharded or len(self.default.members) > 1 or bool(self.default.fallback)
+
+    def targets(self, req: SQLRequest) -> list[ShardGroup]:
+        """Groups owning req's locations (unlisted ones live on the default group); all groups without a location."""
+        f = req.filters
+        if not self.sharded:
+            return [self.default]
+        if not f or not f.location:
+            return list(self.groups)
+        out: list[ShardGroup] = []
+        for loc in f.location:
+            group = self._by_jurisdiction.get(loc.casefold(), self.default)
+            if group not in out:
+                out.append(group)
+        return out
+
+    def _map(self, groups: list[ShardGroup], fn: Callable[[Engine], T]) -> list[T]:
+        """fn on every group concurrently (each with its own failover); stage timings keep the caller's context."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=min(32, 4 * len(self.groups)),
+                                                    thread_name_prefix="db-fanout")
+            self.fanouts += 1
+        futures = [self._executor.submit(contextvars.copy_context().run, g.run, fn) for g in groups]
+        return [f.result() for f in futures]
+
+    def execute(self, req: SQLRequest, sql: str, params: dict[str, Any], timeout_sec: int, limit: int) -> Result:
+        """
+        Run req's statement where its data lives. One group: that group's healthy backend. Several: fan out.
+        Grouped by jurisdiction, shard results are disjoint, so each shard's top `limit` rows are merged and
+        re-sorted. Otherwise each shard returns mergeable partials (sum/count/min/max per group) that are
+        re-aggregated here, with avg = sum / count.
+        """
+        groups = self.targets(req)
+        if len(groups) == 1:
+            return groups[0].run(lambda engine: execute_query(sql, params, timeout_sec, limit, engine=engine))
+
+        if "jurisdiction" in req.dimensions:
+            parts = self._map(groups, lambda engine: execute_query(sql, params, timeout_sec, limit, engine=engine))
+            columns = parts[0][0]
+            rows = _order_and_limit(req, columns, [r for _, rs, _ in parts for r in rs], limit)
+            truncated = any("truncated_to_limit" in w for _, _, w in parts)
+        else:
+            aggs = _partial_aggs(req)
+            partial = req.model_copy(update={
+                "metrics": [MetricSpec(name=n, agg=a) for n, a in aggs],
+                "order_by": [],
+            })
+            p_sql, p_params, _ = build_sql(partial)
+            cap = settings.db_fanout_max_groups
+            p_params["row_limit"] = cap + 1  # every group, not the request's top N
+            parts = self._map(groups, lambda engine: execute_query(p_sql, p_params, timeout_sec, cap, engine=engine))
+            if any("truncated_to_limit" in w for _, _, w in parts):
+                raise ValueError(
+                    f"fan-out over more than {cap} groups per shard (DB_FANOUT_MAX_GROUPS); "
+                    "filter by location or group by jurisdiction"
+                )
+            n = len(aggs)
+            merged: dict[tuple, list[Any]] = {}
+            for _, shard_rows, _ in parts:
+                for r in shard_rows:
+                    acc = merged.get(tuple(r[n:]))
+                    if acc is None:
+                        merged[tuple(r[n:])] = list(r[:n])
+                        continue
+                    for i, (_, agg) in enumerate(aggs):
+                        acc[i] = _combine(agg, acc[i], r[i])
+            columns = [f"{m.agg}_{m.name}" for m in req.metrics] + parts[0][0][n:]
+            rows = [_final(req, aggs, acc) + list(key) for key, acc in merged.items()]
+            rows, truncated = _order_and_limit(req, columns, rows, limit), False
+
+        warnings = [f"fanout:{len(groups)}"] + (["truncated_to_limit"] if truncated else [])
+        return columns, rows, warnings
+
+    def each_group(self, fn: Callable[[Engine], T]) -> list[T]:
+        """fn once per group (with failover), for loads that must see every jurisdiction."""
+        return [g.run(fn) for g in self.groups]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "fanouts": self.fanouts,
+            "groups": {g.name: g.stats() for g in self.groups},
+        }
+
+
+def _split_urls(spec: str) -> list[str]:
+    return [u.strip() for u in spec.split("|") if u.strip()]
+
+
+def build_router() -> Router:
+    """
+    From settings: DB_REPLICA_URLS="url,url" (read copies of the primary) and
+    DB_SHARDS="ventura=url|url;sanbernardino,sdcounty=url" (jurisdictions → backends holding them; "|" separates
+    copies of one shard). Jurisdictions not listed in DB_SHARDS are served by the primary's group.
+    """
+    primary = Backend("primary", database_uri(), primary=True)
+    replicas = [Backend(f"replica{i}", u.strip()) for i, u in enumerate(settings.db_replica_urls.split(",")) if u.strip()]
+    groups = [ShardGroup("default", frozenset(), replicas or [primary], [primary] if replicas else None)]
+    for item in settings.db_shards.split(";"):
+        names, sep, urls = item.partition("=")
+        jurisdictions = frozenset(j.strip().casefold() for j in names.split(",") if j.strip())
+        if not sep or not jurisdictions or not _split_urls(urls):
+            continue
+        name = "shard:" + ",".join(sorted(jurisdictions))
+        groups.append(ShardGroup(
+            name, jurisdictions, [Backend(f"{name}#{i}", u) for i, u in enumerate(_split_urls(urls))]
+        ))
+    return Router(groups)
+
+
+_router: Router | None = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> Router:
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = build_router()
+            if _router.enabled and settings.db_backend == "async":
+                logger.info("DB_BACKEND=async with replicas / shards: queries run on the router's sync engines "
+                            "in worker threads")
+        return _router
+
+
+def execute_routed(req: SQLRequest, sql: str, params: dict[str, Any], timeout_sec: int, limit: int) -> Result:
+    """execute_query for run_request: straight to the primary unless replicas or shards are configured."""
+    router = get_router()
+    if not router.enabled:
+        return execute_query(sql, params, timeout_sec=timeout_sec, limit=limit)
+    return router.execute(req, sql, params, timeout_sec, limit)
+
+
+def query_each_shard(fn: Callable[[Engine], T]) -> list[T]:
+    """fn(engine) once per shard group, so the results cover every jurisdiction (the primary alone unless sharded)."""
+    router = get_router()
+    return router.each_group(fn) if router.sharded else [fn(get_engine())]
+
+
+def router_stats() -> dict[str, Any]:
+    return get_router().stats()
@@ -0,0 +1,66 @@
+"""Compact column-oriented result encoding and single-pass JSON tool results (sql_agent response_format="columnar")."""
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from mcp.types import CallToolResult, TextContent
+
+
+def encode_columnar(columns: list[str], rows: list[list[Any]]) -> dict[str, Any]:
+    """
+    One pass over rows → {columns, row_count, values, dictionaries}. values[j] is column j as an array;
+    string columns are dictionary-encoded (values[j] holds indexes into dictionaries[columns[j]], null stays null)
+    unless they barely repeat, in which case the plain strings are kept.
+    """
+    n_cols = len(columns)
+    values: list[list[Any]] = [[] for _ in range(n_cols)]
+    dicts: list[dict[str, int] | None] = [None] * n_cols
+    kinds: list[str | None] = [None] * n_cols  # "str" | "plain", decided by the first non-null value
+
+    for row in rows:
+        for j in range(n_cols):
+            v = row[j]
+            kind = kinds[j]
+            if kind is None and v is not None:
+                kind = kinds[j] = "str" if isinstance(v, str) else "plain"
+                if kind == "str":
+                    dicts[j] = {}
+            if kind == "str":
+                if isinstance(v, str):
+                    d = dicts[j]
+                    code = d.get(v)
+                    if code is None:
+                        code = d[v] = len(d)
+                    values[j].append(code)
+                    continue
+                if v is not None:  # mixed column: decode what we have and keep it plain
+                    inverse = list(dicts[j])
+                    values[j] = [inverse[c] if c is not None else None for c in values[j]]
+                    kinds[j] = "plain"
+                    dicts[j] = None
+            values[j].append(v)
+
+    dictionaries: dict[str, list[str]] = {}
+    for j, d in enumerate(dicts):
+        if d is None:
+            continue
+        if 2 * len(d) > len(rows):  # mostly distinct: codes + dictionary would be larger than the strings
+            inverse = list(d)
+            values[j] = [inverse[c] if c is not None else None for c in values[j]]
+        else:
+            dictionaries[columns[j]] = list(d)
+    return {"columns": columns, "row_count": len(rows), "values": values, "dictionaries": dictionaries}
+
+
+def dumps(obj: Any) -> str:
+    """orjson with str() for anything it does not encode natively (Decimal → "12.50", as pydantic does)."""
+    return orjson.dumps(obj, default=str).decode()
+
+
+def tool_result(envelope: dict[str, Any]) -> CallToolResult:
+    """
+    Pre-serialized tool result: one compact orjson pass for the text content (same shape as the dict-returning
+    tools, which get no structuredContent). Skips FastMCP's indent=2 pydantic dump over every row.
+    """
+    return CallToolResult(content=[TextContent(type="text", text=dumps(envelope))])
@@ -0,0 +1,286 @@
+"""EXPLAIN-based cost gate (estimated rows examined, cached per statement) and startup index advisor."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import inspect, text
+
+from config import settings
+from db import get_engine, run_on_connection, run_on_connection_async
+
+logger = logging.getLogger(__name__)
+
+# Composite indexes the gov_jobs join and location filters rely on: table → column lists (leading prefix).
+RECOMMENDED_INDEXES: dict[str, list[tuple[str, ...]]] = {
+    "job_descriptions": [("jurisdiction", "code")],
+    "salaries": [("jurisdiction", "job_code")],
+}
+
+# SQLite has no row estimates in EXPLAIN QUERY PLAN; an indexed equality lookup is assumed to match this many rows
+# when sqlite_stat1 (ANALYZE) has nothing better (SQLite's own planner default).
+_SQLITE_SEARCH_ROWS = 10
+
+_FROM_RE = re.compile(r"\b(?:FROM|JOIN) (\w+) (\w+)\b")
+_SQLITE_STEP_RE = re.compile(
+    r"^(SCAN|SEARCH)(?: TABLE)? (\w+)(?: AS (\w+))?(?: USING (AUTOMATIC )?(?:COVERING |PARTIAL )*INDEX(?: (\w+))? \(([^)]*)\))?"
+)
+
+
+@dataclass
+class Estimate:
+    """Planner estimate for one statement. rows is None when EXPLAIN failed or gave nothing usable."""
+    rows: int | None
+    full_scans: list[str] = field(default_factory=list)
+    plan: list[str] = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Estimation
+# ---------------------------------------------------------------------------
+
+
+def _rows_examined(steps: list[tuple[float, float]], one_time: float = 0.0) -> int:
+    """
+    Nested-loop estimate: each step is read once per row surviving the steps before it (rows, filtered %).
+    one_time covers reads done once per query (e.g. building a temporary index).
+    """
+    total = one_time
+    fanout = 1.0
+    for rows, filtered in steps:
+        total += fanout * rows
+        fanout *= max(rows * filtered / 100.0, 1.0)
+    return int(math.ceil(total))
+
+
+def _explain_mysql(conn: Any, sql: str, params: dict[str, Any]) -> Estimate:
+    result = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+    steps: list[tuple[float, float]] = []
+    est = Estimate(rows=None)
+    for r in result:
+        if r.get("table") is None or r.get("rows") is None:
+            continue
+        steps.append((float(r["rows"]), float(r.get("filtered") or 100.0)))
+        if r.get("type") == "ALL":
+            est.full_scans.append(str(r["table"]))
+        est.plan.append(f"{r['table']}: type={r.get('type')} key={r.get('key')} rows={r['rows']}")
+    est.rows = _rows_examined(steps) if steps else None
+    return est
+
+
+def _sqlite_stat_rows(conn: Any, index: str, eq_terms: int) -> float | None:
+    """Average rows per key prefix from sqlite_stat1 ("N a b ..."), if ANALYZE has run."""
+    try:
+        row = conn.execute(text("SELECT stat FROM sqlite_stat1 WHERE idx = :idx"), {"idx": index}).first()
+    except Exception:
+        return None
+    if row is None:
+        return None
+    fields = row[0].split()
+    return float(fields[min(eq_terms, len(fields) - 1)]) if len(fields) > 1 else None
+
+
+def _explain_sqlite(conn: Any, sql: str, params: dict[str, Any], table_rows: dict[str, int]) -> Estimate:
+    aliases = {alias: table for table, alias in _FROM_RE.findall(sql)}
+    est = Estimate(rows=None)
+    steps: list[tuple[float, float]] = []
+    one_time = 0.0
+
+    def count(table: str) -> float:
+        if table not in table_rows:
+            table_rows[table] = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() or 0
+        return float(table_rows[table])
+
+    for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params):
+        detail = str(row[-1])
+        est.plan.append(detail)
+        m = _SQLITE_STEP_RE.match(detail)
+        if not m:
+            continue
+        op, name, alias, automatic, index, terms = m.groups()
+        table = aliases.get(alias or name, name)
+        if op == "SCAN":
+            steps.append((count(table), 100.0))
+            est.full_scans.append(table)
+        elif automatic:
+            # No usable index: SQLite scans the table once to build a temporary one, then probes it.
+            one_time += count(table)
+            steps.append((_SQLITE_SEARCH_ROWS, 100.0))
+            est.full_scans.append(table)
+        else:
+            per_key = _sqlite_stat_rows(conn, index, (terms or "").count("=")) if index else 1.0
+            steps.append((per_key or _SQLITE_SEARCH_ROWS, 100.0))
+    est.rows = _rows_examined(steps, one_time) if steps else None
+    return est
+
+
+class CostEstimator:
+    """EXPLAIN once per distinct statement (i.e. per query shape); later requests of the shape reuse the estimate."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._estimates: OrderedDict[str, Estimate] = OrderedDict()
+        self._table_rows: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.explains = 0
+        self.rejected = 0
+        self.warned = 0
+
+    def cached(self, sql: str) -> Estimate | None:
+        with self._lock:
+            est = self._estimates.get(sql)
+            if est is not None:
+                self._estimates.move_to_end(sql)
+            return est
+
+    def _explain(self, conn: Any, sql: str, params: dict[str, Any]) -> Estimate:
+        if conn.dialect.name == "mysql":
+            return _explain_mysql(conn, sql, params)
+        if conn.dialect.name == "sqlite":
+            return _explain_sqlite(conn, sql, params, self._table_rows)
+        return Estimate(rows=None)
+
+    def estimate(self, sql: str, params: dict[str, Any]) -> Estimate:
+        """Cached estimate for sql, running EXPLAIN (with this request's params) on first sight. Fails open."""
+        est = self.cached(sql)
+        if est is not None:
+            return est
+        try:
+            est = run_on_connection(lambda conn: self._explain(conn, sql, params))
+        except Exception:
+            logger.exception("EXPLAIN failed; query allowed without a cost estimate")
+            est = Estimate(rows=None)
+        return self._store(sql, est)
+
+    async def estimate_async(self, sql: str, params: dict[str, Any]) -> Estimate:
+        """
+        estimate() on the active backend without blocking the loop: the async pool for DB_BACKEND=async, else
+        the sync pool in a worker thread. The caller holds a db admission slot (see run_request_async).
+        """
+        if settings.db_backend != "async":
+            return await asyncio.to_thread(self.estimate, sql, params)
+        est = self.cached(sql)
+        if est is not None:
+            return est
+        try:
+            est = await run_on_connection_async(lambda conn: self._explain(conn, sql, params))
+        except Exception:
+            logger.exception("EXPLAIN failed; query allowed without a cost estimate")
+            est = Estimate(rows=None)
+        return self._store(sql, est)
+
+    def _store(self, sql: str, est: Estimate) -> Estimate:
+        with self._lock:
+            self.explains += 1
+            self._estimates[sql] = est
+            while len(self._estimates) > self.max_entries:
+                self._estimates.popitem(last=False)
+        return est
+
+    def verdict(self, est: Estimate) -> tuple[str, str] | None:
+        """("reject" | "warn", message) when the estimate exceeds EXPLAIN_MAX_ROWS under the configured gate."""
+        if settings.explain_gate not in ("warn", "reject") or est.rows is None or est.rows <= settings.explain_max_rows:
+            return None
+        scans = f"; full scan: {', '.join(est.full_scans)}" if est.full_scans else ""
+        if settings.explain_gate == "reject":
+            with self._lock:
+                self.rejected += 1
+            return "reject", f"cost_exceeded: ~{est.rows} rows examined (budget {settings.explain_max_rows}){scans}"
+        with self._lock:
+            self.warned += 1
+        return "warn", f"cost_warning: ~{est.rows} rows examined (budget {settings.explain_max_rows}){scans}"
+
+    def expensive(self) -> list[dict[str, Any]]:
+        """Cached statements over budget, most expensive first (for the advisory report)."""
+        with self._lock:
+            items = [(sql, est) for sql, est in self._estimates.items()
+                     if est.rows is not None and est.rows > settings.explain_max_rows]
+        items.sort(key=lambda kv: kv[1].rows or 0, reverse=True)
+        return [{"sql": sql, "rows": est.rows, "full_scans": est.full_scans} for sql, est in items]
+
+    def clear(self) -> None:
+        """Drop estimates and table sizes (after data loads / rollup refresh)."""
+        with self._lock:
+            self._estimates.clear()
+            self._table_rows.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "gate": settings.explain_gate,
+                "max_rows": settings.explain_max_rows,
+                "cached": len(self._estimates),
+                "explains": self.explains,
+                "rejected": self.rejected,
+                "warned": self.warned,
+            }
+
+
+cost_estimator = CostEstimator(max_entries=settings.plan_cache_size)
+
+
+# ---------------------------------------------------------------------------
+# Index advisor
+# ---------------------------------------------------------------------------
+
+_index_report: dict[str, Any] | None = None
+
+
+def _covered(columns: tuple[str, ...], existing: list[list[str]]) -> str | None:
+    """Name-less check: an existing index (or PK) whose leading columns are exactly columns."""
+    for cols in existing:
+        if tuple(cols[: len(columns)]) == columns:
+            return ",".join(cols)
+    return None
+
+
+def advise_indexes() -> dict[str, Any]:
+    """
+    Compare existing indexes with RECOMMENDED_INDEXES and return {indexes: [...], ddl: [...], expensive_shapes: [...]}.
+    Missing composites are logged with the CREATE INDEX statement that fixes them.
+    """
+    global _index_report
+    inspector = inspect(get_engine())
+    entries: list[dict[str, Any]] = []
+    ddl: list[str] = []
+    for table, wanted in RECOMMENDED_INDEXES.items():
+        try:
+            existing = [list(ix["column_names"]) for ix in inspector.get_indexes(table)]
+            pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        except Exception as e:
+            entries.append({"table": table, "status": "unavailable", "error": f"{type(e).__name__}: {e}"})
+            continue
+        if pk:
+            existing.append(list(pk))
+        for columns in wanted:
+            match = _covered(columns, existing)
+            entry = {"table": table, "columns": list(columns), "status": "present" if match else "missing"}
+            if match:
+                entry["index_columns"] = match
+            else:
+                stmt = f"CREATE INDEX ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+                entry["ddl"] = stmt
+                ddl.append(stmt)
+                logger.warning("index advisor: %s (%s) missing; suggested: %s", table, ", ".join(columns), stmt)
+            entries.append(entry)
+    _index_report = {"indexes": entries, "ddl": ddl, "expensive_shapes": cost_estimator.expensive()}
+    return _index_report
+
+
+def index_report() -> dict[str, Any] | None:
+    """Last advisory report, with expensive shapes seen since startup."""
+    if _index_report is None:
+        return None
+    return {**_index_report, "expensive_shapes": cost_estimator.expensive()}
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(advise_indexes(), indent=2))
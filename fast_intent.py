@@ -0,0 +1,264 @@
+"""Deterministic fast-path intent parser: template-shaped questions → SQLRequest without the LLM."""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import text
+
+from config import settings
+from intent_cache import normalize_question
+from schemas import SQLRequest
+
+logger = logging.getLogger(__name__)
+
+_AGG_WORDS = {
+    "average": "avg", "avg": "avg", "mean": "avg", "typical": "avg",
+    "max": "max", "maximum": "max", "highest": "max",
+    "min": "min", "minimum": "min", "lowest": "min",
+    "total": "sum", "sum": "sum",
+    "count": "count",
+}
+# Statistics, comparisons and negations the templates cannot express: the LLM answers these (or says it cannot).
+# A negated location or title ("not in ventura", "non engineer") would otherwise match as its opposite.
+_UNSUPPORTED_WORDS = {
+    "median", "medians", "percentile", "percentiles", "quartile", "quartiles", "quantile", "quantiles", "mode",
+    "stddev", "std", "deviation", "variance", "spread", "range", "distribution", "histogram", "ratio",
+    "difference", "compare", "compared", "versus", "vs", "growth", "increase", "change", "trend",
+    "not", "non", "no", "nor", "neither", "without", "excluding", "exclude", "excludes", "except", "outside",
+    "other", "others", "besides", "isn", "aren", "don", "doesn",
+}
+_MEASURE_WORDS = {"salary", "salaries", "pay", "wage", "wages", "amount", "amounts", "compensation", "earnings", "step", "steps"}
+_DIM_WORDS = {
+    "grade": "grade", "grades": "grade",
+    "title": "title", "titles": "title",
+    "jobcode": "job_code", "jobcodes": "job_code", "code": "job_code", "codes": "job_code",
+    "jurisdiction": "jurisdiction", "jurisdictions": "jurisdiction", "county": "jurisdiction",
+    "counties": "jurisdiction", "location": "jurisdiction", "locations": "jurisdiction",
+}
+_LIST_NOUNS = {"titles", "title", "jobs", "job", "positions", "roles"}
+# Words that carry no meaning beyond what the templates already capture.
+_FILLER = {
+    "what", "whats", "which", "is", "are", "the", "a", "an", "of", "in", "at", "for", "me", "show", "list",
+    "give", "get", "find", "all", "across", "each", "per", "by", "and", "please", "tell", "there", "do",
+    "does", "to", "from", "with", "job", "jobs", "title", "titles", "positions", "roles", "paid", "paying",
+} | _MEASURE_WORDS
+
+_HOW_MANY_RE = re.compile(r"\b(?:how many|number of)\b")
+_BY_RE = re.compile(r"\b(?:by|per|for each|broken down by) (job code|[a-z]+)\b")
+_RANK_RE = re.compile(r"\b(?:(\d{1,3}) )?(top|highest|best|lowest|least|worst)(?: (\d{1,3}))? (?:paid|paying)\b")
+_LIMIT_RE = re.compile(r"\b(?:list|show|give me|get|top|first)(?: me)?(?: the)?(?: top| first)? (\d{1,3})\b|\b(\d{1,3}) (?:[a-z]+ )?(?:job titles|titles|jobs|positions|roles)\b")
+_TITLE_FOR_RE = re.compile(r"\b(?:for|of) (?:an |a |the )?([a-z]+(?: [a-z]+)??)(?: (?:jobs?|titles?|positions?|roles?))?(?= in\b| by\b| per\b|$)")
+_TITLE_NOUN_RE = re.compile(r"\b([a-z]+) (?:jobs|titles|positions|roles)\b")
+
+
+@dataclass
+class FastIntent:
+    """Parse result: request, share of question tokens understood, and the tokens that were not."""
+    request: SQLRequest
+    confidence: float
+    unknown: list[str] = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Jurisdiction vocabulary (from the data, plus configured aliases)
+# ---------------------------------------------------------------------------
+
+_aliases: dict[str, str] | None = None
+_lock = threading.Lock()
+
+
+def _configured_aliases() -> dict[str, str]:
+    """FAST_INTENT_ALIASES "san diego=sdcounty,..." keyed with spaces removed."""
+    out: dict[str, str] = {}
+    for item in settings.fast_intent_aliases.split(","):
+        name, sep, code = item.partition("=")
+        if sep and name.strip() and code.strip():
+            out[name.replace(" ", "").lower()] = code.strip()
+    return out
+
+
+def set_jurisdictions(values: list[str]) -> None:
+    """Install the known jurisdiction codes (matched case-insensitively, spaces ignored)."""
+    global _aliases
+    aliases = {v.replace(" ", "").lower(): v for v in values if v}
+    for name, code in _configured_aliases().items():
+        if code in values:
+            aliases.setdefault(name, code)
+    with _lock:
+        _aliases = aliases
+
+
+def load_jurisdictions() -> list[str]:
+    """Read distinct jurisdiction values from the active backend and install them. Call at startup / after reloads."""
+    if settings.db_backend == "local":
+        from columnar import get_store
+
+        values = [v for v in get_store().dims["jurisdiction"].values if v is not None]
+    else:
+        from db_router import query_each_shard
+
+        def load(engine: Any) -> list[str]:
+            with engine.connect() as conn:
+                rows = conn.execute(text("SELECT DISTINCT jurisdiction FROM job_descriptions"))
+                return [r[0] for r in rows if r[0] is not None]
+
+        values = list(dict.fromkeys(v for shard in query_each_shard(load) for v in shard))
+    set_jurisdictions(values)
+    logger.info("fast intent: %d jurisdictions loaded", len(values))
+    return values
+
+
+def _match_jurisdictions(tokens: list[str], used: list[bool], aliases: dict[str, str]) -> list[str]:
+    """Longest-first n-gram match of tokens (joined without spaces) against the vocabulary."""
+    found: list[str] = []
+    for n in (4, 3, 2, 1):
+        for i in range(len(tokens) - n + 1):
+            if any(used[i:i + n]):
+                continue
+            key = "".join(tokens[i:i + n])
+            code = aliases.get(key) or (aliases.get(key[: -len("county")]) if key.endswith("county") else None)
+            if code:
+                for j in range(i, i + n):
+                    used[j] = True
+                if code not in found:
+                    found.append(code)
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+
+def _consume(q: str, span: tuple[int, int]) -> str:
+    """Blank out a matched span so its words are not parsed (or counted unknown) twice."""
+    return q[: span[0]] + " " * (span[1] - span[0]) + q[span[1]:]
+
+
+def _title_term(phrase: str) -> str | None:
+    words = phrase.split()
+    if not words or any(w in _FILLER or w in _AGG_WORDS or w in _DIM_WORDS or w.isdigit() for w in words):
+        return None
+    term = " ".join(words)
+    return term[:-1] if term.endswith("s") and not term.endswith("ss") else term
+
+
+def parse(question: str) -> FastIntent | None:
+    """
+    Recognize aggregate / list templates ("List 5 job titles in Ventura", "max pay by grade in San Bernardino",
+    "average salary for engineer in Ventura"). Returns None when no template applies, the vocabulary is not
+    loaded, or the question asks for something the templates would silently drop (an unsupported statistic such
+    as median, a negation such as "not in ventura", a number that no template used): a wrong confident answer
+    costs more than the LLM call.
+    """
+    with _lock:
+        aliases = _aliases
+    if aliases is None:
+        return None
+
+    q = normalize_question(question)
+    tokens = q.split()
+    if not tokens or any(t in _UNSUPPORTED_WORDS for t in tokens):
+        return None
+    used = [False] * len(tokens)
+    locations = _match_jurisdictions(tokens, used, aliases)
+    q = " ".join(" " * len(t) if u else t for t, u in zip(tokens, used))
+
+    aggs: list[str] = []
+    dims: list[str] = []
+    rank_agg: str | None = None  # "highest / lowest paid": the metric to rank by when no aggregate is named
+    order_dir: str | None = None
+    limit: int | None = None
+    titles: list[str] = []
+    signal = False
+
+    m = _RANK_RE.search(q)
+    if m:
+        rank_agg = "min" if m.group(2) in ("lowest", "least", "worst") else "max"
+        order_dir = "asc" if rank_agg == "min" else "desc"
+        if m.group(1) or m.group(3):
+            limit = int(m.group(1) or m.group(3))
+        q = _consume(q, m.span())
+        signal = True
+
+    m = _HOW_MANY_RE.search(q)
+    if m:
+        aggs.append("count")
+        q = _consume(q, m.span())
+        signal = True
+
+    for m in list(_BY_RE.finditer(q)):
+        dim = _DIM_WORDS.get(m.group(1).replace(" ", ""))
+        if dim:
+            dims.append(dim)
+            q = _consume(q, m.span())
+
+    m = _LIMIT_RE.search(q)
+    if m:
+        limit = int(m.group(1) or m.group(2))
+        q = _consume(q, m.span() if m.group(1) else m.span(2))  # keep "titles" in "5 job titles" for the list check
+        signal = True
+
+    for pattern in (_TITLE_FOR_RE, _TITLE_NOUN_RE):
+        m = pattern.search(q)
+        term = _title_term(m.group(1)) if m else None
+        if term:
+            titles.append(term)
+            q = _consume(q, m.span(1))
+            break
+
+    words = q.split()
+    for w in words:
+        if w in _AGG_WORDS and _AGG_WORDS[w] not in aggs:
+            aggs.append(_AGG_WORDS[w])
+            signal = True
+        elif w in _MEASURE_WORDS or w in _LIST_NOUNS:
+            signal = True
+    if not signal:
+        return None
+    if any(w.isdigit() for w in words):
+        return None  # a number no template consumed (a limit in an unexpected place, a year, ...)
+
+    unknown = [w for w in words if w not in _FILLER and w not in _AGG_WORDS]
+    confidence = 1.0 - len(unknown) / len(tokens)
+
+    # "titles" / "positions" always mean per-title rows; "jobs" only with a list verb or count ("list 5 jobs").
+    lists_titles = bool(titles) or any(w in ("titles", "title", "positions", "roles") for w in words) or (
+        "jobs" in words and (limit is not None or any(w in ("list", "show") for w in words))
+    )
+    dimensions = ["jurisdiction"]
+    if dims:
+        dimensions += [d for d in dims if d != "jurisdiction"]
+    elif lists_titles:
+        dimensions.append("title")
+    # A named aggregate wins over the rank's implied one: "average salary of the 5 lowest paid titles" ranks by avg.
+    aggs = aggs or ([rank_agg] if rank_agg else ["avg"])
+    raw = {
+        "version": "v1",
+        "dataset": "gov_jobs",
+        "metrics": [{"name": "amount", "agg": a} for a in aggs],
+        "dimensions": dimensions,
+        "filters": {"location": locations or None, "job_title_contains": titles or None},
+        "limit": limit or settings.default_limit,
+        "order_by": [{"field": f"{aggs[0]}_amount", "dir": order_dir}] if order_dir else [],
+    }
+    try:
+        req = SQLRequest.model_validate(raw)
+    except ValidationError:
+        return None
+    return FastIntent(request=req, confidence=round(confidence, 3), unknown=unknown)
+
+
+def fast_request(question: str) -> SQLRequest | None:
+    """SQLRequest when the fast path is enabled and confident enough; None means ask the LLM."""
+    if not settings.fast_intent_enabled:
+        return None
+    result = parse(question)
+    if result is None or result.confidence < settings.fast_intent_min_confidence:
+        return None
+    return result.request
@@ -0,0 +1,351 @@
+"""
+CSV ingest for gov_jobs: dated exports (<table>_<YYYYmmddHHMM>.csv) → staging tables → atomic swap, versioned.
+
+    python ingest.py [DATA_DIR] [--force]
+
+Each table's newest export is streamed in INGEST_CHUNK_ROWS batches of multi-row inserts into <table>__staging,
+then every changed table is swapped in with one rename (readers see the old or the new data, never a mix) and
+dataset_versions records the load. Files whose sha256 matches the last load are skipped. Running servers poll
+dataset_versions and rebuild their caches and derived structures when the version moves (reload()).
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import glob
+import hashlib
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from db import get_engine
+from sql_builder import ALLOWED_DATASETS
+
+logger = logging.getLogger(__name__)
+
+# Tables behind gov_jobs; each is loaded from its own <table>_*.csv export.
+TABLES: tuple[str, ...] = tuple(ALLOWED_DATASETS["gov_jobs"]["tables"])
+
+_VERSIONS_DDL = (
+    "CREATE TABLE IF NOT EXISTS dataset_versions ("
+    "version BIGINT NOT NULL, table_name VARCHAR(64) NOT NULL, source VARCHAR(255) NOT NULL, "
+    "checksum CHAR(64) NOT NULL, row_count BIGINT NOT NULL, loaded_at DOUBLE PRECISION NOT NULL, "
+    "PRIMARY KEY (version, table_name))"
+)
+_VERSION_ATTEMPTS = 3  # MySQL: claims of the next version that may collide on the primary key before giving up
+
+
+@dataclass
+class IngestResult:
+    """Outcome of one ingest run. version is unchanged when every file was skipped."""
+    version: int
+    loaded: dict[str, int] = field(default_factory=dict)  # table → rows
+    skipped: list[str] = field(default_factory=list)
+    elapsed_ms: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Sources and versions
+# ---------------------------------------------------------------------------
+
+
+def latest_export(data_dir: str, table: str) -> str | None:
+    """Newest <table>_<YYYYmmddHHMM>.csv in data_dir (names sort chronologically), or None."""
+    files = sorted(glob.glob(os.path.join(data_dir, f"{table}_*.csv")))
+    return files[-1] if files else None
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_versions(conn: Connection) -> dict[str, dict[str, Any]]:
+    """Latest load per table: {table: {version, checksum, source, row_count, loaded_at}} ({} before any load)."""
+    if not inspect(conn).has_table("dataset_versions"):
+        return {}
+    rows = conn.execute(text(
+        "SELECT table_name, version, checksum, source, row_count, loaded_at FROM dataset_versions v "
+        "WHERE version = (SELECT MAX(version) FROM dataset_versions w WHERE w.table_name = v.table_name)"
+    ))
+    return {
+        r.table_name: {"version": int(r.version), "checksum": r.checksum, "source": r.source,
+                       "row_count": int(r.row_count), "loaded_at": float(r.loaded_at)}
+        for r in rows
+    }
+
+
+def dataset_version() -> int:
+    """Current data version on the primary (0 before the first ingest). Compare against a cached value to invalidate."""
+    with get_engine().connect() as conn:
+        return max((v["version"] for v in read_versions(conn).values()), default=0)
+
+
+# ---------------------------------------------------------------------------
+# Staging load and swap
+# ---------------------------------------------------------------------------
+
+
+def _chunks(rows: Iterator[list[str]], size: int) -> Iterator[list[list[str]]]:
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+def _create_staging(conn: Connection, table: str, staging: str) -> list[str]:
+    """Empty copy of table's definition. Returns the SQLite index DDL to re-create after the swap."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    if conn.dialect.name == "mysql":
+        conn.execute(text(f"CREATE TABLE {staging} LIKE {table}"))  # keeps indexes
+        return []
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"), {"t": table}).scalar_one()
+    conn.execute(text(re.sub(rf"^CREATE TABLE\s+[\"`]?{table}[\"`]?", f"CREATE TABLE {staging}", ddl, count=1)))
+    # SQLite index names are schema-wide: they are re-created on the swapped-in table.
+    return list(conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"
+    ), {"t": table}).scalars())
+
+
+def _load_staging(conn: Connection, table: str, staging: str, path: str) -> int:
+    """Stream path into staging in multi-row insert batches. Header names must be columns of table."""
+    known = {c["name"] for c in inspect(conn).get_columns(table)}
+    with open(path, newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"{path}: empty export")
+        unknown = [c for c in header if c not in known]
+        if unknown:
+            raise ValueError(f"{path}: columns not in {table}: {', '.join(unknown)}")
+        marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+        insert = f"INSERT INTO {staging} ({', '.join(header)}) VALUES ({', '.join([marker] * len(header))})"
+        n = 0
+        for chunk in _chunks(reader, settings.ingest_chunk_rows):
+            # Positional tuples straight to the driver (its executemany batches into multi-row INSERTs on MySQL);
+            # empty CSV field → NULL.
+            conn.exec_driver_sql(insert, [tuple(v if v != "" else None for v in row) for row in chunk])
+            n += len(chunk)
+    return n
+
+
+def _swap(conn: Connection, tables: list[str], index_ddl: list[str]) -> None:
+    """Replace every table with its staging copy in one step."""
+    if conn.dialect.name == "mysql":
+        for t in tables:  # left behind by an ingest that died between the rename and the drop
+            conn.execute(text(f"DROP TABLE IF EXISTS {t}__old"))
+        # One RENAME TABLE swaps all tables atomically; readers never see a missing or half-loaded table.
+        pairs = [p for t in tables for p in (f"{t} TO {t}__old", f"{t}__staging TO {t}")]
+        conn.execute(text(f"RENAME TABLE {', '.join(pairs)}"))
+        for t in tables:
+            conn.execute(text(f"DROP TABLE {t}__old"))
+        return
+    # SQLite: DDL is transactional (db._sqlite_begin opens the transaction), so drops, renames, index builds and
+    # the version recorded after them commit together.
+    for t in tables:
+        conn.execute(text(f"DROP TABLE {t}"))
+        conn.execute(text(f"ALTER TABLE {t}__staging RENAME TO {t}"))
+    for ddl in index_ddl:
+        conn.execute(text(ddl))
+
+
+def _record_version(conn: Connection, pending: dict[str, tuple[str, str]], loaded: dict[str, int],
+                    loaded_at: float) -> int:
+    """
+    Record pending's loads under the next dataset version and return it. The version is read in the same
+    transaction under a lock (FOR UPDATE on MySQL; on SQLite the caller's swap already holds the write lock),
+    so concurrent ingests never claim the same one.
+    """
+    lock = " FOR UPDATE" if conn.dialect.name == "mysql" else ""
+    version = int(conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM dataset_versions{lock}")).scalar_one()) + 1
+    conn.execute(
+        text(
+            "INSERT INTO dataset_versions (version, table_name, source, checksum, row_count, loaded_at) "
+            "VALUES (:version, :table_name, :source, :checksum, :row_count, :loaded_at)"
+        ),
+        [
+            {"version": version, "table_name": table, "source": os.path.basename(path),
+             "checksum": checksum, "row_count": loaded[table], "loaded_at": loaded_at}
+            for table, (path, checksum) in pending.items()
+        ],
+    )
+    return version
+
+
+def ingest(data_dir: str | None = None, force: bool = False) -> IngestResult:
+    """
+    Load the newest export of each table whose checksum changed since its last load (all of them with force),
+    swap them in together and record a new dataset version. Writes to the primary (DATABASE_URL).
+    """
+    start = time.perf_counter()
+    data_dir = data_dir or settings.ingest_data_dir
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(text(_VERSIONS_DDL))
+        previous = read_versions(conn)
+    version = max((v["version"] for v in previous.values()), default=0)
+    result = IngestResult(version=version)
+
+    pending: dict[str, tuple[str, str]] = {}  # table → (path, checksum)
+    for table in TABLES:
+        path = latest_export(data_dir, table)
+        if path is None:
+            raise FileNotFoundError(f"no {table}_*.csv in {data_dir}")
+        checksum = file_checksum(path)
+        if not force and previous.get(table, {}).get("checksum") == checksum:
+            result.skipped.append(table)
+            continue
+        pending[table] = (path, checksum)
+    if not pending:
+        result.elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return result
+
+    index_ddl: list[str] = []
+    with engine.begin() as conn:
+        for table, (path, _) in pending.items():
+            index_ddl += _create_staging(conn, table, f"{table}__staging")
+            result.loaded[table] = _load_staging(conn, table, f"{table}__staging", path)
+
+    loaded_at = time.time()
+    with engine.begin() as conn:
+        _swap(conn, list(pending), index_ddl)
+        if conn.dialect.name != "mysql":  # SQLite: the version commits with the swap
+            result.version = _record_version(conn, pending, result.loaded, loaded_at)
+    if engine.dialect.name == "mysql":
+        # RENAME TABLE commits implicitly, so the version gets a transaction of its own. FOR UPDATE serializes
+        # concurrent claims; the (version, table_name) key rejects one that slipped through, which claims again.
+        for attempt in range(1, _VERSION_ATTEMPTS + 1):
+            try:
+                with engine.begin() as conn:
+                    result.version = _record_version(conn, pending, result.loaded, loaded_at)
+                break
+            except IntegrityError:
+                if attempt == _VERSION_ATTEMPTS:
+                    raise
+    result.elapsed_ms = int((time.perf_counter() - start) * 1000)
+    logger.info("ingest: version %d, loaded %s, skipped %s in %d ms",
+                result.version, result.loaded, result.skipped, result.elapsed_ms)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Reload hooks (running servers)
+# ---------------------------------------------------------------------------
+
+_seen: dict[str, int] = {}  # table → version this process has caught up with
+_lock = threading.Lock()
+_stats: dict[str, Any] = {"polls": 0, "reloads": 0, "poll_errors": 0, "last_reload_at": None}
+
+
+def reload(tables: Iterable[str]) -> None:
+    """
+    Bring this process up to date after tables were reloaded: rollups, plans, cost estimates, title index,
+    sample and jurisdiction vocabulary are rebuilt, then cached results on those tables are dropped.
+    One failing step is logged and does not stop the others.
+    """
+    from columnar import reload_store
+    from explain import cost_estimator
+    from fast_intent import load_jurisdictions
+    from result_cache import result_cache
+    from rollups import refresh_rollups
+    from sampling import build_sample, sample_stats
+    from sql_builder import clear_plan_cache
+    from title_index import build_title_index
+
+    tables = list(tables)
+    steps = [
+        (settings.db_backend == "local", reload_store),
+        (settings.db_backend != "local" and settings.rollups_enabled, refresh_rollups),
+        (True, clear_plan_cache),
+        (True, cost_estimator.clear),
+        (settings.db_backend != "local" and settings.title_index_enabled, build_title_index),
+        # the sample is built on the first approx request; until then there is nothing to rebuild
+        (settings.db_backend != "local" and settings.approx_enabled and sample_stats()["built"], build_sample),
+        (settings.fast_intent_enabled, load_jurisdictions),
+        (True, lambda: result_cache.invalidate_tables(tables)),  # last: nothing rebuilt above re-caches old rows
+    ]
+    for enabled, step in steps:
+        if not enabled:
+            continue
+        try:
+            step()
+        except Exception:
+            logger.exception("reload of %s: %s failed", tables, getattr(step, "__name__", step))
+    with _lock:
+        _stats["reloads"] += 1
+        _stats["last_reload_at"] = time.time()
+    logger.info("reloaded after ingest of %s", tables)
+
+
+def _current_versions() -> dict[str, int]:
+    with get_engine().connect() as conn:
+        return {t: v["version"] for t, v in read_versions(conn).items()}
+
+
+def _changed_tables() -> list[str]:
+    """Tables whose version moved since this process last looked (records the new versions)."""
+    current = _current_versions()
+    with _lock:
+        changed = [t for t, v in current.items() if _seen.get(t, 0) != v]
+        _seen.update(current)
+    return changed
+
+
+def mark_current() -> None:
+    """Record the versions this process starts from (startup builds everything, so nothing to reload)."""
+    current = _current_versions()
+    with _lock:
+        _seen.clear()
+        _seen.update(current)
+
+
+async def version_poll_loop(
+    interval_sec: float, on_reload: Callable[[list[str]], Awaitable[Any]] | None = None
+) -> None:
+    """
+    Background task: poll dataset_versions and reload() when another process ingested new data, then await
+    on_reload(tables) (e.g. cache prewarming).
+    """
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            changed = await asyncio.to_thread(_changed_tables)
+            if changed:
+                await asyncio.to_thread(reload, changed)
+                if on_reload is not None:
+                    await on_reload(changed)
+        except Exception:
+            logger.exception("dataset version poll failed")
+            with _lock:
+                _stats["poll_errors"] += 1
+        with _lock:
+            _stats["polls"] += 1
+
+
+def ingest_stats() -> dict[str, Any]:
+    with _lock:
+        return {"versions": dict(_seen), "poll_interval_sec": settings.ingest_poll_interval_sec, **_stats}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", nargs="?", default=None, help="directory of dated exports (INGEST_DATA_DIR)")
+    parser.add_argument("--force", action="store_true", help="reload even when checksums are unchanged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    out = ingest(args.data_dir, force=args.force)
+    print(json.dumps({"version": out.version, "loaded": out.loaded, "skipped": out.skipped, "elapsed_ms": out.elapsed_ms}))
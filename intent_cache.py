@@ -0,0 +1,129 @@
+"""Intent cache: normalized question → validated SQLRequest (LRU + TTL, single-flight). No LLM here."""
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from config import settings
+from schemas import SQLRequest
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Cache key: lowercase, punctuation removed, whitespace collapsed."""
+    q = _PUNCT_RE.sub(" ", question.lower())
+    return _SPACE_RE.sub(" ", q).strip()
+
+
+class IntentCache:
+    """
+    LRU + TTL cache of SQLRequest keyed by normalized question.
+    Concurrent misses for the same key share one in-flight loader call.
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float, max_question_chars: int) -> None:
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.max_question_chars = max_question_chars
+        self._entries: OrderedDict[str, tuple[float, SQLRequest]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[SQLRequest]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.reloads = 0  # waiters that loaded again after the loading caller was cancelled
+        self.evictions = 0
+
+    def get(self, key: str) -> SQLRequest | None:
+        """Return a copy of the cached request, or None if missing/expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, req = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return req.model_copy(deep=True)
+
+    def put(self, key: str, req: SQLRequest) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_sec, req.model_copy(deep=True))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_load(
+        self,
+        question: str,
+        loader: Callable[[], Awaitable[SQLRequest]],
+    ) -> tuple[SQLRequest, str]:
+        """
+        Return (request, status). status is one of: hit, miss, coalesced, bypass.
+        Loader errors are not cached and propagate to every waiter. When the loading caller is cancelled
+        (disconnect, its own deadline), waiters are not: the first of them loads again, under its own deadline.
+        """
+        key = normalize_question(question)
+        if self.max_entries <= 0 or not key or len(key) > self.max_question_chars:
+            return await loader(), "bypass"
+
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, "hit"
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            req = await asyncio.shield(pending)
+            if req is not None:
+                return req.model_copy(deep=True), "coalesced"
+            self.reloads += 1  # the loader was cancelled: not an answer for this caller
+
+        self.misses += 1
+        # Result None = the loading caller was cancelled; waiters retry.
+        fut: asyncio.Future[SQLRequest | None] = asyncio.get_running_loop().create_future()
+        # Followers may not exist; mark exceptions as retrieved to avoid loop warnings.
+        fut.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = fut
+        try:
+            req = await loader()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                fut.set_exception(e)
+            else:
+                fut.set_result(None)
+            raise
+        else:
+            self.put(key, req)
+            fut.set_result(req)
+            return req, "miss"
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+        }
+
+
+intent_cache = IntentCache(
+    max_entries=settings.intent_cache_max_entries if settings.intent_cache_enabled else 0,
+    ttl_sec=settings.intent_cache_ttl_sec,
+    max_question_chars=settings.intent_cache_max_question_chars,
+)
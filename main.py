@@ -1,18 +1,57 @@
 """FastAPI + MCP server. Exposes sql_agent: natural language → LLM intent → deterministic SQL."""
 import asyncio
+import json
+import logging
+import time
 import uuid
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Any, Awaitable, Callable, Literal, Optional
+
+_IMPORT_STARTED = time.perf_counter()  # app import timing (third-party and app modules), see startup.py
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.transport_security import TransportSecuritySettings
 from pydantic import Field
 
+from admission import Overloaded, admission_stats, db_limiter, llm_limiter
+from batch import run_batch
+from columnar import get_store
 from config import settings
-from orchestrator import question_to_sql_request
-from sql_runner import run_request
+from db import (
+    dispose_async_engine,
+    health_check_loop,
+    pool_stats,
+    prime_connection,
+    prime_connection_async,
+    warmup,
+    warmup_async,
+)
+from db_router import router_stats
+from encoding import encode_columnar, tool_result
+from explain import advise_indexes, cost_estimator, index_report
+from fast_intent import fast_request, load_jurisdictions
+from ingest import ingest_stats, mark_current, version_poll_loop
+from intent_cache import intent_cache
+from metrics import record_request, render_prometheus, request_timings, stage, timings_ms
+from orchestrator import close_llm, llm_stats, question_to_sql_request_async, warm_llm
+from paging import decode_token, stream_page
+from profiling import profile_call, profile_stats
+from request_log import log_request, prewarm, request_log, request_log_stats
+from resilience import CircuitOpen, DeadlineExceeded, breaker_stats, db_breaker, request_deadline, within
+from result_cache import result_cache
+from rollups import refresh_rollups
+from sampling import sample_stats
+from schemas import SQLRequest, SQLResponse
+from sql_builder import plan_cache_info
+from sql_runner import run_request, run_request_async
+from startup import Step, startup
+from title_index import build_title_index, title_index_stats
+
+logger = logging.getLogger(__name__)
+startup.imported(_IMPORT_STARTED)
 
 mcp = FastMCP(
     settings.mcp_name,
@@ -57,6 +96,105 @@ def _metadata(sql: str | None = None) -> dict:
     return {"sql": sql or ""}
 
 
+async def _run(req: SQLRequest, request_id: str) -> SQLResponse:
+    """
+    Execute on the configured backend: in-process columnar store, else the async engine or the sync engine in a
+    worker thread behind the db admission limit (raises Overloaded).
+    """
+    if settings.db_backend == "local":
+        return run_request(req, request_id)  # microseconds; no thread hop
+    return await run_request_async(req, request_id)
+
+
+_primes: set[asyncio.Task] = set()
+
+
+def _speculative_checkout() -> None:
+    """Ping a pooled connection in the background while the LLM runs (at most one in flight)."""
+    if not settings.db_speculative_checkout or settings.db_backend == "local" or _primes:
+        return
+    if settings.db_backend == "async":
+        task = asyncio.create_task(prime_connection_async())
+    else:
+        task = asyncio.create_task(asyncio.to_thread(prime_connection))
+    _primes.add(task)
+    task.add_done_callback(_primes.discard)
+
+
+async def _llm_intent(question: str, request_id: str, session_id: Optional[str]) -> SQLRequest:
+    async with llm_limiter.slot():
+        _speculative_checkout()
+        return await question_to_sql_request_async(question, request_id, session_id)
+
+
+async def _intent(question: str, request_id: str, session_id: Optional[str]) -> tuple[SQLRequest, str, str]:
+    """
+    Question → SQLRequest: template fast path, else the intent cache (LLM on miss).
+    Returns (request, cache status, path) with path "fast", "cache" or "llm".
+    """
+    with stage("intent"):
+        req = fast_request(question)
+        if req is not None:
+            return req, "bypass", "fast"
+        async with within("intent"):  # also bounds waiting on another request's in-flight load
+            req, status = await intent_cache.get_or_load(question, lambda: _llm_intent(question, request_id, session_id))
+        return req, status, "llm" if status in ("miss", "bypass") else "cache"
+
+
+# Fail-fast errors: the request was shed, not attempted, so the batch tool reports them for the whole batch.
+_SHED = (Overloaded, CircuitOpen, DeadlineExceeded)
+
+
+def _error_meta(e: BaseException) -> dict:
+    """
+    Metadata for an error envelope: overloaded (shed by admission control), circuit_open (dependency breaker
+    open) or deadline_exceeded (time budget ran out), each with the details a client needs to back off.
+    """
+    if isinstance(e, Overloaded):
+        return {"overloaded": e.as_dict()}
+    if isinstance(e, CircuitOpen):
+        return {"circuit_open": e.as_dict()}
+    if isinstance(e, DeadlineExceeded):
+        return {"deadline_exceeded": e.as_dict()}
+    return {}
+
+
+def _profile_requested(flag: bool, ctx: Context) -> bool:
+    """profile=true, or an X-Profile: 1 header on the HTTP request carrying the call (PROFILE_ENABLED only)."""
+    if flag or not settings.profile_enabled:
+        return flag
+    try:
+        request = ctx.request_context.request
+    except ValueError:  # called outside an MCP request
+        return False
+    headers = getattr(request, "headers", None)
+    return headers is not None and headers.get("x-profile", "").lower() in ("1", "true", "yes")
+
+
+def _profile_meta(prof: Any) -> dict:
+    return {"profile": prof.info()} if prof is not None else {}
+
+
+def _cache_hits(intent_status: str | None, resp: SQLResponse | None) -> tuple[str, ...]:
+    hits = ("intent",) if intent_status in ("hit", "coalesced") else ()
+    return hits + ("result",) if resp is not None and resp.cache_hit else hits
+
+
+def _answer_and_dump(resp: SQLResponse, response_format: str = "rows") -> tuple[str, dict]:
+    """
+    Text answer (format stage) and metadata payload (serialize stage). "columnar" replaces columns/rows with
+    encode_columnar's arrays under "table", built in one pass without copying rows through model_dump.
+    """
+    with stage("format"):
+        answer = _format_answer(resp.columns, resp.rows) if resp.ok else "No results."
+    with stage("serialize"):
+        if response_format == "columnar":
+            payload = {**resp.model_dump(exclude={"columns", "rows"}), "table": encode_columnar(resp.columns, resp.rows)}
+        else:
+            payload = resp.model_dump()
+    return answer, payload
+
+
 # ---------------------------------------------------------------------------
 # sql_agent: question → LLM intent → SQLRequest → run_request
 # ---------------------------------------------------------------------------
@@ -67,32 +205,414 @@ async def sql_agent(
     question: str = Field(..., description="Natural language question (e.g. List 5 job titles in Ventura)"),
     request_id: Optional[str] = Field(None, description="Optional request id for tracing"),
     session_id: Optional[str] = Field(None, description="Optional session id for correlation"),
+    response_format: Literal["rows", "columnar"] = Field(
+        "rows",
+        description='"columnar": metadata.table = {columns, row_count, values (one array per column), '
+        "dictionaries (repeated strings; values hold indexes)} instead of metadata.columns/rows",
+    ),
+    budget_ms: Optional[int] = Field(
+        None, ge=1, description="Time budget for the whole call (intent, queueing, execution); default REQUEST_BUDGET_MS"
+    ),
+    profile: bool = Field(
+        False, description="Sample this call's stacks into a profile file (metadata.profile.path); needs PROFILE_ENABLED"
+    ),
+    ctx: Context = None,
 ) -> dict:
     """
     MCP tool: natural language question → LLM intent (SQLRequest) → deterministic SQL.
     Input must include "question". Response: { metadata: { sql, ... }, error: null, data: { question, answer } }
     """
     request_id = request_id or str(uuid.uuid4())
+    started = time.perf_counter()
+
+    with (
+        request_timings() as timings,
+        request_deadline(budget_ms),
+        profile_call(request_id, "sql_agent", _profile_requested(profile, ctx)) as prof,
+    ):
+        try:
+            req, intent_status, intent_path = await _intent(question, request_id, session_id)
+            resp = await _run(req, request_id)
+            answer, payload = _answer_and_dump(resp, response_format)
+            extra = {
+                "version": settings.app_version,
+                "request_id": request_id,
+                "intent_path": intent_path,
+                "intent_cache": {"status": intent_status, **intent_cache.stats()},
+                **payload,
+                "timings_ms": timings_ms(timings),
+                **_profile_meta(prof),
+            }
+            record_request(
+                "sql_agent",
+                time.perf_counter() - started,
+                error_kind=None if resp.ok else "sql",
+                truncated="truncated_to_limit" in resp.warnings,
+                cache_hits=_cache_hits(intent_status, resp),
+                intent_path=intent_path,
+            )
+            log_request("sql_agent", request_id, question, req, resp, intent_path, extra["timings_ms"],
+                        time.perf_counter() - started)
+            envelope = _envelope(question, answer, resp.query, extra, error=None)
+            # Columnar results are JSON-encoded once here (orjson) rather than re-walked by FastMCP.
+            return tool_result(envelope) if response_format == "columnar" else envelope
+        except Exception as e:
+            record_request("sql_agent", time.perf_counter() - started, error_kind=type(e).__name__)
+            meta = {
+                "version": settings.app_version,
+                "request_id": request_id,
+                "timings_ms": timings_ms(timings),
+                **_error_meta(e),
+                **_profile_meta(prof),
+            }
+            return _envelope(question, "", None, meta, error=f"{type(e).__name__}: {e}")
+
+
+# ---------------------------------------------------------------------------
+# sql_query / sql_query_bulk: structured SQLRequest in, no LLM stage
+# ---------------------------------------------------------------------------
+# FastMCP derives each tool's argument model and JSON schema from its signature once, at registration
+# (import time); tools/list serves the stored schema and calls validate against the prebuilt model.
+
+
+@mcp.tool()
+async def sql_query(
+    request: SQLRequest = Field(..., description="Structured request: dataset, metrics, dimensions, filters, limit, order_by"),
+    request_id: Optional[str] = Field(None, description="Optional request id for tracing"),
+    response_format: Literal["rows", "columnar"] = Field("rows", description='"columnar": as for sql_agent'),
+    budget_ms: Optional[int] = Field(None, ge=1, description="Time budget for the call; default REQUEST_BUDGET_MS"),
+    profile: bool = Field(False, description="As for sql_agent"),
+    ctx: Context = None,
+) -> dict:
+    """
+    MCP tool: SQLRequest → deterministic SQL, without intent extraction (for callers that already have the
+    structured intent). Same envelope as sql_agent; data.question is empty.
+    """
+    request_id = request_id or str(uuid.uuid4())
+    started = time.perf_counter()
+
+    with (
+        request_timings() as timings,
+        request_deadline(budget_ms),
+        profile_call(request_id, "sql_query", _profile_requested(profile, ctx)) as prof,
+    ):
+        try:
+            resp = await _run(request, request_id)
+            answer, payload = _answer_and_dump(resp, response_format)
+            extra = {
+                "version": settings.app_version,
+                "request_id": request_id,
+                "intent_path": "direct",
+                **payload,
+                "timings_ms": timings_ms(timings),
+                **_profile_meta(prof),
+            }
+            record_request(
+                "sql_query",
+                time.perf_counter() - started,
+                error_kind=None if resp.ok else "sql",
+                truncated="truncated_to_limit" in resp.warnings,
+                cache_hits=_cache_hits(None, resp),
+                intent_path="direct",
+            )
+            log_request("sql_query", request_id, None, request, resp, "direct", extra["timings_ms"],
+                        time.perf_counter() - started)
+            envelope = _envelope("", answer, resp.query, extra, error=None)
+            return tool_result(envelope) if response_format == "columnar" else envelope
+        except Exception as e:
+            record_request("sql_query", time.perf_counter() - started, error_kind=type(e).__name__)
+            meta = {
+                "version": settings.app_version,
+                "request_id": request_id,
+                "timings_ms": timings_ms(timings),
+                **_error_meta(e),
+                **_profile_meta(prof),
+            }
+            return _envelope("", "", None, meta, error=f"{type(e).__name__}: {e}")
+
+
+@mcp.tool()
+async def sql_query_bulk(
+    requests: list[SQLRequest] = Field(..., description="Structured requests, executed together"),
+    request_id: Optional[str] = Field(None, description="Optional request id for tracing"),
+    budget_ms: Optional[int] = Field(None, ge=1, description="Time budget for the whole call; default REQUEST_BUDGET_MS"),
+) -> dict:
+    """
+    MCP tool: sql_query for a list of SQLRequests, deduped and merged like sql_agent_batch.
+    Response: { metadata: { batch, ... }, error, data: { results: [envelope per request] } }
+    """
+    request_id = request_id or str(uuid.uuid4())
+    base_meta = {"version": settings.app_version, "request_id": request_id}
+    if len(requests) > settings.batch_max_questions:
+        return {
+            "metadata": {"sql": "", **base_meta},
+            "error": f"ValueError: at most {settings.batch_max_questions} requests per call",
+            "data": None,
+        }
+
+    started = time.perf_counter()
+    with request_timings() as timings, request_deadline(budget_ms):
+        try:
+            responses, stats = await run_batch(requests, request_id, _run)
+        except _SHED as e:
+            record_request("sql_query_bulk", time.perf_counter() - started, error_kind=type(e).__name__)
+            meta = {"sql": "", **base_meta, **_error_meta(e), "timings_ms": timings_ms(timings)}
+            return {"metadata": meta, "error": f"{type(e).__name__}: {e}", "data": None}
 
+        results = []
+        for i, resp in enumerate(responses):
+            answer, payload = _answer_and_dump(resp)
+            record_request(
+                "sql_query_bulk",
+                time.perf_counter() - started,
+                error_kind=None if resp.ok else "sql",
+                truncated="truncated_to_limit" in resp.warnings,
+                cache_hits=_cache_hits(None, resp),
+                intent_path="direct",
+            )
+            # after payload: its request_id is the call's, shared by every result
+            extra = {**base_meta, "intent_path": "direct", **payload, "request_id": f"{request_id}:{i}"}
+            log_request("sql_query_bulk", extra["request_id"], None, requests[i], resp, "direct", None,
+                        time.perf_counter() - started)
+            results.append(_envelope("", answer, resp.query, extra, error=None))
+
+    return {
+        "metadata": {"sql": "", **base_meta, "batch": stats.as_dict(), "timings_ms": timings_ms(timings)},
+        "error": None,
+        "data": {"results": results},
+    }
+
+
+# ---------------------------------------------------------------------------
+# sql_agent_batch: many questions → concurrent intents → deduped / merged queries
+# ---------------------------------------------------------------------------
+
+
+@mcp.tool()
+async def sql_agent_batch(
+    questions: list[str] = Field(..., description="Natural language questions, answered together"),
+    request_id: Optional[str] = Field(None, description="Optional request id for tracing"),
+    session_id: Optional[str] = Field(None, description="Optional session id for correlation"),
+    budget_ms: Optional[int] = Field(None, ge=1, description="Time budget for the whole batch; default REQUEST_BUDGET_MS"),
+) -> dict:
+    """
+    MCP tool: like sql_agent for a list of questions. Identical requests run once; requests differing only in
+    location are merged into one grouped query. Response: { metadata: { batch, ... }, error, data: { results: [envelope per question] } }
+    """
+    request_id = request_id or str(uuid.uuid4())
+    base_meta = {"version": settings.app_version, "request_id": request_id}
+    if len(questions) > settings.batch_max_questions:
+        return {
+            "metadata": {"sql": "", **base_meta},
+            "error": f"ValueError: at most {settings.batch_max_questions} questions per batch",
+            "data": None,
+        }
+
+    sem = asyncio.Semaphore(settings.batch_max_concurrency)
+    started = time.perf_counter()
+
+    async def intent(i: int, question: str) -> tuple[SQLRequest, str, str]:
+        async with sem:
+            return await _intent(question, f"{request_id}:{i}", session_id)
+
+    # Stage timings are summed over the batch's questions (work done, not wall time).
+    with request_timings() as timings, request_deadline(budget_ms):
+        intents = await asyncio.gather(*(intent(i, q) for i, q in enumerate(questions)), return_exceptions=True)
+        ok_idx = [i for i, r in enumerate(intents) if not isinstance(r, BaseException)]
+        try:
+            responses, stats = await run_batch([intents[i][0] for i in ok_idx], request_id, _run)
+        except _SHED as e:
+            record_request("sql_agent_batch", time.perf_counter() - started, error_kind=type(e).__name__)
+            meta = {"sql": "", **base_meta, **_error_meta(e), "timings_ms": timings_ms(timings)}
+            return {"metadata": meta, "error": f"{type(e).__name__}: {e}", "data": None}
+        by_idx = dict(zip(ok_idx, responses))
+
+        results = []
+        for i, question in enumerate(questions):
+            item_meta = {**base_meta, "request_id": f"{request_id}:{i}"}
+            if i not in by_idx:
+                e = intents[i]
+                record_request("sql_agent_batch", time.perf_counter() - started, error_kind=type(e).__name__)
+                meta = {**item_meta, **_error_meta(e)}
+                results.append(_envelope(question, "", None, meta, error=f"{type(e).__name__}: {e}"))
+                continue
+            resp = by_idx[i]
+            answer, payload = _answer_and_dump(resp)
+            record_request(
+                "sql_agent_batch",
+                time.perf_counter() - started,
+                error_kind=None if resp.ok else "sql",
+                truncated="truncated_to_limit" in resp.warnings,
+                cache_hits=_cache_hits(intents[i][1], resp),
+                intent_path=intents[i][2],
+            )
+            # item_meta last: payload's request_id is the batch's, shared by every result
+            extra = {"intent_path": intents[i][2], "intent_cache": {"status": intents[i][1]}, **payload, **item_meta}
+            log_request("sql_agent_batch", item_meta["request_id"], question, intents[i][0], resp, intents[i][2], None,
+                        time.perf_counter() - started)
+            results.append(_envelope(question, answer, resp.query, extra, error=None))
+
+    return {
+        "metadata": {
+            "sql": "",
+            **base_meta,
+            "batch": stats.as_dict(),
+            "intent_cache": intent_cache.stats(),
+            "timings_ms": timings_ms(timings),
+        },
+        "error": None,
+        "data": {"results": results},
+    }
+
+
+# ---------------------------------------------------------------------------
+# sql_agent_export: keyset-paginated, streamed results (no sql_max_limit truncation)
+# ---------------------------------------------------------------------------
+
+
+@mcp.tool()
+async def sql_agent_export(
+    ctx: Context,
+    question: Optional[str] = Field(None, description="Natural language question; omit when passing page_token"),
+    page_token: Optional[str] = Field(None, description="Continuation token from a previous page (next_page_token)"),
+    page_size: int = Field(1000, ge=1, description="Rows per page (capped by server)"),
+    request_id: Optional[str] = Field(None, description="Optional request id for tracing"),
+    session_id: Optional[str] = Field(None, description="Optional session id for correlation"),
+) -> dict:
+    """
+    MCP tool: page through a full result set. With a progress token, row chunks are emitted as progress
+    notifications (message = JSON {columns, rows}) and not repeated in the result; otherwise rows are returned.
+    Response metadata carries next_page_token (null on the last page).
+    """
+    request_id = request_id or str(uuid.uuid4())
+    base_meta = {"version": settings.app_version, "request_id": request_id}
+    started = time.perf_counter()
+    with request_timings() as timings:
+        try:
+            if settings.db_backend == "local":
+                raise ValueError("sql_agent_export requires a SQL backend (DB_BACKEND=sync or async)")
+            if page_token:
+                req, after = decode_token(page_token)
+            elif question:
+                req, _, _ = await _intent(question, request_id, session_id)
+                after = None
+            else:
+                raise ValueError("question or page_token is required")
+
+            meta = ctx.request_context.meta
+            streamed = meta is not None and meta.progressToken is not None
+            sent = 0
+
+            async def sink(columns: list[str], rows: list[list]) -> None:
+                nonlocal sent
+                sent += len(rows)
+                with stage("serialize"):
+                    message = json.dumps({"columns": columns, "rows": rows}, default=str)
+                await ctx.report_progress(progress=sent, message=message)
+
+            db_breaker.check()  # fail fast only: page time includes streaming to the client, not a db latency signal
+            async with db_limiter.slot():
+                page = await stream_page(req, after, page_size, sink if streamed else None)
+            with stage("format"):
+                answer = f"Streamed {page.row_count} rows." if streamed else _format_answer(page.columns, page.rows)
+            extra = {
+                **base_meta,
+                "params": page.params,
+                "columns": page.columns,
+                "rows": page.rows,
+                "row_count": page.row_count,
+                "streamed": streamed,
+                "next_page_token": page.next_page_token,
+                "elapsed_ms": page.elapsed_ms,
+                "timings_ms": timings_ms(timings),
+            }
+            record_request("sql_agent_export", time.perf_counter() - started)
+            return _envelope(question or "", answer, page.query, extra, error=None)
+        except Exception as e:
+            record_request("sql_agent_export", time.perf_counter() - started, error_kind=type(e).__name__)
+            meta = {**base_meta, "timings_ms": timings_ms(timings), **_error_meta(e)}
+            return _envelope(question or "", "", None, meta, error=f"{type(e).__name__}: {e}")
+
+
+def _in_thread(fn: Callable[[], Any]) -> Callable[[], Awaitable[Any]]:
+    return lambda: asyncio.to_thread(fn)
+
+
+def _startup_steps(loops: list[asyncio.Task]) -> list[Step]:
+    """
+    Warmup plan. Critical: what the first request needs to be answered correctly (DB connections or the local
+    store); retried in the background until it succeeds. Background: what only makes answers faster (LLM client,
+    jurisdiction vocabulary for the fast path, rollups, indexes, sample); requests arriving before those finish
+    fall back to the slower path (questions go to the LLM until the vocabulary loads, which also retries).
+    """
+    steps: list[Step] = []
+    if settings.openai_api_key:
+        steps.append(Step("llm", warm_llm))
+    else:
+        logger.warning("OPENAI_API_KEY not set; questions off the fast path will fail")
+    if settings.db_backend == "local":
+        steps.append(Step("store", _in_thread(get_store), critical=True))
+    else:
+        use_async = settings.db_backend == "async"
+        health_check: list[asyncio.Task] = []
+
+        async def db() -> None:
+            if use_async:
+                opened = await warmup_async(settings.db_warmup_connections)
+            else:
+                opened = await asyncio.to_thread(warmup, settings.db_warmup_connections)
+            if not health_check:  # started on the first attempt, not again on retries
+                health_check.append(asyncio.create_task(
+                    health_check_loop(settings.db_health_check_interval_sec, use_async)))
+                loops.extend(health_check)
+            if settings.db_warmup_connections and not opened:
+                raise ConnectionError("no database connection could be opened")
+
+        steps.append(Step("db", db, critical=True))
+        if settings.rollups_enabled:
+            steps.append(Step("rollups", _in_thread(refresh_rollups)))
+        if settings.title_index_enabled:
+            steps.append(Step("title_index", _in_thread(build_title_index)))  # until built, title filters use LIKE
+        if settings.index_advisor_enabled:
+            steps.append(Step("index_advisor", _in_thread(advise_indexes)))
+        if settings.ingest_poll_interval_sec > 0:
+
+            async def versions() -> None:
+                await asyncio.to_thread(mark_current)
+                loops.append(asyncio.create_task(version_poll_loop(settings.ingest_poll_interval_sec, _prewarm_after)))
+
+            steps.append(Step("dataset_versions", versions))
+    if settings.fast_intent_enabled:
+        steps.append(Step("jurisdictions", _in_thread(load_jurisdictions), retry=True))
+    return steps
+
+
+async def _prewarm_after(_tables: Any = None, warming: asyncio.Task | None = None) -> None:
+    """Replay hot traffic from the request log (PREWARM_ENABLED); after startup, once background warmup is done."""
+    if not settings.prewarm_enabled:
+        return
+    if warming is not None:
+        await warming
     try:
-        req = await asyncio.to_thread(
-            question_to_sql_request,
-            question,
-            request_id,
-            session_id,
-        )
-        resp = await asyncio.to_thread(run_request, req, request_id)
-        answer = _format_answer(resp.columns, resp.rows) if resp.ok else "No results."
-        extra = {"version": settings.app_version, "request_id": request_id, **resp.model_dump()}
-        return _envelope(question, answer, resp.query, extra, error=None)
-    except Exception as e:
-        return _envelope(question, "", None, {"version": settings.app_version, "request_id": request_id}, error=f"{type(e).__name__}: {e}")
+        await prewarm(_run)
+    except Exception:
+        logger.exception("prewarm failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with mcp.session_manager.run():
-        yield
+    loops: list[asyncio.Task] = []
+    warming = await startup.run(_startup_steps(loops))
+    loops.append(asyncio.create_task(_prewarm_after(warming=warming)))
+    try:
+        async with mcp.session_manager.run():
+            yield
+    finally:
+        for task in (warming, *loops):
+            task.cancel()
+        await close_llm()
+        await asyncio.to_thread(request_log.close)
+        await dispose_async_engine()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -105,11 +625,72 @@ app.mount("/mcp", mcp.streamable_http_app())
 
 @app.get("/health")
 def health():
+    """Liveness: always 200 while the process serves. Readiness details under startup (see /ready)."""
     return {
         "status": "ok",
+        "ready": startup.ready,
+        "startup": startup.stats(),
         "mcp": settings.mcp_name,
         "version": settings.app_version,
         "langchain_project": settings.langchain_project,
         "mysql_database": settings.mysql_database,
         "mysql_user": settings.mysql_user,
+        "db_pool": pool_stats(),
+        "db_router": router_stats(),
+        "admission": admission_stats(),
+        "llm": llm_stats(),
+        "explain": cost_estimator.stats(),
+        "index_advisor": index_report(),
+        "title_index": title_index_stats(),
+        "approx": sample_stats(),
+        "ingest": ingest_stats(),
+        "breakers": breaker_stats(),
+        "profiling": profile_stats(),
+        "request_log": request_log_stats(),
     }
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once every critical warmup step succeeded, else 503. warm reports the background steps."""
+    body = {"ready": startup.ready, "warm": startup.warm}
+    return JSONResponse(body, status_code=200 if startup.ready else 503)
+
+
+def _gauges() -> dict[str, float]:
+    """Point-in-time cache and pool figures, flattened to Prometheus gauge names."""
+    out: dict[str, float] = {}
+    sources = {
+        "intent_cache": intent_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "plan_cache": plan_cache_info(),
+        "db_pool": pool_stats(),
+        "admission": admission_stats(),
+        "llm": llm_stats(),
+        "explain": cost_estimator.stats(),
+        "title_index": title_index_stats(),
+        "breakers": breaker_stats(),
+        "profiling": profile_stats(),
+        "request_log": request_log_stats(),
+        "startup": {
+            "ready": int(startup.ready),
+            "warm": int(startup.warm),
+            "import_ms": startup.import_ms,
+            "ready_ms": startup.ready_ms,
+            "warm_ms": startup.warm_ms,
+        },
+    }
+    for prefix, stats in sources.items():
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                for sub, v in value.items():
+                    out[f"sql_agent_{prefix}_{key}_{sub}"] = v
+            elif value is not None:
+                out[f"sql_agent_{prefix}_{key}"] = value
+    return out
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: stage/request histograms, error/truncation/cache counters, gauges."""
+    return PlainTextResponse(render_prometheus(_gauges()), media_type="text/plain; version=0.0.4")
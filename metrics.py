@@ -0,0 +1,150 @@
+"""Per-stage request timings (context-local) and Prometheus-format histograms / counters for /metrics."""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+import profiling
+
+# Stage names, in pipeline order.
+STAGES = ("intent", "build", "explain", "checkout", "execute", "fetch", "serialize", "format")
+
+_BUCKETS_SEC = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar("stage_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label value."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple[float, ...] = _BUCKETS_SEC) -> None:
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: dict[str, list[float]] = {}  # label → [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for lv, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{self.label}="{lv}",le="{bound}"}} {int(count)}')
+                lines.append(f'{self.name}_bucket{{{self.label}="{lv}",le="+Inf"}} {int(series[-2])}')
+                lines.append(f'{self.name}_count{{{self.label}="{lv}"}} {int(series[-2])}')
+                lines.append(f'{self.name}_sum{{{self.label}="{lv}"}} {series[-1]:.6f}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a label value."""
+
+    def __init__(self, name: str, help_text: str, label: str) -> None:
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{lv}"}} {int(v)}')
+        return lines
+
+
+stage_seconds = Histogram("sql_agent_stage_seconds", "Time spent per pipeline stage", "stage")
+request_seconds = Histogram("sql_agent_request_seconds", "End-to-end tool call time", "tool")
+requests_total = Counter("sql_agent_requests_total", "Tool calls", "tool")
+errors_total = Counter("sql_agent_errors_total", "Failed tool calls by kind", "kind")
+truncations_total = Counter("sql_agent_truncations_total", "Results truncated to the row limit", "tool")
+cache_hits_total = Counter("sql_agent_cache_hits_total", "Cache hits by cache", "cache")
+intent_paths_total = Counter("sql_agent_intent_paths_total", "Intents resolved by path (fast, llm, cache)", "path")
+
+
+@contextmanager
+def request_timings() -> Iterator[dict[str, float]]:
+    """Collect stage timings for the enclosed request (propagates into asyncio.to_thread workers)."""
+    timings: dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage: adds to the current request's timings (ms) and the stage histogram."""
+    started = time.perf_counter()
+    profiled = profiling.enter_thread() if profiling.running else None  # worker threads join a profiled call
+    try:
+        yield
+    finally:
+        if profiled is not None:
+            profiling.leave_thread(profiled)
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(name, elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+
+def record_request(
+    tool: str,
+    elapsed_sec: float,
+    error_kind: str | None = None,
+    truncated: bool = False,
+    cache_hits: tuple[str, ...] = (),
+    intent_path: str | None = None,
+) -> None:
+    """Per-call counters: request count/latency, errors by kind, truncations, cache hits, intent path."""
+    requests_total.inc(tool)
+    request_seconds.observe(tool, elapsed_sec)
+    if error_kind:
+        errors_total.inc(error_kind)
+    if truncated:
+        truncations_total.inc(tool)
+    for cache in cache_hits:
+        cache_hits_total.inc(cache)
+    if intent_path:
+        intent_paths_total.inc(intent_path)
+
+
+def timings_ms(timings: dict[str, float]) -> dict[str, float]:
+    """Rounded copy for response metadata, in pipeline order."""
+    ordered = [s for s in STAGES if s in timings] + [s for s in timings if s not in STAGES]
+    return {s: round(timings[s], 3) for s in ordered}
+
+
+def render_prometheus(gauges: dict[str, Any] | None = None) -> str:
+    """Prometheus text exposition of all metrics plus point-in-time gauges."""
+    lines: list[str] = []
+    for metric in (stage_seconds, request_seconds, requests_total, errors_total, truncations_total, cache_hits_total,
+                   intent_paths_total):
+        lines.extend(metric.render())
+    for name, value in sorted((gauges or {}).items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
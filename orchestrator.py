@@ -1,15 +1,24 @@
 """Orchestrator: natural language question → SQLRequest (LLM) → for use with run_request."""
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import re
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
 
-from langchain_openai import ChatOpenAI
+import httpx
 
 from config import settings
+from resilience import llm_breaker, within
 from schemas import SQLRequest
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
 _SYSTEM = """You convert natural language questions about job/salary data into a strict JSON request.
 
 Dataset is "gov_jobs": job_descriptions (jurisdiction, code, title, description) joined with salaries (jurisdiction, job_code, grade, amount).
@@ -36,17 +45,125 @@ Rules:
 - Infer location from phrases like "in Ventura" → location ["ventura"], "San Bernardino" → ["sanbernardino"]."""
 
 
-def question_to_sql_request(
-    question: str,
-    request_id: Optional[str] = None,
-    session_id: Optional[str] = None,
-) -> SQLRequest:
-    """Convert natural language question to SQLRequest using LLM. Raises on parse/validation error."""
-    llm = ChatOpenAI(
-        model=settings.openai_model,
-        temperature=0,
-        api_key=settings.require_openai_api_key(),
-    )
+# ---------------------------------------------------------------------------
+# Long-lived client (one HTTP connection pool per process)
+# ---------------------------------------------------------------------------
+
+_llm: ChatOpenAI | None = None
+_http: httpx.AsyncClient | None = None
+_lock = threading.Lock()
+_stats = {"calls": 0, "errors": 0, "hedged": 0, "hedge_wins": 0}
+
+
+def get_llm() -> ChatOpenAI:
+    """
+    Get or create the shared client. Requests reuse its keep-alive connections instead of reconnecting per call.
+    langchain_openai is imported here, not at module import (it dominates cold-start import time).
+    """
+    global _llm, _http
+    with _lock:
+        if _llm is None:
+            from langchain_openai import ChatOpenAI
+
+            timeout = httpx.Timeout(settings.openai_timeout_sec, connect=settings.openai_connect_timeout_sec)
+            _http = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.openai_max_connections,
+                    max_keepalive_connections=settings.openai_max_connections,
+                ),
+            )
+            _llm = ChatOpenAI(
+                model=settings.openai_model,
+                temperature=settings.openai_temperature,
+                api_key=settings.require_openai_api_key(),
+                base_url=settings.openai_base_url or None,
+                timeout=timeout,
+                max_retries=settings.openai_max_retries,
+                http_async_client=_http,
+            )
+        return _llm
+
+
+async def warm_llm() -> None:
+    """
+    Startup: build the client off the event loop, then open its first connection (GET /models) so the first
+    question skips the TCP/TLS handshake. The response itself is ignored.
+    """
+    await asyncio.to_thread(get_llm)
+    if settings.openai_warmup_connect and _http is not None:
+        base_url = (settings.openai_base_url or "https://api.openai.com/v1").rstrip("/")
+        await _http.get(f"{base_url}/models", headers={"Authorization": f"Bearer {settings.require_openai_api_key()}"})
+
+
+async def close_llm() -> None:
+    """Drop the client and close its connection pool (app shutdown)."""
+    global _llm, _http
+    with _lock:
+        http, _llm, _http = _http, None, None
+    if http is not None:
+        await http.aclose()
+
+
+def llm_stats() -> dict[str, Any]:
+    with _lock:
+        return {
+            "ready": _llm is not None,
+            "base_url": settings.openai_base_url or None,
+            "hedge_after_sec": settings.openai_hedge_after_sec or None,
+            **_stats,
+        }
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    """
+    Run call(); if it has not answered after delay seconds, start a second identical call and take whichever
+    succeeds first (the other is cancelled). delay <= 0 disables hedging.
+    """
+    first = asyncio.ensure_future(call())
+    if delay <= 0:
+        return await first
+    try:
+        return await asyncio.wait_for(asyncio.shield(first), timeout=delay)
+    except asyncio.TimeoutError:
+        pass
+    except BaseException:
+        first.cancel()
+        raise
+    _count("hedged")
+    second = asyncio.ensure_future(call())
+    pending = {first, second}
+    error: BaseException | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        _count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error  # both attempts failed
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Question → SQLRequest
+# ---------------------------------------------------------------------------
+
+
+def _messages(question: str) -> list[dict[str, str]]:
+    return [{"role": "system", "content": _SYSTEM}, {"role": "user", "content": question}]
+
+
+def _config(request_id: Optional[str], session_id: Optional[str]) -> dict[str, Any]:
     tags = [
         t
         for t in (
@@ -57,15 +174,48 @@ def question_to_sql_request(
         )
         if t is not None
     ]
-    config = {"run_name": settings.mcp_name, "tags": tags}
-    response = llm.invoke(
-        [{"role": "system", "content": _SYSTEM}, {"role": "user", "content": question}],
-        config=config,
-    )
-    text = (response.content or "").strip()
+    return {"run_name": settings.mcp_name, "tags": tags}
+
+
+def _parse(content: Any) -> SQLRequest:
+    text = (content or "").strip()
     # Strip optional markdown code block
     if text.startswith("```"):
         text = re.sub(r"^```(?:json)?\s*", "", text)
         text = re.sub(r"\s*```$", "", text)
     raw = json.loads(text)
     return SQLRequest.model_validate(raw)
+
+
+def question_to_sql_request(
+    question: str,
+    request_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> SQLRequest:
+    """Convert natural language question to SQLRequest using LLM. Raises on parse/validation error."""
+    response = get_llm().invoke(_messages(question), config=_config(request_id, session_id))
+    return _parse(response.content)
+
+
+async def question_to_sql_request_async(
+    question: str,
+    request_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> SQLRequest:
+    """
+    Async question_to_sql_request on the shared client, hedged after OPENAI_HEDGE_AFTER_SEC when set. Bounded by
+    the request's remaining budget (DeadlineExceeded) and the llm circuit breaker (CircuitOpen).
+    """
+    llm = _llm or await asyncio.to_thread(get_llm)  # still warming: wait without blocking the loop
+    config = _config(request_id, session_id)
+    _count("calls")
+    try:
+        with llm_breaker.guard():
+            async with within("intent"):
+                response = await _hedged(
+                    lambda: llm.ainvoke(_messages(question), config=config), settings.openai_hedge_after_sec
+                )
+    except Exception:
+        _count("errors")
+        raise
+    return _parse(response.content)
@@ -0,0 +1,131 @@
+"""Streaming export with keyset pagination: row chunks from a server-side cursor, opaque continuation tokens."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextvars
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Awaitable, Callable
+
+from config import settings
+from db import stream_query
+from schemas import SQLRequest
+from sql_builder import build_page_sql
+
+ChunkSink = Callable[[list[str], list[list[Any]]], Awaitable[None]]
+
+_DONE = object()
+
+
+def _encode_value(v: Any) -> Any:
+    return {"$dec": str(v)} if isinstance(v, Decimal) else v
+
+
+def _decode_value(v: Any) -> Any:
+    return Decimal(v["$dec"]) if isinstance(v, dict) and "$dec" in v else v
+
+
+def encode_token(req: SQLRequest, after: list[Any]) -> str:
+    """Opaque continuation token: the request plus the last row's keyset values."""
+    payload = {"v": 1, "req": req.model_dump(mode="json"), "after": [_encode_value(v) for v in after]}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> tuple[SQLRequest, list[Any]]:
+    """Inverse of encode_token. Raises ValueError on a malformed token; the request is re-validated on build."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        req = SQLRequest.model_validate(payload["req"])
+        after = [_decode_value(v) for v in payload["after"]]
+    except Exception as e:
+        raise ValueError(f"invalid page_token: {e}") from None
+    return req, after
+
+
+@dataclass
+class PageResult:
+    query: str
+    params: dict[str, Any]
+    columns: list[str] = field(default_factory=list)
+    rows: list[list[Any]] = field(default_factory=list)  # only when no sink was given
+    row_count: int = 0
+    next_page_token: str | None = None
+    elapsed_ms: int = 0
+
+
+async def stream_page(
+    req: SQLRequest,
+    after: list[Any] | None,
+    page_size: int,
+    sink: ChunkSink | None = None,
+) -> PageResult:
+    """
+    Run one keyset page. Chunks go to sink as they arrive (flat memory); without a sink rows are buffered.
+    The cursor is read in a worker thread and handed over through a small bounded queue (backpressure).
+    """
+    start = time.perf_counter()
+    page_size = max(1, min(page_size, settings.sql_page_max_rows))
+    sql, params, key_fields = build_page_sql(req, after, page_size)
+    result = PageResult(query=sql, params=params)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=2)
+    stop = threading.Event()
+
+    def put(item: Any) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        try:
+            for item in stream_query(sql, params, settings.sql_stream_timeout_sec, settings.sql_stream_chunk_rows):
+                if stop.is_set():
+                    return
+                put(item)
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    producer = loop.run_in_executor(None, contextvars.copy_context().run, produce)  # keeps stage timings
+    last_row: list[Any] | None = None
+    has_more = False
+    done = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                done = True
+                break
+            if isinstance(item, Exception):
+                raise item
+            columns, chunk = item
+            result.columns = columns
+            room = page_size - result.row_count
+            if len(chunk) > room:
+                has_more = True
+                chunk = chunk[:room]
+            if not chunk:
+                continue
+            result.row_count += len(chunk)
+            last_row = chunk[-1]
+            if sink is not None:
+                await sink(columns, chunk)
+            else:
+                result.rows.extend(chunk)
+    finally:
+        stop.set()
+        while not done:
+            done = await queue.get() is _DONE
+        await producer
+
+    if has_more and last_row is not None and key_fields:
+        after_values = [last_row[result.columns.index(f)] for f in key_fields]
+        result.next_page_token = encode_token(req, after_values)
+    result.elapsed_ms = int((time.perf_counter() - start) * 1000)
+    return result
@@ -0,0 +1,236 @@
+"""Opt-in sampling profiler for single tool calls: stacks every PROFILE_INTERVAL_MS, written as speedscope / collapsed files."""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from contextvars import ContextVar
+from types import FrameType
+from typing import Any
+
+import orjson
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Profiles in flight. metrics.stage only calls enter_thread while this is non-zero, so a disabled profiler
+# costs one global read per stage.
+running = 0
+
+_current: ContextVar[Profile | None] = ContextVar("profile", default=None)
+_running_lock = threading.Lock()
+_write_lock = threading.Lock()
+_written = 0
+_last_path: str | None = None
+
+_EXTENSIONS = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}
+_WAITING = "(waiting)"  # samples where no thread of the call was running Python code (awaiting I/O or a queue)
+# Bottom-of-stack frames of pool / to_thread workers, dropped so worker stacks start at the submitted function.
+_RUNTIME_FILES = (os.sep + "threading.py", os.sep + "concurrent" + os.sep + "futures" + os.sep, os.sep + "asyncio" + os.sep)
+
+
+def _label(code: Any) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    """
+    Samples the stacks of one tool call: the event-loop thread while the tool's coroutine is on it, plus worker
+    threads while they run a metrics.stage of this call (they register through enter_thread). Stacks are counted
+    root → leaf; a sample where neither is running counts as (waiting), so samples × interval ≈ wall time.
+    """
+
+    def __init__(self, request_id: str, tool: str, root: FrameType) -> None:
+        self.request_id = request_id
+        self.tool = tool
+        self.interval = settings.profile_interval_ms / 1000
+        self.format = settings.profile_format if settings.profile_format in _EXTENSIONS else "speedscope"
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", request_id)[:128].lstrip(".") or "profile"
+        self.path = os.path.join(settings.profile_dir, name + _EXTENSIONS[self.format])
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self._root = root
+        self._loop_thread = threading.get_ident()
+        self._threads: dict[int, int] = {}  # worker thread id → nesting depth of this call's stages on it
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-{name}", daemon=True)
+        self._started = 0.0
+        self._token: Any = None
+
+    def info(self) -> dict[str, Any]:
+        """Response metadata; the file is complete by the time the tool returns."""
+        return {"path": self.path, "format": self.format, "interval_ms": settings.profile_interval_ms}
+
+    # -- sampling ----------------------------------------------------------------
+
+    def _loop_stack(self, frame: FrameType | None) -> list[str] | None:
+        """The event-loop thread's stack from the tool coroutine up, or None when the coroutine is suspended."""
+        labels: list[str] = []
+        while frame is not None:
+            if frame is self._root:
+                labels.append(_label(frame.f_code))
+                labels.reverse()
+                return labels
+            labels.append(_label(frame.f_code))
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _worker_stack(frame: FrameType | None) -> list[str]:
+        labels: list[str] = []
+        while frame is not None:
+            code = frame.f_code
+            if not any(part in code.co_filename for part in _RUNTIME_FILES):
+                labels.append(_label(code))
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            workers = list(self._threads)
+        sampled = False
+        loop_stack = self._loop_stack(frames.get(self._loop_thread))
+        if loop_stack is not None:
+            self.stacks[(self.tool, *loop_stack)] += 1
+            sampled = True
+        for ident in workers:
+            frame = frames.get(ident)
+            if frame is not None:
+                self.stacks[(self.tool, "(worker)", *self._worker_stack(frame))] += 1
+                sampled = True
+        if not sampled:
+            self.stacks[(self.tool, _WAITING)] += 1
+        self.samples += 1
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:  # a frame torn down mid-walk; skip the tick
+                continue
+
+    # -- lifecycle ---------------------------------------------------------------
+
+    def __enter__(self) -> Profile:
+        global running
+        self._token = _current.set(self)
+        with _running_lock:
+            running += 1
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        global running
+        self._stop.set()
+        self._sampler.join()
+        with _running_lock:
+            running -= 1
+        _current.reset(self._token)
+        try:
+            self._write((time.perf_counter() - self._started) * 1000)
+        except OSError:
+            logger.exception("profile %s: write failed", self.request_id)
+
+    # -- output ------------------------------------------------------------------
+
+    def _collapsed(self) -> bytes:
+        return "".join(f"{';'.join(stack)} {n}\n" for stack, n in self.stacks.most_common()).encode()
+
+    def _speedscope(self, duration_ms: float) -> bytes:
+        index: dict[str, int] = {}
+        samples = [[index.setdefault(label, len(index)) for label in stack] for stack in self.stacks]
+        weights = [n * settings.profile_interval_ms for n in self.stacks.values()]
+        return orjson.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": label} for label in index]},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.tool} {self.request_id}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(duration_ms, 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": f"{self.tool} {self.request_id}",
+            "exporter": f"{settings.mcp_name} {settings.app_version}",
+        })
+
+    def _write(self, duration_ms: float) -> None:
+        global _written, _last_path
+        body = self._collapsed() if self.format == "collapsed" else self._speedscope(duration_ms)
+        with _write_lock:
+            os.makedirs(settings.profile_dir, exist_ok=True)
+            with open(self.path, "wb") as f:
+                f.write(body)
+            _written += 1
+            _last_path = self.path
+            _prune()
+        logger.info("profile %s: %d samples over %.0f ms → %s", self.request_id, self.samples, duration_ms, self.path)
+
+
+def _prune() -> None:
+    """Keep the newest PROFILE_MAX_FILES profiles (caller holds _write_lock)."""
+    entries = [e for e in os.scandir(settings.profile_dir) if e.is_file() and e.name.endswith(tuple(_EXTENSIONS.values()))]
+    if len(entries) <= settings.profile_max_files:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for e in entries[: len(entries) - settings.profile_max_files]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
+
+
+def profile_call(request_id: str, tool: str, requested: bool) -> Profile | nullcontext[None]:
+    """
+    A context manager for the calling tool: a Profile when profiling is enabled and the call asked for it
+    (or falls in PROFILE_SAMPLE_RATE), else a no-op. Must be called from the tool coroutine itself.
+    """
+    if not settings.profile_enabled:
+        return nullcontext()
+    if not requested and not (settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate):
+        return nullcontext()
+    if _current.get() is not None:
+        return nullcontext()  # already inside a profiled call
+    return Profile(request_id, tool, sys._getframe(1))
+
+
+def enter_thread() -> tuple[Profile, int] | None:
+    """Register the calling worker thread with the current call's profile (see metrics.stage)."""
+    profile = _current.get()
+    ident = threading.get_ident()
+    if profile is None or ident == profile._loop_thread:
+        return None
+    with profile._lock:
+        profile._threads[ident] = profile._threads.get(ident, 0) + 1
+    return profile, ident
+
+
+def leave_thread(token: tuple[Profile, int]) -> None:
+    profile, ident = token
+    with profile._lock:
+        depth = profile._threads.pop(ident) - 1
+        if depth:
+            profile._threads[ident] = depth
+
+
+def profile_stats() -> dict[str, Any]:
+    return {
+        "enabled": int(settings.profile_enabled),
+        "sample_rate": settings.profile_sample_rate,
+        "running": running,
+        "written": _written,
+        "last_path": _last_path,
+    }
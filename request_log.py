@@ -0,0 +1,338 @@
+"""
+Request log: sampled JSONL records of live traffic (normalized question, SQLRequest, fingerprint, timings), written
+off the event loop and rotated by size. The analyzer ranks hot questions, query shapes and fingerprints; the
+prewarmer replays the hottest ones into the intent and result caches after startup and data reloads.
+
+    python request_log.py [--top 20] [--json] [path]
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+import orjson
+
+from config import settings
+from intent_cache import intent_cache, normalize_question
+from schemas import SQLRequest, SQLResponse
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Capture
+# ---------------------------------------------------------------------------
+
+
+class RequestLog:
+    """
+    Append-only JSONL log with size rotation (path → path.1 → … → path.<backups>). record() only enqueues;
+    a daemon thread serializes and writes, so a slow disk never blocks the event loop (a full queue drops).
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: queue.Queue[tuple[dict[str, Any], SQLRequest] | None] = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def record(self, entry: dict[str, Any], req: SQLRequest) -> None:
+        """Queue one record; req is dumped in the writer thread."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((entry, req))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+                self._thread.start()
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def _write(self, lines: list[bytes]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(b"".join(lines))
+        self.written += len(lines)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < 1000:  # everything already queued goes in one write
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            lines = []
+            for entry_req in batch:
+                if entry_req is not None:
+                    entry, req = entry_req
+                    entry["request"] = req.model_dump(mode="json", exclude_none=True)
+                    lines.append(orjson.dumps(entry) + b"\n")
+            try:
+                if lines:
+                    self._write(lines)
+            except OSError:
+                self.errors += 1
+                logger.exception("request log: write to %s failed", self.path)
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def flush(self) -> None:
+        """Block until everything queued so far is written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write what is queued and stop the writer (a later record() starts a new one)."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+        self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": int(settings.request_log_enabled),
+            "sample_rate": settings.request_log_sample_rate,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+
+request_log = RequestLog(
+    settings.request_log_path, settings.request_log_max_bytes, settings.request_log_backups, settings.request_log_queue
+)
+
+
+def log_request(
+    tool: str,
+    request_id: str,
+    question: str | None,
+    req: SQLRequest,
+    resp: SQLResponse,
+    intent_path: str,
+    timings_ms: dict[str, float] | None,
+    elapsed_sec: float,
+) -> None:
+    """Record one answered call (REQUEST_LOG_ENABLED, sampled at REQUEST_LOG_SAMPLE_RATE)."""
+    if not settings.request_log_enabled:
+        return
+    if settings.request_log_sample_rate < 1 and random.random() >= settings.request_log_sample_rate:
+        return
+    entry = {
+        "ts": round(time.time(), 3),
+        "tool": tool,
+        "request_id": request_id,
+        "question": normalize_question(question) if question else None,
+        "intent_path": intent_path,
+        "fingerprint": resp.fingerprint,
+        "ok": resp.ok,
+        "cache_hit": resp.cache_hit,
+        "row_count": resp.row_count,
+        "elapsed_ms": round(elapsed_sec * 1000, 3),
+        "timings_ms": timings_ms,
+    }
+    request_log.record(entry, req)
+
+
+# ---------------------------------------------------------------------------
+# Analysis
+# ---------------------------------------------------------------------------
+
+
+def log_files(path: str | None = None) -> list[str]:
+    """The log and its rotated backups, oldest first."""
+    path = path or settings.request_log_path
+    backups = [f"{path}.{i}" for i in range(settings.request_log_backups, 0, -1)]
+    return [p for p in (*backups, path) if os.path.exists(p)]
+
+
+def read_records(path: str | None = None) -> Iterator[dict[str, Any]]:
+    """Records oldest first; lines that do not parse (a write cut short) are skipped."""
+    for p in log_files(path):
+        with open(p, "rb") as f:
+            for line in f:
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+
+
+@dataclass
+class _Hot:
+    """Traffic for one key: call count, successes, result-cache hits, summed latency, latest request seen."""
+    count: int = 0
+    ok: int = 0
+    cache_hits: int = 0
+    elapsed_ms: float = 0.0
+    request: dict[str, Any] = field(default_factory=dict)
+
+    def add(self, record: dict[str, Any]) -> None:
+        self.count += 1
+        self.ok += bool(record.get("ok"))
+        self.cache_hits += bool(record.get("cache_hit"))
+        self.elapsed_ms += record.get("elapsed_ms") or 0.0
+        self.request = record.get("request") or self.request
+
+    def as_dict(self, key_name: str, key: str) -> dict[str, Any]:
+        return {
+            key_name: key,
+            "count": self.count,
+            "ok_ratio": round(self.ok / self.count, 3),
+            "cache_hit_ratio": round(self.cache_hits / self.count, 3),
+            "mean_ms": round(self.elapsed_ms / self.count, 3),
+            "request": self.request,
+        }
+
+
+def hot_queries(records: Iterable[dict[str, Any]], top: int) -> dict[str, Any]:
+    """
+    Rank logged traffic by call count: questions (LLM / intent-cache path only: the fast path needs no
+    warming), query shapes (sql_builder.shape_of) and fingerprints (identical SQL + params).
+    """
+    from sql_builder import shape_of
+
+    questions: dict[str, _Hot] = {}
+    shapes: dict[str, _Hot] = {}
+    fingerprints: dict[str, _Hot] = {}
+    tools: Counter[str] = Counter()
+    total = 0
+    for record in records:
+        total += 1
+        tools[record.get("tool") or "?"] += 1
+        if record.get("question") and record.get("intent_path") in ("llm", "cache"):
+            questions.setdefault(record["question"], _Hot()).add(record)
+        if record.get("fingerprint"):
+            fingerprints.setdefault(record["fingerprint"], _Hot()).add(record)
+        try:
+            shape = shape_of(SQLRequest.model_validate(record.get("request") or {}))
+        except ValueError:
+            continue
+        shapes.setdefault(shape, _Hot()).add(record)
+
+    def ranked(entries: dict[str, _Hot], key_name: str) -> list[dict[str, Any]]:
+        best = sorted(entries.items(), key=lambda kv: kv[1].count, reverse=True)[:top]
+        return [hot.as_dict(key_name, key) for key, hot in best]
+
+    return {
+        "records": total,
+        "tools": dict(tools),
+        "questions": ranked(questions, "question"),
+        "shapes": ranked(shapes, "shape"),
+        "fingerprints": ranked(fingerprints, "fingerprint"),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Prewarming
+# ---------------------------------------------------------------------------
+
+_stats: dict[str, Any] = {"runs": 0, "intents": 0, "results": 0, "failed": 0, "last_ms": None, "last_at": None}
+
+
+async def prewarm(run: Callable[[SQLRequest, str], Awaitable[SQLResponse]], top_n: int | None = None) -> dict[str, int]:
+    """
+    Replay the request log's top_n (PREWARM_TOP_N) hottest questions into the intent cache, using the SQLRequest
+    they were last answered with (no LLM call), and run its top_n hottest successful fingerprints through run
+    (PREWARM_CONCURRENCY at a time), which fills the result cache and warms pooled connections on the way.
+    Failures are counted, not raised.
+    """
+    top_n = settings.prewarm_top_n if top_n is None else top_n
+    started = time.perf_counter()
+    hot = await asyncio.to_thread(lambda: hot_queries(read_records(), top_n))
+    out = {"intents": 0, "results": 0, "failed": 0}
+
+    if settings.intent_cache_enabled:
+        for entry in hot["questions"]:
+            try:
+                intent_cache.put(entry["question"], SQLRequest.model_validate(entry["request"]))
+                out["intents"] += 1
+            except ValueError:
+                out["failed"] += 1
+
+    sem = asyncio.Semaphore(max(settings.prewarm_concurrency, 1))
+
+    async def replay(i: int, entry: dict[str, Any]) -> None:
+        async with sem:
+            try:
+                resp = await run(SQLRequest.model_validate(entry["request"]), f"prewarm:{i}")
+                out["results" if resp.ok else "failed"] += 1
+            except Exception:
+                out["failed"] += 1
+
+    await asyncio.gather(*(replay(i, e) for i, e in enumerate(hot["fingerprints"]) if e["ok_ratio"] > 0))
+
+    _stats["runs"] += 1
+    for key, n in out.items():
+        _stats[key] += n
+    _stats["last_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _stats["last_at"] = time.time()
+    logger.info("prewarm: %d intents, %d results (%d failed) from %d logged calls in %.0f ms",
+                out["intents"], out["results"], out["failed"], hot["records"], _stats["last_ms"])
+    return out
+
+
+def request_log_stats() -> dict[str, Any]:
+    return {**request_log.stats(), "prewarm": dict(_stats)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=None, help="request log (REQUEST_LOG_PATH); backups are read too")
+    parser.add_argument("--top", type=int, default=20, help="entries per ranking")
+    parser.add_argument("--json", action="store_true", help="print the rankings as JSON")
+    args = parser.parse_args()
+    report = hot_queries(read_records(args.path), args.top)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print(f"{report['records']} records: " + ", ".join(f"{t}={n}" for t, n in report["tools"].items()))
+        for section, key in (("questions", "question"), ("shapes", "shape"), ("fingerprints", "fingerprint")):
+            print(f"\nTop {section}:")
+            print(f"  {'count':>7} {'mean_ms':>9} {'ok':>5} {'cached':>6}  {key}")
+            for e in report[section]:
+                label = e[key]
+                if key != "question":
+                    r = e["request"]
+                    metrics = ",".join(f"{m.get('agg')}({m.get('name')})" for m in r.get("metrics", []))
+                    label = f"{label}  {metrics} by {','.join(r.get('dimensions', [])) or '-'}"
+                print(f"  {e['count']:>7} {e['mean_ms']:>9.1f} {e['ok_ratio']:>5.2f} {e['cache_hit_ratio']:>6.2f}  {label}")
@@ -0,0 +1,229 @@
+"""Per-request deadlines (time budget shared by every stage) and circuit breakers for the LLM and database."""
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from config import settings
+
+# ---------------------------------------------------------------------------
+# Deadlines
+# ---------------------------------------------------------------------------
+
+# (absolute perf_counter deadline, budget_ms) of the current request; propagates into asyncio.to_thread workers.
+_deadline: ContextVar[tuple[float, int] | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before or during stage."""
+
+    def __init__(self, stage: str, budget_ms: int) -> None:
+        super().__init__(f"time budget of {budget_ms} ms exhausted at {stage}")
+        self.stage = stage
+        self.budget_ms = budget_ms
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"stage": self.stage, "budget_ms": self.budget_ms}
+
+
+@contextmanager
+def request_deadline(budget_ms: int | None) -> Iterator[None]:
+    """Give the enclosed request budget_ms from now (REQUEST_BUDGET_MS when None; 0 = unbounded)."""
+    budget_ms = settings.request_budget_ms if budget_ms is None else budget_ms
+    token = _deadline.set((time.perf_counter() + budget_ms / 1000, budget_ms) if budget_ms > 0 else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(stage: str) -> float | None:
+    """Seconds left in the current request's budget (None when unbounded). Raises DeadlineExceeded at zero."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    left = current[0] - time.perf_counter()
+    if left <= 0:
+        raise DeadlineExceeded(stage, current[1])
+    return left
+
+
+def bounded(seconds: float, stage: str) -> float:
+    """A stage timeout capped at the remaining budget."""
+    left = remaining(stage)
+    return seconds if left is None else min(seconds, left)
+
+
+def expired() -> bool:
+    current = _deadline.get()
+    return current is not None and time.perf_counter() >= current[0]
+
+
+@asynccontextmanager
+async def within(stage: str) -> AsyncIterator[None]:
+    """Cancel the body when the budget runs out, raising DeadlineExceeded instead of TimeoutError."""
+    try:
+        async with asyncio.timeout(remaining(stage)):
+            yield
+    except TimeoutError:
+        current = _deadline.get()
+        if current is not None and expired():
+            raise DeadlineExceeded(stage, current[1]) from None
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Circuit breakers
+# ---------------------------------------------------------------------------
+
+
+class CircuitOpen(Exception):
+    """A dependency's breaker is open: calls fail fast until a half-open probe succeeds."""
+
+    def __init__(self, name: str, retry_after_sec: int) -> None:
+        super().__init__(f"{name} circuit open; retry after {retry_after_sec}s")
+        self.name = name
+        self.retry_after_sec = retry_after_sec
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"dependency": self.name, "retry_after_sec": self.retry_after_sec}
+
+
+class CircuitBreaker:
+    """
+    closed → open when at least min_calls of the last window calls were recorded and failure_ratio of them
+    failed (an exception, or slower than slow_sec). open → half_open after open_sec: up to probes calls are let
+    through; that many successes close it, any failure re-opens it. Calls cut short by the caller's own deadline
+    or cancellation are not counted, nor are exceptions that counts() rejects (errors caused by the request).
+    Thread-safe (database calls run in worker threads).
+    """
+
+    def __init__(self, name: str, slow_sec: float, counts: Callable[[Exception], bool] | None = None) -> None:
+        self.name = name
+        self.slow_sec = slow_sec
+        self.counts = counts
+        self.state = "closed"
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes: deque[bool] = deque(maxlen=settings.breaker_window)  # True = failure
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def _retry_after(self) -> int:
+        return max(math.ceil(self._opened_at + settings.breaker_open_sec - time.monotonic()), 1)
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = self._probe_successes = 0
+        self.trips += 1
+
+    def check(self) -> None:
+        """Raise CircuitOpen while open (no probe slot is taken; see guard)."""
+        if not settings.breaker_enabled:
+            return
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at < settings.breaker_open_sec:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self._retry_after())
+
+    def _admit(self) -> bool:
+        """Let a call through or raise CircuitOpen. Returns True when the call is a half-open probe."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < settings.breaker_open_sec:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, self._retry_after())
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probes_in_flight >= settings.breaker_half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, 1)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _record(self, probe: bool, failed: bool | None) -> None:
+        """failed None = not the dependency's fault (deadline, cancellation): a probe slot is just released."""
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+                if self.state != "half_open" or failed is None:
+                    return
+                if failed:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= settings.breaker_half_open_probes:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                return
+            if failed is None or self.state != "closed":
+                return
+            self._outcomes.append(failed)
+            n = len(self._outcomes)
+            if n >= settings.breaker_min_calls and sum(self._outcomes) >= settings.breaker_failure_ratio * n:
+                self._open()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run one call through the breaker (raises CircuitOpen instead when open). A failure after the request's
+        deadline passed is re-raised as DeadlineExceeded and not held against the dependency; neither is one
+        that counts() rejects.
+        """
+        if not settings.breaker_enabled:
+            yield
+            return
+        probe = self._admit()
+        started = time.perf_counter()
+        failed: bool | None = None
+        try:
+            yield
+            failed = time.perf_counter() - started > self.slow_sec
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            current = _deadline.get()
+            if current is not None and expired():
+                raise DeadlineExceeded(self.name, current[1]) from e
+            failed = True if self.counts is None or self.counts(e) else None
+            raise
+        finally:
+            self._record(probe, failed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            open_ = self.state == "open"
+            return {
+                "state": self.state,
+                "open": int(self.state != "closed"),
+                "window_calls": len(self._outcomes),
+                "window_failures": sum(self._outcomes),
+                "slow_sec": self.slow_sec,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "retry_after_sec": self._retry_after() if open_ else None,
+            }
+
+
+llm_breaker = CircuitBreaker("llm", settings.breaker_slow_sec.get("llm", settings.openai_timeout_sec))
+def _db_failure(e: Exception) -> bool:
+    from db_router import is_db_failure  # lazily: the LLM side imports this module without the database stack
+
+    return is_db_failure(e)
+
+
+db_breaker = CircuitBreaker("db", settings.breaker_slow_sec.get("db", settings.sql_timeout_sec), _db_failure)
+
+
+def breaker_stats() -> dict[str, Any]:
+    return {"llm": llm_breaker.stats(), "db": db_breaker.stats()}
@@ -0,0 +1,168 @@
+"""Result cache keyed by SQL fingerprint. Bounded by estimated row bytes; per-dataset TTL; explicit invalidation."""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from config import settings
+from sql_builder import ALLOWED_DATASETS
+
+
+@dataclass
+class CachedResult:
+    dataset: str
+    columns: list[str]
+    rows: list[list[Any]]
+    warnings: list[str]
+    nbytes: int
+    expires_at: float
+
+
+def estimate_bytes(columns: list[str], rows: list[list[Any]]) -> int:
+    """Approximate in-memory size of a result (containers + scalar values)."""
+    total = sys.getsizeof(columns) + sum(sys.getsizeof(c) for c in columns)
+    total += sys.getsizeof(rows)
+    for row in rows:
+        total += sys.getsizeof(row)
+        for v in row:
+            total += sys.getsizeof(v)
+    return total
+
+
+class ResultCache:
+    """
+    LRU cache of (columns, rows, warnings) by fingerprint, thread-safe (run_request runs in worker threads).
+    Each dataset has a generation counter; invalidation bumps it so in-flight queries cannot store stale rows.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entry_bytes: int,
+        default_ttl_sec: float,
+        ttl_by_dataset: dict[str, float] | None = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl_sec = default_ttl_sec
+        self.ttl_by_dataset = dict(ttl_by_dataset or {})
+        self._entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl_for(self, dataset: str) -> float:
+        return self.ttl_by_dataset.get(dataset, self.default_ttl_sec)
+
+    def generation(self, dataset: str) -> tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations.get(dataset, 0)
+
+    def get(self, fingerprint: str) -> CachedResult | None:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(fingerprint)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        fingerprint: str,
+        dataset: str,
+        columns: list[str],
+        rows: list[list[Any]],
+        warnings: list[str],
+        generation: tuple[int, int],
+    ) -> bool:
+        """Store a result. Returns False if it was too large, uncacheable, or the dataset was invalidated meanwhile."""
+        ttl = self.ttl_for(dataset)
+        if self.max_bytes <= 0 or ttl <= 0:
+            return False
+        nbytes = estimate_bytes(columns, rows)
+        if nbytes > self.max_entry_bytes or nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            if (self._epoch, self._generations.get(dataset, 0)) != generation:
+                return False
+            if fingerprint in self._entries:
+                self._remove(fingerprint)
+            self._entries[fingerprint] = CachedResult(
+                dataset=dataset,
+                columns=list(columns),
+                rows=[list(r) for r in rows],
+                warnings=list(warnings),
+                nbytes=nbytes,
+                expires_at=time.monotonic() + ttl,
+            )
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                key = next(iter(self._entries))
+                self._remove(key)
+                self.evictions += 1
+        return True
+
+    def _remove(self, fingerprint: str) -> None:
+        entry = self._entries.pop(fingerprint)
+        self._bytes -= entry.nbytes
+
+    def invalidate(self, dataset: str | None = None) -> int:
+        """Drop entries for one dataset (or all). Returns number of entries removed."""
+        with self._lock:
+            if dataset is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                self._epoch += 1
+            else:
+                keys = [k for k, e in self._entries.items() if e.dataset == dataset]
+                for k in keys:
+                    self._remove(k)
+                removed = len(keys)
+                self._generations[dataset] = self._generations.get(dataset, 0) + 1
+            self.invalidations += 1
+            return removed
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """Invalidation hook for table reloads: drops every dataset built on any of the given tables."""
+        reloaded = set(tables)
+        removed = 0
+        for name, cfg in ALLOWED_DATASETS.items():
+            if reloaded & set(cfg.get("tables", ())):
+                removed += self.invalidate(name)
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=settings.result_cache_max_bytes if settings.result_cache_enabled else 0,
+    max_entry_bytes=settings.result_cache_max_entry_bytes,
+    default_ttl_sec=settings.result_cache_ttl_sec,
+    ttl_by_dataset=settings.result_cache_ttl_by_dataset,
+)
@@ -0,0 +1,118 @@
+"""Pre-aggregated rollup tables for gov_jobs and the registry build_sql routes against."""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from config import settings
+from db import get_engine
+from explain import cost_estimator
+
+logger = logging.getLogger(__name__)
+
+# Stored per group; avg is derived as sum / count so rollups re-aggregate exactly.
+ROLLUP_MEASURES = ("sum_amount", "count_amount", "min_amount", "max_amount")
+
+
+@dataclass(frozen=True)
+class Rollup:
+    dataset: str
+    dims: tuple[str, ...]
+
+    @property
+    def table(self) -> str:
+        return f"rollup_{self.dataset}__{'__'.join(self.dims)}"
+
+
+def configured_rollups() -> list[Rollup]:
+    """Grains from ROLLUP_GRAINS, e.g. "jurisdiction,title,grade,job_code;jurisdiction,grade"."""
+    out: list[Rollup] = []
+    for grain in settings.rollup_grains.split(";"):
+        dims = tuple(d.strip() for d in grain.split(",") if d.strip())
+        if dims:
+            out.append(Rollup(dataset="gov_jobs", dims=dims))
+    return out
+
+
+_active: dict[str, Rollup] = {}
+_lock = threading.Lock()
+
+
+def active_rollups() -> list[Rollup]:
+    with _lock:
+        return list(_active.values())
+
+
+def covering_rollup(dataset: str, dims: set[str]) -> Rollup | None:
+    """Smallest materialized rollup of dataset whose grain contains every column in dims."""
+    candidates = [r for r in active_rollups() if r.dataset == dataset and dims <= set(r.dims)]
+    return min(candidates, key=lambda r: len(r.dims)) if candidates else None
+
+
+def _column_expr(dim: str) -> str:
+    return f"j.{dim}" if dim in ("jurisdiction", "code", "title") else f"s.{dim}"
+
+
+def _swap_statements(dialect: str, table: str, staging: str) -> list[str]:
+    if dialect == "mysql":
+        # RENAME TABLE swaps atomically; readers never see a missing table. A {table}__old left by a refresh that
+        # died between the rename and the drop would make every later rename fail, so it goes first.
+        return [
+            f"DROP TABLE IF EXISTS {table}__old",
+            f"CREATE TABLE IF NOT EXISTS {table} LIKE {staging}",
+            f"RENAME TABLE {table} TO {table}__old, {staging} TO {table}",
+            f"DROP TABLE {table}__old",
+        ]
+    # SQLite: DDL is transactional (db._sqlite_begin opens the transaction), so drop + rename commit together.
+    return [f"DROP TABLE IF EXISTS {table}", f"ALTER TABLE {staging} RENAME TO {table}"]
+
+
+def refresh_rollup(rollup: Rollup) -> None:
+    """Rebuild one rollup into a staging table and swap it in."""
+    from sql_builder import ALLOWED_DATASETS
+
+    base = ALLOWED_DATASETS[rollup.dataset]["base"]
+    exprs = [_column_expr(d) for d in rollup.dims]
+    staging = f"{rollup.table}__staging"
+    select = (
+        f"SELECT {', '.join(f'{e} AS {d}' for e, d in zip(exprs, rollup.dims))}, "
+        "SUM(s.amount) AS sum_amount, COUNT(s.amount) AS count_amount, "
+        "MIN(s.amount) AS min_amount, MAX(s.amount) AS max_amount "
+        f"FROM {base} GROUP BY {', '.join(exprs)}"
+    )
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+        conn.execute(text(f"CREATE TABLE {staging} AS {select}"))
+        for stmt in _swap_statements(conn.dialect.name, rollup.table, staging):
+            conn.execute(text(stmt))
+
+
+def refresh_rollups() -> list[str]:
+    """
+    Rebuild every configured rollup (call after each data load) and activate those that succeeded.
+    Returns the active table names. Compiled plans and cost estimates are dropped so routing reflects the new set.
+    """
+    from sql_builder import ALLOWED_DATASETS, clear_plan_cache
+
+    refreshed: dict[str, Rollup] = {}
+    for rollup in configured_rollups():
+        allowed = set(ALLOWED_DATASETS[rollup.dataset]["dimensions"])
+        if not set(rollup.dims) <= allowed:
+            logger.warning("rollup %s skipped: grain outside allowed dimensions", rollup.table)
+            continue
+        try:
+            refresh_rollup(rollup)
+        except Exception:
+            logger.exception("rollup %s refresh failed; requests use the base join", rollup.table)
+            continue
+        refreshed[rollup.table] = rollup
+    with _lock:
+        _active.clear()
+        _active.update(refreshed)
+    clear_plan_cache()
+    cost_estimator.clear()
+    return list(refreshed)
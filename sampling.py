@@ -0,0 +1,313 @@
+"""Approximate answers (SQLRequest.approx): stratified / uniform sample of the gov_jobs join, estimates with confidence intervals."""
+from __future__ import annotations
+
+import logging
+import math
+import random
+import statistics
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+from sqlalchemy import text
+
+from columnar import ColumnStore, DictColumn, filter_mask
+from config import settings
+from schemas import SQLRequest
+
+logger = logging.getLogger(__name__)
+
+# Join columns kept per sampled row (every dimension and filter column of gov_jobs).
+_SAMPLE_COLUMNS = ("jurisdiction", "code", "title", "job_code", "grade")
+_SAMPLE_SQL = (
+    "SELECT j.jurisdiction, j.code, j.title, s.job_code, s.grade, s.amount FROM "
+    "job_descriptions j JOIN salaries s ON j.jurisdiction = s.jurisdiction AND j.code = s.job_code"
+)
+
+
+@dataclass
+class Sample:
+    """
+    Sampled join rows as a ColumnStore, plus each row's stratum. population[h] / taken[h] are the stratum's
+    row counts in the full join and in the sample (equal when the stratum is sampled in full).
+    """
+    store: ColumnStore
+    strata: np.ndarray
+    names: list[str]  # stratum → jurisdiction (stratified) or "*" (uniform)
+    population: np.ndarray
+    taken: np.ndarray
+    method: str
+
+
+@dataclass
+class Approximation:
+    """
+    Point estimates in build_sql's column order; intervals[row][metric] = [low, high]. warnings:
+    truncated_to_limit (more estimated groups than limit), approx_groups_may_be_missing (grouped over a stratum
+    that is not sampled in full, so a group with no sampled rows has no row at all).
+    """
+    columns: list[str]
+    rows: list[list[Any]]
+    intervals: list[list[list[float | None]]]
+    rel_error: float  # largest CI half-width / |estimate| over all cells
+    sample_rows: int
+    population_rows: int
+    method: str
+    confidence: float = field(default_factory=lambda: settings.approx_confidence)
+    warnings: list[str] = field(default_factory=list)
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "method": self.method,
+            "confidence": self.confidence,
+            "intervals": self.intervals,
+            "max_rel_error": None if math.isinf(self.rel_error) else round(self.rel_error, 6),
+            "sample_rows": self.sample_rows,
+            "population_rows": self.population_rows,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Sample maintenance
+# ---------------------------------------------------------------------------
+
+
+def _dict_column(values: list[Any]) -> DictColumn:
+    index: dict[Any, int] = {}
+    codes = np.asarray([index.setdefault(v, len(index)) for v in values], dtype=np.int32)
+    return DictColumn(codes=codes, values=list(index))
+
+
+def _reservoirs(rows: Any, stratified: bool, size: int, rng: random.Random,
+                reservoirs: dict[str, list[tuple]], seen: dict[str, int]) -> None:
+    """Algorithm R per stratum over a row stream: each stratum keeps a uniform sample of up to size rows."""
+    for row in rows:
+        key = row[0] if stratified else "*"
+        n = seen.get(key, 0) + 1
+        seen[key] = n
+        bucket = reservoirs.setdefault(key, [])
+        if len(bucket) < size:
+            bucket.append(tuple(row))
+        else:
+            i = rng.randrange(n)
+            if i < size:
+                bucket[i] = tuple(row)
+
+
+def build_sample() -> Sample:
+    """
+    (Re)build the sample with one streamed pass over the join (every shard) and install it. Stratified keeps up
+    to APPROX_SAMPLE_ROWS rows per jurisdiction; uniform keeps that many overall. Built on the first approx
+    request (_build_in_background) and after reloads once it exists.
+    """
+    global _sample
+    from db_router import query_each_shard
+
+    stratified = settings.approx_sample_strategy != "uniform"
+    size = settings.approx_sample_rows
+    rng = random.Random(settings.approx_sample_seed)
+    reservoirs: dict[str, list[tuple]] = {}
+    seen: dict[str, int] = {}
+
+    def scan(engine: Any) -> None:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=5000).execute(text(_SAMPLE_SQL))
+            _reservoirs(result, stratified, size, rng, reservoirs, seen)
+
+    query_each_shard(scan)
+
+    names = sorted(reservoirs, key=lambda k: (k is None, str(k)))
+    rows = [r for name in names for r in reservoirs[name]]
+    store = ColumnStore(n_rows=len(rows), sources=["sample"])
+    for j, col in enumerate(_SAMPLE_COLUMNS):
+        store.dims[col] = _dict_column([r[j] for r in rows])
+    store.amount = np.asarray([float(r[5]) if r[5] is not None else np.nan for r in rows], dtype=np.float64)
+    sample = Sample(
+        store=store,
+        strata=np.repeat(np.arange(len(names)), [len(reservoirs[n]) for n in names]),
+        names=names,
+        population=np.asarray([seen[n] for n in names], dtype=np.float64),
+        taken=np.asarray([len(reservoirs[n]) for n in names], dtype=np.float64),
+        method="stratified" if stratified else "uniform",
+    )
+    with _lock:
+        _sample = sample
+    logger.info("approx sample: %d of %d rows, %d strata (%s)", store.n_rows, int(sample.population.sum()),
+                len(names), sample.method)
+    return sample
+
+
+_sample: Sample | None = None
+_building = False
+_lock = threading.Lock()
+
+
+def _build_in_background() -> None:
+    """Start one build_sample in a daemon thread unless the sample exists or is being built."""
+    global _building
+    with _lock:
+        if _building or _sample is not None:
+            return
+        _building = True
+
+    def run() -> None:
+        global _building
+        try:
+            build_sample()
+        except Exception:
+            logger.exception("approx sample build failed")  # the next approx request tries again
+        finally:
+            with _lock:
+                _building = False
+
+    threading.Thread(target=run, name="approx-sample", daemon=True).start()
+
+
+def sample_stats() -> dict[str, Any]:
+    with _lock:
+        s = _sample
+    if s is None:
+        return {"built": False, "building": _building}
+    return {
+        "built": True,
+        "method": s.method,
+        "strata": len(s.names),
+        "sample_rows": s.store.n_rows,
+        "population_rows": int(s.population.sum()),
+        "full_strata": int((s.taken == s.population).sum()),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Estimation
+# ---------------------------------------------------------------------------
+
+
+def _touched_strata(s: Sample, req: SQLRequest) -> np.ndarray:
+    """Strata req can read: its locations' strata when stratified by jurisdiction, else all."""
+    f = req.filters
+    if s.method != "stratified" or not f or not f.location:
+        return np.arange(len(s.names))
+    wanted = {v.casefold() for v in f.location}
+    return np.asarray([h for h, name in enumerate(s.names) if name is not None and str(name).casefold() in wanted],
+                      dtype=np.int64)
+
+
+def _sorted_rows(req: SQLRequest, columns: list[str], rows: list[list[Any]], intervals: list[list[Any]]) -> None:
+    """ORDER BY on point estimates (NULLs first ascending), keeping intervals aligned with rows."""
+    paired = list(zip(rows, intervals))
+    for ob in reversed(req.order_by):
+        if ob.field in columns:
+            j = columns.index(ob.field)
+            paired.sort(key=lambda p: (p[0][j] is not None, p[0][j]), reverse=ob.dir == "desc")
+    rows[:], intervals[:] = [p[0] for p in paired], [p[1] for p in paired]
+
+
+def approximate(req: SQLRequest, limit: int) -> Approximation | str:
+    """
+    Estimate req's avg / sum / count(amount) from the sample (stratified estimators; avg as a ratio estimator).
+    Returns a reason string instead when exact execution should answer: disabled (APPROX_ENABLED=false),
+    no_sample (not built yet: the first approx request starts the build), unsupported_metric, full_population
+    (every stratum req reads is sampled in full, so the sample is the population).
+    """
+    if not settings.approx_enabled:
+        return "disabled"
+    with _lock:
+        s = _sample
+    if s is None:
+        _build_in_background()
+        return "no_sample"
+    if any(m.name != "amount" or m.agg not in ("avg", "sum", "count") for m in req.metrics):
+        return "unsupported_metric"
+    touched = _touched_strata(s, req)
+    if len(touched) == 0 or bool(np.all(s.taken[touched] == s.population[touched])):
+        return "full_population"
+
+    store = s.store
+    idx = np.flatnonzero(filter_mask(store, req))
+    amount = store.amount[idx]
+    strata = s.strata[idx]
+    if req.dimensions:
+        keys = np.stack([store.dims[d].codes[idx] for d in req.dimensions], axis=1)
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n_groups = len(uniq)
+    else:
+        uniq = np.empty((1, 0), dtype=np.int32)
+        inverse = np.zeros(len(idx), dtype=np.int64)
+        n_groups = 1  # aggregate without GROUP BY always yields one row
+
+    # Per (group, stratum) sums of the indicator I (matching, non-NULL amount), y·I and y²·I.
+    n_strata = len(s.names)
+    valid = ~np.isnan(amount)
+    cell = inverse[valid] * n_strata + strata[valid]
+    y = amount[valid]
+    size = n_groups * n_strata
+    a = np.bincount(cell, minlength=size).reshape(n_groups, n_strata).astype(np.float64)
+    b = np.bincount(cell, weights=y, minlength=size).reshape(n_groups, n_strata)
+    c = np.bincount(cell, weights=y * y, minlength=size).reshape(n_groups, n_strata)
+
+    n_h, N_h = s.taken, s.population
+    weight = N_h / n_h
+    # Variance factor per stratum: N² (1 - n/N) / n, over the sample variance with n - 1 in the denominator.
+    fpc = N_h * N_h * (1.0 - n_h / N_h) / n_h
+    dof = np.maximum(n_h - 1.0, 1.0)
+
+    def variance(total: np.ndarray, squares: np.ndarray) -> np.ndarray:
+        s2 = np.maximum(squares - total * total / n_h, 0.0) / dof
+        return (fpc * s2).sum(axis=1)
+
+    count = (a * weight).sum(axis=1)
+    total = (b * weight).sum(axis=1)
+    var_count = variance(a, a)  # I² = I
+    var_total = variance(b, c)
+    ratio = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    r = ratio[:, None]
+    # Linearized ratio estimator: d = I (y - R), Σd = b - R a, Σd² = c - 2 R b + R² a.
+    var_ratio = variance(b - r * a, c - 2 * r * b + r * r * a) / np.maximum(count, 1e-12) ** 2
+
+    z = statistics.NormalDist().inv_cdf(0.5 + settings.approx_confidence / 2)
+    columns = [f"{m.agg}_{m.name}" for m in req.metrics] + list(req.dimensions)
+    rows: list[list[Any]] = []
+    intervals: list[list[Any]] = []
+    rel_error = 0.0
+    for g in range(n_groups):
+        values: list[Any] = []
+        bounds: list[Any] = []
+        for m in req.metrics:
+            est, var = {"avg": (ratio[g], var_ratio[g]), "sum": (total[g], var_total[g]),
+                        "count": (count[g], var_count[g])}[m.agg]
+            half = z * math.sqrt(max(float(var), 0.0))
+            if m.agg != "count" and count[g] == 0:
+                values.append(None)  # SQL NULL over no rows
+                bounds.append([None, None])
+                continue
+            low, high = float(est) - half, float(est) + half
+            if m.agg == "count":
+                values.append(int(round(float(est))))
+                low = max(low, 0.0)
+            else:
+                values.append(float(est))
+            bounds.append([round(low, 6), round(high, 6)])
+            if half:
+                rel_error = max(rel_error, half / abs(float(est)) if est else math.inf)
+        rows.append(values + [store.dims[d].values[code] for d, code in zip(req.dimensions, uniq[g].tolist())])
+        intervals.append(bounds)
+
+    _sorted_rows(req, columns, rows, intervals)
+    warnings: list[str] = []
+    if len(rows) > limit:
+        warnings.append("truncated_to_limit")
+    if req.dimensions and bool(np.any(n_h[touched] < N_h[touched])):
+        warnings.append("approx_groups_may_be_missing")
+    return Approximation(
+        columns=columns,
+        rows=rows[:limit],
+        intervals=intervals[:limit],
+        rel_error=rel_error,
+        sample_rows=int(n_h[touched].sum()),
+        population_rows=int(N_h[touched].sum()),
+        method=s.method,
+        warnings=warnings,
+    )
@@ -38,6 +38,14 @@ class SQLRequestFilters(BaseModel):
     extra: dict[str, Any] | None = None
 
 
+class ApproxSpec(BaseModel):
+    """Opt-in approximate answer from a maintained sample (avg / sum / count of amount only)."""
+    max_ms: int | None = Field(None, ge=1, description="Time budget for exact execution when the sample is not precise enough")
+    max_rel_error: float | None = Field(
+        None, gt=0, description="Largest acceptable CI half-width / |estimate|; above it, try exact execution"
+    )
+
+
 class SQLRequest(BaseModel):
     """Strict input schema for the SQL MCP tool. Orchestrator produces this."""
     version: str = Field("v1", description="Schema version")
@@ -47,6 +55,7 @@ class SQLRequest(BaseModel):
     filters: SQLRequestFilters | None = None
     limit: int = Field(100, ge=1, le=500, description="Max rows (capped by server)")
     order_by: list[OrderBySpec] = Field(default_factory=list, max_length=4)
+    approx: ApproxSpec | None = Field(None, description="Accept a sample-based estimate with confidence intervals")
 
 
 # ---------------------------------------------------------------------------
@@ -65,3 +74,7 @@ class SQLResponse(BaseModel):
     elapsed_ms: int = Field(0, description="Execution time in milliseconds")
     warnings: list[str] = Field(default_factory=list, description="e.g. truncated_to_limit")
     fingerprint: str | None = Field(None, description="sha256 of query+params for cache/audit")
+    cache_hit: bool = Field(False, description="Rows served from the result cache")
+    approx: dict[str, Any] | None = Field(
+        None, description="Set for approximate answers: method, confidence, intervals[row][metric] = [low, high], sample sizes"
+    )
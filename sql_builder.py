@@ -1,15 +1,21 @@
 """Deterministic SQL builder. No LLM — request → validated, parameterized SELECT only."""
 from __future__ import annotations
 
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any
 
 from config import settings
+from rollups import Rollup, covering_rollup
 from schemas import (
     AggOp,
     OrderBySpec,
     SQLRequest,
     SQLRequestFilters,
 )
+from title_index import title_keys
 
 
 # Whitelisted datasets and their allowed columns/expressions.
@@ -18,6 +24,7 @@ ALLOWED_DATASETS: dict[str, dict[str, Any]] = {
     "gov_jobs": {
         # View: job_descriptions JOIN salaries ON jurisdiction AND code = job_code
         "base": "job_descriptions j JOIN salaries s ON j.jurisdiction = s.jurisdiction AND j.code = s.job_code",
+        "tables": ["job_descriptions", "salaries"],  # reloads of these invalidate cached results
         "columns": {"jurisdiction", "code", "title", "description", "job_code", "grade", "amount", "id"},
         "metrics": {"amount"},  # numeric columns that can be aggregated
         "dimensions": ["jurisdiction", "title", "grade", "job_code", "code"],
@@ -93,8 +100,30 @@ def _build_select_list(req: SQLRequest) -> tuple[list[str], list[str], dict[str,
     return select_parts, group_by_parts, params
 
 
-def _build_where(req: SQLRequest, params: dict[str, Any]) -> list[str]:
-    """Build WHERE clauses from filters; add to params. Returns list of SQL conditions."""
+def _bucket(n: int) -> int:
+    """Placeholder count for n values: next power of two, so plans stay few per shape."""
+    return 1 << (n - 1).bit_length() if n else 0
+
+
+def _key_bucket(keys: list[tuple[str, str]] | None) -> tuple[int, int] | None:
+    """(jurisdiction, code) placeholder counts for title keys; None keeps the LIKE-only plan."""
+    if keys is None:
+        return None
+    return _bucket(len({j for j, _ in keys})), _bucket(len({c for _, c in keys}))
+
+
+def _build_where(
+    req: SQLRequest,
+    params: dict[str, Any],
+    alias: str = "j",
+    title_bucket: tuple[int, int] | None = None,
+) -> list[str]:
+    """
+    Build WHERE clauses from filters; add to params. Returns list of SQL conditions.
+    With title_bucket (base join only), job_title_contains also gets jurisdiction IN (...) AND code IN (...)
+    over the trigram-index keys, which both MySQL and SQLite seek on the (jurisdiction, code) index.
+    The LIKE stays as the exact residual check (the IN lists admit the cross product of keys).
+    """
     conditions: list[str] = []
     if not req.filters:
         return conditions
@@ -102,16 +131,24 @@ def _build_where(req: SQLRequest, params: dict[str, Any]) -> list[str]:
     f = req.filters
     if f.location:
         placeholders = ", ".join([f":loc_{i}" for i in range(len(f.location))])
-        conditions.append(f"j.jurisdiction IN ({placeholders})")
+        conditions.append(f"{alias}.jurisdiction IN ({placeholders})")
         for i, v in enumerate(f.location):
             params[f"loc_{i}"] = v
 
+    if f.job_title_contains and title_bucket is not None:
+        n_j, n_c = title_bucket
+        if not n_c:
+            conditions.append("1 = 0")
+        else:
+            conditions.append(f"{alias}.jurisdiction IN ({', '.join(f':tk_j_{i}' for i in range(n_j))})")
+            conditions.append(f"{alias}.code IN ({', '.join(f':tk_c_{i}' for i in range(n_c))})")
+
     if f.job_title_contains:
         or_parts = []
         for i, sub in enumerate(f.job_title_contains):
             key = f"title_like_{i}"
             params[key] = f"%{sub}%"
-            or_parts.append(f"j.title LIKE :{key}")
+            or_parts.append(f"{alias}.title LIKE :{key}")
         if or_parts:
             conditions.append("(" + " OR ".join(or_parts) + ")")
 
@@ -125,25 +162,103 @@ def _build_where(req: SQLRequest, params: dict[str, Any]) -> list[str]:
     return conditions
 
 
-def build_sql(req: SQLRequest) -> tuple[str, dict[str, Any], list[str]]:
+def _shape_key(req: SQLRequest, title_bucket: tuple[int, int] | None = None) -> tuple:
     """
-    Build a single parameterized SELECT from SQLRequest.
-    Returns (sql, params, warnings). Raises ValueError if validation fails.
+    Query shape: everything that determines the SQL text, but no filter values.
+    LIMIT is a bound parameter, so every limit shares the same plan; title keys are bucketed (_key_bucket).
     """
+    f = req.filters
+    return (
+        title_bucket,
+        req.dataset,
+        tuple((m.name, m.agg) for m in req.metrics),
+        tuple(req.dimensions),
+        tuple((ob.field, ob.dir) for ob in req.order_by),
+        len(f.location) if f and f.location else 0,
+        len(f.job_title_contains) if f and f.job_title_contains else 0,
+        bool(f and f.year is not None and f.year.gte is not None),
+        bool(f and f.year is not None and f.year.lte is not None),
+    )
+
+
+def shape_of(req: SQLRequest) -> str:
+    """Short stable id of req's query shape (title keys not bucketed), for grouping logged traffic."""
+    return hashlib.sha1(repr(_shape_key(req)).encode()).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class _Plan:
+    """Validated, compiled statement for one query shape."""
+    sql: str
+    source: str = "base"  # or the rollup table that answers this shape
+    title_bucket: tuple[int, int] | None = None  # title key placeholders in sql (None: LIKE only)
+
+
+# Rollup expressions per agg: stored sums/counts re-aggregate exactly (avg = sum / count).
+_ROLLUP_AGG = {
+    "avg": "SUM(r.sum_amount) / NULLIF(SUM(r.count_amount), 0)",
+    "sum": "SUM(r.sum_amount)",
+    "count": "COALESCE(SUM(r.count_amount), 0)",
+    "min": "MIN(r.min_amount)",
+    "max": "MAX(r.max_amount)",
+}
+
+
+def _rollup_for(req: SQLRequest) -> Rollup | None:
+    """Rollup covering every dimension, filter column and order field of req, if one is materialized."""
+    if settings.db_backend == "local" or settings.db_shards or any(m.name != "amount" for m in req.metrics):
+        return None  # rollup tables live on the primary only; shards answer from the base join
+    needed = set(req.dimensions)
+    f = req.filters
+    if f and f.location:
+        needed.add("jurisdiction")
+    if f and f.job_title_contains:
+        needed.add("title")
+    if f and f.extra:
+        return None
+    aliases = {f"{m.agg}_{m.name}" for m in req.metrics}
+    if any(ob.field not in aliases and ob.field not in req.dimensions for ob in req.order_by):
+        return None
+    return covering_rollup(req.dataset, needed)
+
+
+def _compile_rollup(req: SQLRequest, rollup: Rollup) -> _Plan:
+    """Same result shape as _compile, read from a rollup table instead of the base join."""
+    select_parts = [f"{_ROLLUP_AGG[m.agg]} AS {m.agg}_{m.name}" for m in req.metrics]
+    select_parts += [f"r.{d}" for d in req.dimensions]
+    where_parts = _build_where(req, {}, alias="r")
+
+    parts = ["SELECT", ", ".join(select_parts), f"FROM {rollup.table} r"]
+    if where_parts:
+        parts.append("WHERE " + " AND ".join(where_parts))
+    if req.dimensions:
+        parts.append("GROUP BY " + ", ".join(f"r.{d}" for d in req.dimensions))
+    if req.order_by:
+        parts.append("ORDER BY " + ", ".join(f"{ob.field} {ob.dir.upper()}" for ob in req.order_by))
+    parts.append("LIMIT :row_limit")
+    return _Plan(sql=" ".join(parts), source=rollup.table)
+
+
+_plan_cache: OrderedDict[tuple, _Plan] = OrderedDict()
+_plan_lock = threading.Lock()
+_plan_stats = {"hits": 0, "misses": 0}
+
+
+def _compile(req: SQLRequest, title_bucket: tuple[int, int] | None = None) -> _Plan:
+    """Validate and build the parameterized SELECT for req's shape. Raises ValueError if validation fails."""
     errs = _validate_request(req)
     if errs:
         raise ValueError("; ".join(errs))
 
-    limit = min(req.limit, settings.sql_max_limit)
-    warnings: list[str] = []
-    if req.limit > settings.sql_max_limit:
-        warnings.append("truncated_to_limit")
+    rollup = _rollup_for(req)
+    if rollup is not None:
+        return _compile_rollup(req, rollup)
 
     cfg = ALLOWED_DATASETS[req.dataset]
     base = cfg["base"]
 
     select_parts, group_by_parts, params = _build_select_list(req)
-    where_parts = _build_where(req, params)
+    where_parts = _build_where(req, params, title_bucket=title_bucket)
 
     sql_select = ", ".join(select_parts)
     sql_from = "FROM " + base
@@ -155,7 +270,7 @@ def build_sql(req: SQLRequest) -> tuple[str, dict[str, Any], list[str]]:
         for ob in req.order_by:
             order_clauses.append(f"{ob.field} {ob.dir.upper()}")
         sql_order = "ORDER BY " + ", ".join(order_clauses)
-    sql_limit = f"LIMIT {limit}"
+    sql_limit = "LIMIT :row_limit"
 
     parts = ["SELECT", sql_select, sql_from]
     if sql_where:
@@ -166,5 +281,181 @@ def build_sql(req: SQLRequest) -> tuple[str, dict[str, Any], list[str]]:
         parts.append(sql_order)
     parts.append(sql_limit)
 
-    sql = " ".join(parts)
-    return sql, params, warnings
+    return _Plan(sql=" ".join(parts), title_bucket=title_bucket)
+
+
+def _plan_for(req: SQLRequest, title_bucket: tuple[int, int] | None = None) -> _Plan:
+    """Plan from the shape cache; validate and compile on first sight of a shape."""
+    key = _shape_key(req, title_bucket)
+    with _plan_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None:
+            _plan_cache.move_to_end(key)
+            _plan_stats["hits"] += 1
+            return plan
+    plan = _compile(req, title_bucket)
+    with _plan_lock:
+        _plan_stats["misses"] += 1
+        _plan_cache[key] = plan
+        while len(_plan_cache) > settings.plan_cache_size:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def _title_keys(req: SQLRequest) -> list[tuple[str, str]] | None:
+    """Trigram-index keys for req's job_title_contains filter (None: keep LIKE)."""
+    f = req.filters
+    if not f or not f.job_title_contains:
+        return None
+    return title_keys(f.job_title_contains, f.location)
+
+
+def _bind_params(
+    req: SQLRequest,
+    limit: int,
+    keys: list[tuple[str, str]] | None = None,
+    title_bucket: tuple[int, int] | None = None,
+) -> dict[str, Any]:
+    """Parameter values for a cached plan. Names must match _build_where placeholders."""
+    params: dict[str, Any] = {}
+    if keys and title_bucket:
+        # Pad with the last value up to the bucket size (duplicates in IN lists are harmless).
+        for prefix, values, n in (
+            ("tk_j", sorted({j for j, _ in keys}), title_bucket[0]),
+            ("tk_c", sorted({c for _, c in keys}), title_bucket[1]),
+        ):
+            for i, v in enumerate(values + [values[-1]] * (n - len(values))):
+                params[f"{prefix}_{i}"] = v
+    f = req.filters
+    if f:
+        if f.location:
+            for i, v in enumerate(f.location):
+                params[f"loc_{i}"] = v
+        if f.job_title_contains:
+            for i, sub in enumerate(f.job_title_contains):
+                params[f"title_like_{i}"] = f"%{sub}%"
+        if f.year is not None:
+            if f.year.gte is not None:
+                params["year_gte"] = f.year.gte
+            if f.year.lte is not None:
+                params["year_lte"] = f.year.lte
+    params["row_limit"] = limit
+    return params
+
+
+def _field_expr(req: SQLRequest, field: str) -> str:
+    """SQL expression behind a select-list name (dimension column or metric alias), usable in HAVING."""
+    for m in req.metrics:
+        if field == f"{m.agg}_{m.name}":
+            return f"{m.agg.upper()}(s.amount)" if m.name == "amount" else f"{m.agg.upper()}({m.name})"
+    if field in ("jurisdiction", "code", "title"):
+        return f"j.{field}"
+    if field in ("job_code", "grade"):
+        return f"s.{field}"
+    raise ValueError(f"field not in select list: {field}")
+
+
+def page_keys(req: SQLRequest) -> list[tuple[str, str]]:
+    """Keyset sort keys: order_by fields, then remaining dimensions ascending (a total order over groups)."""
+    keys = [(ob.field, ob.dir) for ob in req.order_by]
+    seen = {f for f, _ in keys}
+    keys += [(d, "asc") for d in req.dimensions if d not in seen]
+    return keys
+
+
+def _same_key(expr: str, value: Any, i: int) -> str:
+    return f"{expr} IS NULL" if value is None else f"{expr} = :after_{i}"
+
+
+def _past_key(expr: str, direction: str, value: Any, i: int) -> str | None:
+    """
+    expr sorts strictly after value. MySQL and SQLite order NULLs first ascending and last descending,
+    so NULL is below every value; None when nothing can follow (NULL, descending).
+    """
+    if direction == "desc":
+        return None if value is None else f"({expr} < :after_{i} OR {expr} IS NULL)"
+    return f"{expr} IS NOT NULL" if value is None else f"{expr} > :after_{i}"
+
+
+def build_page_sql(
+    req: SQLRequest,
+    after: list[Any] | None,
+    page_size: int,
+) -> tuple[str, dict[str, Any], list[str]]:
+    """
+    Keyset-paginated SELECT: same query as build_sql, ordered by page_keys(req), resuming strictly after
+    the key values of the previous page's last row. Returns (sql, params, key_fields).
+    Fetches page_size + 1 rows so the caller can tell whether another page exists.
+    """
+    errs = _validate_request(req)
+    if errs:
+        raise ValueError("; ".join(errs))
+    keys = page_keys(req) if req.dimensions else []
+    for field, _ in keys:
+        _field_expr(req, field)  # raises for fields outside the select list (e.g. raw amount)
+
+    keys_for_title = _title_keys(req)
+    title_bucket = _key_bucket(keys_for_title)
+    select_parts, group_by_parts, params = _build_select_list(req)
+    where_parts = _build_where(req, params, title_bucket=title_bucket)
+    params.update(_bind_params(req, page_size + 1, keys_for_title, title_bucket))
+
+    having = ""
+    if after is not None:
+        if len(after) != len(keys):
+            raise ValueError("page token does not match request keys")
+        # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with < for descending keys
+        ors = []
+        for i, (field, direction) in enumerate(keys):
+            past = _past_key(_field_expr(req, field), direction, after[i], i)
+            if past is None:
+                continue
+            ands = [_same_key(_field_expr(req, f), after[k], k) for k, (f, _) in enumerate(keys[:i])]
+            ors.append("(" + " AND ".join(ands + [past]) + ")")
+        for i, v in enumerate(after):
+            if v is not None:
+                params[f"after_{i}"] = v
+        having = "HAVING " + (" OR ".join(ors) if ors else "1 = 0")
+
+    parts = ["SELECT", ", ".join(select_parts), "FROM " + ALLOWED_DATASETS[req.dataset]["base"]]
+    if where_parts:
+        parts.append("WHERE " + " AND ".join(where_parts))
+    if group_by_parts:
+        parts.append("GROUP BY " + ", ".join(group_by_parts))
+    if having:
+        parts.append(having)
+    if keys:
+        aliases = {f"{m.agg}_{m.name}" for m in req.metrics}
+        parts.append("ORDER BY " + ", ".join(f"{f if f in aliases else _field_expr(req, f)} {d.upper()}" for f, d in keys))
+    parts.append("LIMIT :row_limit")
+    return " ".join(parts), params, [f for f, _ in keys]
+
+
+def plan_cache_info() -> dict[str, int]:
+    with _plan_lock:
+        return {"size": len(_plan_cache), **_plan_stats}
+
+
+def clear_plan_cache() -> None:
+    with _plan_lock:
+        _plan_cache.clear()
+
+
+def build_sql(req: SQLRequest) -> tuple[str, dict[str, Any], list[str]]:
+    """
+    Build a single parameterized SELECT from SQLRequest.
+    Returns (sql, params, warnings). Raises ValueError if validation fails.
+    Statements are cached per query shape (_shape_key); only parameter values are bound per request.
+    Title substrings resolved by the trigram index become (jurisdiction, code) keys bound into the plan.
+    """
+    keys = None if _rollup_for(req) is not None else _title_keys(req)
+    plan = _plan_for(req, _key_bucket(keys))
+
+    limit = min(req.limit, settings.sql_max_limit)
+    warnings: list[str] = []
+    if req.limit > settings.sql_max_limit:
+        warnings.append("truncated_to_limit")
+    if plan.source != "base":
+        warnings.append(f"source:{plan.source}")
+
+    return plan.sql, _bind_params(req, limit, keys, plan.title_bucket), warnings
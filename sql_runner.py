@@ -1,12 +1,23 @@
 """Execute validated SQL with timeout, truncation, fingerprint. Returns SQLResponse."""
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import time
+from dataclasses import dataclass
+from typing import Any
 
+from admission import Overloaded, db_limiter
+from columnar import execute_request as execute_local
 from config import settings
-from db import execute_query
+from db import execute_query_async
+from db_router import execute_routed, get_router
+from explain import Estimate, cost_estimator
+from metrics import stage
+from resilience import CircuitOpen, DeadlineExceeded, bounded, db_breaker
+from result_cache import result_cache
+from sampling import Approximation, approximate
 from schemas import SQLRequest, SQLResponse
 from sql_builder import build_sql
 
@@ -17,14 +28,22 @@ def _fingerprint(query: str, params: dict) -> str:
     return "sha256:" + hashlib.sha256(payload.encode()).hexdigest()
 
 
-def run_request(req: SQLRequest, request_id: str | None = None) -> SQLResponse:
-    """
-    Validate → build SQL → execute with guardrails → return SQLResponse.
-    SELECT-only, parameterized, timeout and limit enforced.
-    """
-    start = time.perf_counter()
+@dataclass
+class _Prepared:
+    """Built statement ready to execute (cache miss)."""
+    sql: str
+    params: dict[str, Any]
+    warnings: list[str]
+    fingerprint: str
+    generation: tuple[int, int]
+    limit: int
+
+
+def _prepare(req: SQLRequest, request_id: str | None, start: float) -> _Prepared | SQLResponse:
+    """Build SQL and consult the result cache. Returns a final SQLResponse on build error or cache hit."""
     try:
-        sql, params, build_warnings = build_sql(req)
+        with stage("build"):
+            sql, params, build_warnings = build_sql(req)
     except ValueError as e:
         return SQLResponse(
             ok=False,
@@ -39,37 +58,239 @@ def run_request(req: SQLRequest, request_id: str | None = None) -> SQLResponse:
             fingerprint=None,
         )
 
-    limit = min(req.limit, settings.sql_max_limit)
-    try:
-        columns, rows, run_warnings = execute_query(
-            sql, params, timeout_sec=settings.sql_timeout_sec, limit=limit
-        )
-    except Exception as e:
-        return SQLResponse(
-            ok=False,
+    fingerprint = _fingerprint(sql, params)
+    cached = result_cache.get(fingerprint)
+    if cached is not None:
+        all_warnings = build_warnings + cached.warnings
+        return SQLResponse.model_construct(  # rows come from our own cache: no re-validation
+            ok=True,
             request_id=request_id,
             query=sql,
             params=params,
-            columns=[],
-            rows=[],
-            row_count=0,
+            columns=cached.columns,
+            rows=cached.rows,
+            row_count=len(cached.rows),
             elapsed_ms=int((time.perf_counter() - start) * 1000),
-            warnings=[f"execution_error: {e}"],
-            fingerprint=_fingerprint(sql, params),
+            warnings=all_warnings,
+            fingerprint=fingerprint,
+            cache_hit=True,
         )
 
-    all_warnings = build_warnings + run_warnings
-    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    return _Prepared(
+        sql=sql,
+        params=params,
+        warnings=build_warnings,
+        fingerprint=fingerprint,
+        generation=result_cache.generation(req.dataset),
+        limit=min(req.limit, settings.sql_max_limit),
+    )
+
 
+def _cost_gate(p: _Prepared, request_id: str | None, start: float, est: Estimate) -> SQLResponse | None:
+    """Apply the EXPLAIN verdict: a rejection response, or a cost_warning added to p.warnings."""
+    verdict = cost_estimator.verdict(est)
+    if verdict is None:
+        return None
+    action, message = verdict
+    if action == "warn":
+        p.warnings.append(message)
+        return None
     return SQLResponse(
+        ok=False,
+        request_id=request_id,
+        query=p.sql,
+        params=p.params,
+        columns=[],
+        rows=[],
+        row_count=0,
+        elapsed_ms=int((time.perf_counter() - start) * 1000),
+        warnings=p.warnings + [message],
+        fingerprint=p.fingerprint,
+    )
+
+
+def _failed(p: _Prepared, request_id: str | None, start: float, e: Exception) -> SQLResponse:
+    return SQLResponse(
+        ok=False,
+        request_id=request_id,
+        query=p.sql,
+        params=p.params,
+        columns=[],
+        rows=[],
+        row_count=0,
+        elapsed_ms=int((time.perf_counter() - start) * 1000),
+        warnings=[f"execution_error: {e}"],
+        fingerprint=p.fingerprint,
+    )
+
+
+def _completed(
+    req: SQLRequest,
+    p: _Prepared,
+    request_id: str | None,
+    start: float,
+    columns: list[str],
+    rows: list[list[Any]],
+    run_warnings: list[str],
+) -> SQLResponse:
+    result_cache.put(p.fingerprint, req.dataset, columns, rows, run_warnings, p.generation)
+    all_warnings = p.warnings + run_warnings
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+
+    return SQLResponse.model_construct(  # rows come straight from the driver: skip per-row validation
         ok=True,
         request_id=request_id,
-        query=sql,
-        params=params,
+        query=p.sql,
+        params=p.params,
         columns=columns,
         rows=rows,
         row_count=len(rows),
         elapsed_ms=elapsed_ms,
         warnings=all_warnings if all_warnings else [],
-        fingerprint=_fingerprint(sql, params),
+        fingerprint=p.fingerprint,
+    )
+
+
+def _try_approx(req: SQLRequest, p: _Prepared) -> Approximation | None:
+    """
+    The sampled estimate when req.approx asks for one, else None. Requests the sample cannot answer (or the
+    in-memory local backend) run exact with an approx_skipped:<reason> warning.
+    """
+    if req.approx is None:
+        return None
+    if settings.db_backend == "local":
+        p.warnings.append("approx_skipped:local_backend")
+        return None
+    with stage("approx"):
+        result = approximate(req, p.limit)
+    if isinstance(result, str):
+        p.warnings.append(f"approx_skipped:{result}")
+        return None
+    return result
+
+
+def _within_bound(req: SQLRequest, p: _Prepared, result: Approximation) -> bool:
+    """True when the estimate meets approx.max_rel_error; else exact runs and the estimate is only its fallback."""
+    bound = req.approx.max_rel_error if req.approx is not None else None
+    if bound is None or result.rel_error <= bound:
+        return True
+    p.warnings.append("approx_rel_error_exceeded")
+    return False
+
+
+def _approximated(p: _Prepared, request_id: str | None, start: float, result: Approximation) -> SQLResponse:
+    """Answer from the sample: point estimates as rows, intervals under approx. Never cached."""
+    return SQLResponse.model_construct(
+        ok=True,
+        request_id=request_id,
+        query=p.sql,
+        params=p.params,
+        columns=result.columns,
+        rows=result.rows,
+        row_count=len(result.rows),
+        elapsed_ms=int((time.perf_counter() - start) * 1000),
+        warnings=p.warnings + result.warnings + [f"approximate:{result.method}"],
+        fingerprint=None,
+        approx=result.info(),
     )
+
+
+def _exact_timeout(req: SQLRequest, approx: Approximation | None) -> float:
+    """
+    SQL_TIMEOUT_SEC, capped at approx.max_ms when exact execution is only refining an estimate, and at the
+    request's remaining budget (raises DeadlineExceeded when none is left).
+    """
+    timeout_sec = settings.sql_timeout_sec
+    if approx is not None and req.approx is not None and req.approx.max_ms is not None:
+        timeout_sec = min(timeout_sec, req.approx.max_ms / 1000)
+    return bounded(timeout_sec, "execute")
+
+
+def run_request(req: SQLRequest, request_id: str | None = None) -> SQLResponse:
+    """
+    Validate → build SQL → execute with guardrails → return SQLResponse.
+    SELECT-only, parameterized, timeout and limit enforced.
+    """
+    start = time.perf_counter()
+    prepared = _prepare(req, request_id, start)
+    if isinstance(prepared, SQLResponse):
+        return prepared
+    approx = _try_approx(req, prepared)
+    if approx is not None and _within_bound(req, prepared, approx):
+        return _approximated(prepared, request_id, start, approx)
+    if settings.explain_gate != "off" and settings.db_backend != "local":
+        with stage("explain"):
+            rejected = _cost_gate(prepared, request_id, start, cost_estimator.estimate(prepared.sql, prepared.params))
+        if rejected is not None:
+            return _approximated(prepared, request_id, start, approx) if approx is not None else rejected
+
+    try:
+        if settings.db_backend == "local":
+            with stage("execute"):
+                columns, rows, run_warnings = execute_local(req, limit=prepared.limit)
+        else:
+            timeout_sec = _exact_timeout(req, approx)
+            with db_breaker.guard():
+                columns, rows, run_warnings = execute_routed(
+                    req, prepared.sql, prepared.params, timeout_sec, prepared.limit
+                )
+    except (CircuitOpen, DeadlineExceeded):
+        if approx is not None:
+            return _approximated(prepared, request_id, start, approx)
+        raise
+    except Exception as e:
+        if approx is not None:
+            return _approximated(prepared, request_id, start, approx)
+        return _failed(prepared, request_id, start, e)
+
+    return _completed(req, prepared, request_id, start, columns, rows, run_warnings)
+
+
+async def run_request_async(req: SQLRequest, request_id: str | None = None) -> SQLResponse:
+    """
+    Same contract as run_request without blocking the loop: the async engine (DB_BACKEND=async without replicas
+    or shards), else the sync engine in a worker thread (routed to replicas / shards, see db_router). Execution, and EXPLAIN on a shape's
+    first sight, take a db admission slot (raises Overloaded when saturated); build errors and cache hits answer
+    straight away. Execution is bounded by the request's budget
+    (DeadlineExceeded) and the db circuit breaker (CircuitOpen).
+    """
+    start = time.perf_counter()
+    prepared = _prepare(req, request_id, start)
+    if isinstance(prepared, SQLResponse):
+        return prepared
+    approx = _try_approx(req, prepared)
+    if approx is not None and _within_bound(req, prepared, approx):
+        return _approximated(prepared, request_id, start, approx)  # no db slot: the sample is in memory
+    try:
+        if settings.explain_gate != "off":
+            with stage("explain"):
+                est = cost_estimator.cached(prepared.sql)
+                if est is None:  # first sight of the shape: EXPLAIN is a database call like any other
+                    async with db_limiter.slot():
+                        est = await cost_estimator.estimate_async(prepared.sql, prepared.params)
+                rejected = _cost_gate(prepared, request_id, start, est)
+            if rejected is not None:
+                return _approximated(prepared, request_id, start, approx) if approx is not None else rejected
+
+        db_breaker.check()  # fail fast before queueing for a slot
+        async with db_limiter.slot():
+            timeout_sec = _exact_timeout(req, approx)  # after the queue wait: what is left of the budget
+            with db_breaker.guard():
+                if settings.db_backend == "async" and not get_router().enabled:
+                    columns, rows, run_warnings = await execute_query_async(
+                        prepared.sql, prepared.params, timeout_sec=timeout_sec, limit=prepared.limit
+                    )
+                else:
+                    columns, rows, run_warnings = await asyncio.to_thread(
+                        execute_routed, req, prepared.sql, prepared.params, timeout_sec, prepared.limit
+                    )
+    except (CircuitOpen, DeadlineExceeded, Overloaded):
+        if approx is not None:
+            return _approximated(prepared, request_id, start, approx)  # degraded, but an answer
+        raise
+    except Exception as e:
+        if approx is not None:
+            return _approximated(prepared, request_id, start, approx)
+        return _failed(prepared, request_id, start, e)
+
+    return _completed(req, prepared, request_id, start, columns, rows, run_warnings)
@@ -0,0 +1,140 @@
+"""
+Cold start: import timing, concurrent warmup steps (critical ones gate serving, failed ones retry in the background),
+readiness for /ready and /health.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Step:
+    """
+    One warmup action. Critical steps must finish before the app serves; the rest warm in the background.
+    A failed critical (or retry) step is run again with backoff until it succeeds.
+    """
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    critical: bool = False
+    retry: bool = False
+
+
+class Startup:
+    """
+    Import and warmup timings since the app module started importing. ready = every critical step succeeded,
+    possibly on a background retry after the app started serving.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.import_ms: float | None = None
+        self.ready_ms: float | None = None
+        self.warm_ms: float | None = None
+        self.steps: dict[str, dict[str, Any]] = {}
+        self._critical: set[str] = set()
+
+    def _since_t0(self) -> float:
+        return round((time.perf_counter() - self.t0) * 1000, 1)
+
+    def imported(self, since: float) -> None:
+        """Record app import time; since = perf_counter() taken before the app's first heavy import."""
+        self.t0 = since
+        self.import_ms = self._since_t0()
+
+    async def _run_step(self, step: Step) -> None:
+        info = self.steps[step.name]
+        started = time.perf_counter()
+        info["attempts"] += 1
+        try:
+            await step.run()
+            info["state"] = "ok"
+            info["error"] = None
+        except Exception as e:
+            info["state"] = "failed"
+            info["error"] = f"{type(e).__name__}: {e}"
+            logger.exception("startup step %s failed", step.name)
+        info["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _start_retry(self, step: Step) -> asyncio.Task[None]:
+        self.steps[step.name]["state"] = "retrying"
+        return asyncio.create_task(self._retry(step))
+
+    async def _retry(self, step: Step) -> None:
+        """Re-run a failed step until it succeeds: after STARTUP_RETRY_INITIAL_SEC, doubling up to STARTUP_RETRY_MAX_SEC."""
+        delay = settings.startup_retry_initial_sec
+        while self.steps[step.name]["state"] != "ok":
+            self.steps[step.name]["state"] = "retrying"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.startup_retry_max_sec)
+            await self._run_step(step)
+        logger.info("startup step %s succeeded on attempt %d", step.name, self.steps[step.name]["attempts"])
+        if step.critical and self.ready:
+            self.ready_ms = self._since_t0()
+            logger.info("startup: ready in %.0f ms, after retries", self.ready_ms)
+
+    async def _run_retrying(self, step: Step) -> None:
+        await self._run_step(step)
+        if self.steps[step.name]["state"] != "ok" and step.retry:
+            await self._retry(step)
+
+    async def run(self, steps: list[Step]) -> asyncio.Task[None]:
+        """
+        Start every step at once; return when the critical ones have run once (successful or not). The app
+        serves from then on; ready turns true once every critical step has succeeded, on a retry if need be
+        (ready_ms is then when the last one did). The returned task finishes the background steps, then the
+        retries (cancel it on shutdown).
+        """
+        for step in steps:
+            self.steps[step.name] = {"critical": step.critical, "state": "pending", "ms": None, "attempts": 0}
+        self._critical = {s.name for s in steps if s.critical}
+        critical = {s.name: asyncio.create_task(self._run_step(s)) for s in steps if s.critical}
+        background = [asyncio.create_task(self._run_retrying(s)) for s in steps if not s.critical]
+        await asyncio.gather(*critical.values())
+        self.ready_ms = self._since_t0()
+        if self.ready:
+            logger.info("startup: ready in %.0f ms (import %.0f ms)", self.ready_ms, self.import_ms or 0)
+        else:
+            logger.warning("startup: serving after %.0f ms, not ready: critical steps retry in the background",
+                           self.ready_ms)
+        retries = [self._start_retry(s) for s in steps if s.critical and self.steps[s.name]["state"] != "ok"]
+
+        async def finish() -> None:
+            try:
+                await asyncio.gather(*background)
+                self.warm_ms = self._since_t0()
+                logger.info("startup: warm in %.0f ms", self.warm_ms)
+                await asyncio.gather(*retries)
+            finally:
+                for task in (*background, *retries):
+                    task.cancel()
+
+        return asyncio.create_task(finish())
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_ms is not None and all(self.steps[n]["state"] == "ok" for n in self._critical)
+
+    @property
+    def warm(self) -> bool:
+        return self.warm_ms is not None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warm": self.warm,
+            "import_ms": self.import_ms,
+            "ready_ms": self.ready_ms,
+            "warm_ms": self.warm_ms,
+            "steps": self.steps,
+        }
+
+
+startup = Startup()
@@ -0,0 +1,58 @@
+"""
+Offline test environment: settings are read from the environment at import, so it is fixed here before any app
+module loads. The database is a SQLite copy of data/raw-data (benchmark.seed_sqlite); no MySQL or LLM needed.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+
+from benchmark import seed_sqlite
+
+_DIR = tempfile.mkdtemp(prefix="sql-agent-tests-")
+DB_PATH = os.path.join(_DIR, "gov_jobs.db")
+seed_sqlite(DB_PATH)
+
+os.environ.update(
+    DB_BACKEND="sync",
+    DATABASE_URL=f"sqlite:///{DB_PATH}",
+    ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{DB_PATH}",
+    LOCAL_DATA_DIR="data/raw-data",
+    OPENAI_API_KEY="",
+    OPENAI_MAX_RETRIES="0",
+    LANGCHAIN_TRACING_V2="false",
+    RESULT_CACHE_ENABLED="false",
+    INGEST_POLL_INTERVAL_SEC="0",
+    REQUEST_LOG_ENABLED="false",
+    PREWARM_ENABLED="false",
+    PROFILE_ENABLED="false",
+)
+
+
+@pytest.fixture(scope="session")
+def fake_llm_server():
+    from fake_llm import FakeLLM
+
+    server = FakeLLM()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_llm(fake_llm_server, monkeypatch):
+    """The fake server wired in as the app's LLM (fresh counters, no hedging). Tests close the shared client themselves,
+    inside the event loop its connections belong to (see test_llm_client.run)."""
+    from config import settings
+    from fake_llm import INTENT
+
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "openai_base_url", fake_llm_server.base_url)
+    monkeypatch.setattr(settings, "openai_hedge_after_sec", 0.0)
+    fake_llm_server.calls = 0
+    fake_llm_server.clients.clear()
+    fake_llm_server.delays = []
+    fake_llm_server.intent = dict(INTENT)
+    return fake_llm_server
@@ -0,0 +1,80 @@
+"""OpenAI-compatible chat completions server for tests: canned SQLRequest JSON, call and connection counts."""
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Any
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+INTENT = {
+    "version": "v1",
+    "dataset": "gov_jobs",
+    "metrics": [{"name": "amount", "agg": "avg"}],
+    "dimensions": ["jurisdiction", "grade"],
+    "filters": {"location": ["ventura"]},
+    "limit": 5,
+    "order_by": [],
+}
+
+
+class FakeLLM:
+    """Serves on 127.0.0.1:<port>/v1. delays[i] (seconds) holds back the i-th call; later calls answer at once."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.clients: set[tuple[str, int]] = set()  # distinct TCP connections seen
+        self.delays: list[float] = []
+        self.intent: dict[str, Any] = dict(INTENT)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        app = Starlette(routes=[
+            Route("/v1/chat/completions", self._chat, methods=["POST"]),
+            Route("/v1/models", self._models, methods=["GET"]),
+        ])
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def _chat(self, request: Request) -> JSONResponse:
+        i = self.calls
+        self.calls += 1
+        self.clients.add((request.client.host, request.client.port))
+        if i < len(self.delays):
+            await asyncio.sleep(self.delays[i])
+        return JSONResponse({
+            "id": f"fake-{i}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "fake",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(self.intent)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    async def _models(self, request: Request) -> JSONResponse:
+        self.clients.add((request.client.host, request.client.port))
+        return JSONResponse({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    def start(self) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake LLM server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
@@ -0,0 +1,56 @@
+"""Shared request grid and result comparison for the backend parity tests."""
+from __future__ import annotations
+
+import itertools
+from typing import Any
+
+from schemas import SQLRequest
+
+JURISDICTIONS = ["sanbernardino", "sdcounty", "ventura"]
+
+
+def request_grid() -> list[SQLRequest]:
+    """Every agg × grouping × location filter × title filter, ordered by the metric."""
+    return [
+        SQLRequest(
+            dataset="gov_jobs",
+            metrics=[{"name": "amount", "agg": agg}],
+            dimensions=dims,
+            filters={"location": loc, "job_title_contains": title},
+            limit=200,
+            order_by=[{"field": f"{agg}_amount", "dir": "desc"}],
+        )
+        for agg, dims, loc, title in itertools.product(
+            ["avg", "min", "max", "sum", "count"],
+            [[], ["jurisdiction"], ["jurisdiction", "title"], ["grade"], ["job_code", "code"]],
+            [None, JURISDICTIONS[:1], JURISDICTIONS],
+            [None, ["officer"], ["a_s"]],
+        )
+    ]
+
+
+def normalized(result: tuple[list[str], list[list[Any]], list[str]]) -> tuple[list[str], list[tuple]]:
+    """Columns and rows, numbers rounded (float / Decimal / int alike), row order ignored."""
+    columns, rows, _ = result
+
+    def value(v: Any) -> Any:
+        return round(float(v), 6) if isinstance(v, (int, float)) or hasattr(v, "as_tuple") else v
+
+    return columns, sorted((tuple(value(v) for v in r) for r in rows), key=repr)
+
+
+
+async def call_tool(name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+    """
+    Tool envelope for one call through FastMCP's tool manager (argument validation included). No HTTP session:
+    the app's streamable HTTP session manager runs once per process and benchmark's smoke test uses it.
+    """
+    import json
+
+    from mcp.types import CallToolResult
+
+    import main
+
+    result = await main.mcp.call_tool(name, arguments)
+    content = result.content if isinstance(result, CallToolResult) else result
+    return json.loads(content[0].text)
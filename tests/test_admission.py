@@ -0,0 +1,143 @@
+"""Admission control: bounded concurrency per stage, FIFO waits, and shedding when the queue is full or too slow."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import sql_runner
+from admission import Overloaded, StageLimiter
+from resilience import DeadlineExceeded, request_deadline
+from schemas import SQLRequest
+from support import call_tool
+
+
+def _hold(limiter: StageLimiter, release: asyncio.Event, order: list[int] | None = None, i: int = 0):
+    async def run() -> None:
+        async with limiter.slot():
+            if order is not None:
+                order.append(i)
+            await release.wait()
+    return asyncio.ensure_future(run())
+
+
+def test_concurrency_is_bounded_and_waiters_run_in_arrival_order():
+    async def scenario() -> tuple[list[int], int, dict]:
+        limiter = StageLimiter("t", limit=2, max_queue=10, max_wait_sec=5)
+        release, order = asyncio.Event(), []
+        tasks = [_hold(limiter, release, order, i) for i in range(6)]
+        await asyncio.sleep(0.01)
+        peak = limiter.in_flight
+        release.set()
+        await asyncio.gather(*tasks)
+        return order, peak, limiter.stats()
+
+    order, peak, stats = asyncio.run(scenario())
+    assert peak == 2 and order == list(range(6))
+    assert stats["admitted"] == 6 and stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_full_queue_sheds_immediately():
+    async def scenario() -> tuple[Overloaded, dict]:
+        limiter = StageLimiter("t", limit=1, max_queue=1, max_wait_sec=5)
+        release = asyncio.Event()
+        tasks = [_hold(limiter, release) for _ in range(2)]  # one holds the slot, one waits
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return shed.value, limiter.stats()
+
+    shed, stats = asyncio.run(scenario())
+    assert shed.as_dict()["reason"] == "queue_full" and 1 <= shed.retry_after_sec <= 60
+    assert stats["rejected_queue_full"] == 1 and stats["admitted"] == 2
+
+
+def test_queue_wait_is_limited():
+    async def scenario() -> dict:
+        limiter = StageLimiter("t", limit=1, max_queue=5, max_wait_sec=0.02)
+        release = asyncio.Event()
+        holder = _hold(limiter, release)
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue_timeout"):
+            async with limiter.slot():
+                pass
+        release.set()
+        await holder
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_queue_timeout"] == 1 and stats["queued"] == 0 and stats["in_flight"] == 0
+
+
+def test_exhausted_budget_is_a_deadline_not_overload():
+    async def scenario() -> None:
+        limiter = StageLimiter("t", limit=1, max_queue=5, max_wait_sec=5)
+        release = asyncio.Event()
+        holder = _hold(limiter, release)
+        await asyncio.sleep(0)
+        try:
+            with request_deadline(20), pytest.raises(DeadlineExceeded, match="t_queue"):
+                async with limiter.slot():
+                    pass
+        finally:
+            release.set()
+            await holder
+        assert limiter.rejected == {"queue_full": 0, "queue_timeout": 0}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario() -> dict:
+        limiter = StageLimiter("t", limit=1, max_queue=5, max_wait_sec=5)
+        release = asyncio.Event()
+        holder = _hold(limiter, release)
+        await asyncio.sleep(0)
+        waiter = _hold(limiter, release)
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["queued"] == 0 and stats["admitted"] == 1
+
+
+def test_zero_limit_disables_the_stage():
+    async def scenario() -> int:
+        limiter = StageLimiter("t", limit=0, max_queue=0, max_wait_sec=0)
+        release = asyncio.Event()
+        tasks = [_hold(limiter, release) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        return limiter.stats()["rejected_queue_full"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_saturated_database_sheds_sql_query(monkeypatch):
+    limiter = StageLimiter("db", limit=1, max_queue=0, max_wait_sec=1)
+    monkeypatch.setattr(sql_runner, "db_limiter", limiter)
+    request = {"dataset": "gov_jobs", "metrics": [{"name": "amount", "agg": "max"}], "dimensions": ["grade"]}
+
+    async def scenario() -> dict:
+        release = asyncio.Event()
+        holder = _hold(limiter, release)
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(Overloaded):
+                await sql_runner.run_request_async(SQLRequest.model_validate(request))
+            return await call_tool("sql_query", {"request": request})
+        finally:
+            release.set()
+            await holder
+
+    envelope = asyncio.run(scenario())
+    assert envelope["error"].startswith("Overloaded")
+    assert envelope["metadata"]["overloaded"]["stage"] == "db"
@@ -0,0 +1,46 @@
+"""DB_BACKEND=async (aiosqlite standing in for aiomysql) answers exactly like the sync backend."""
+from __future__ import annotations
+
+import asyncio
+
+from config import settings
+from db import dispose_async_engine, pool_stats
+from sql_runner import run_request, run_request_async
+from support import normalized, request_grid
+
+
+def _table(resp):
+    return normalized((resp.columns, resp.rows, resp.warnings))
+
+
+def test_async_backend_matches_sync(monkeypatch):
+    grid = request_grid()
+    expected = [run_request(req) for req in grid]
+    monkeypatch.setattr(settings, "db_backend", "async")
+
+    async def run():
+        try:
+            return [await run_request_async(req) for req in grid]
+        finally:
+            await dispose_async_engine()
+
+    got = asyncio.run(run())
+    assert all(resp.ok for resp in expected + got)
+    mismatches = [req for req, e, g in zip(grid, expected, got) if _table(e) != _table(g)]
+    assert not mismatches, f"{len(mismatches)} of {len(grid)} differ, e.g. {mismatches[0].model_dump_json()}"
+
+
+def test_async_backend_concurrent_calls_share_the_pool(monkeypatch):
+    monkeypatch.setattr(settings, "db_backend", "async")
+    grid = request_grid()[:20]  # within the db admission queue
+
+    async def run():
+        try:
+            return await asyncio.gather(*(run_request_async(req, f"r{i}") for i, req in enumerate(grid)))
+        finally:
+            await dispose_async_engine()
+
+    got = asyncio.run(run())
+    assert all(resp.ok for resp in got)
+    assert [_table(g) for g in got] == [_table(run_request(req)) for req in grid]
+    assert pool_stats()["checkouts"] > 0
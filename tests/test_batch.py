@@ -0,0 +1,108 @@
+"""Batch execution: identical requests run once, single-location variants run as one grouped query and split back."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import main
+from batch import run_batch
+from config import settings
+from schemas import SQLRequest, SQLResponse
+from sql_runner import run_request
+from support import JURISDICTIONS, call_tool, normalized
+
+
+def _req(location: str, agg: str = "avg", dims: list[str] | None = None, limit: int = 200, **extra) -> SQLRequest:
+    return SQLRequest(
+        dataset="gov_jobs",
+        metrics=[{"name": "amount", "agg": agg}],
+        dimensions=dims or [],
+        filters={"location": [location]},
+        limit=limit,
+        order_by=[{"field": f"{agg}_amount", "dir": "desc"}],
+        **extra,
+    )
+
+
+def _batch(reqs: list[SQLRequest]) -> tuple[list[SQLResponse], dict[str, int], list[SQLRequest]]:
+    ran: list[SQLRequest] = []
+
+    async def run(req: SQLRequest, request_id: str) -> SQLResponse:
+        ran.append(req)
+        return run_request(req, request_id=request_id)
+
+    responses, stats = asyncio.run(run_batch(reqs, "batch-test", run))
+    return responses, stats.as_dict(), ran
+
+
+def _rows(resp: SQLResponse):
+    return normalized((resp.columns, resp.rows, resp.warnings))
+
+
+def test_identical_requests_run_once():
+    req = _req("ventura")
+    responses, stats, ran = _batch([req, req, req])
+    assert len(ran) == 1 and stats["unique_requests"] == 1 and stats["db_queries"] == 1
+    assert [r.rows for r in responses] == [responses[0].rows] * 3
+
+
+@pytest.mark.parametrize("agg", ["avg", "min", "max", "sum", "count"])
+@pytest.mark.parametrize("dims", [[], ["title"], ["jurisdiction", "grade"]])
+def test_merged_answers_match_direct_runs(agg, dims):
+    reqs = [_req(loc, agg, dims) for loc in JURISDICTIONS + ["nowhere"]]
+    responses, stats, ran = _batch(reqs)
+    assert len(ran) == 1 and stats["merged_groups"] == 1
+    assert ran[0].filters.location == JURISDICTIONS + ["nowhere"]
+    for req, resp in zip(reqs, responses):
+        direct = run_request(req)
+        assert resp.ok and "merged_batch_query" in resp.warnings
+        assert _rows(resp) == _rows(direct), req.filters.location
+
+
+def test_member_limit_applies_after_the_split():
+    reqs = [_req(loc, dims=["title"], limit=1) for loc in JURISDICTIONS]
+    responses, stats, _ = _batch(reqs)
+    assert stats["merged_groups"] == 1
+    for req, resp in zip(reqs, responses):
+        assert resp.rows == run_request(req).rows
+
+
+def test_merged_query_at_the_row_cap_falls_back(monkeypatch):
+    monkeypatch.setattr(settings, "sql_max_limit", 3)
+    reqs = [_req(loc, dims=["title"]) for loc in JURISDICTIONS]
+    responses, stats, ran = _batch(reqs)
+    assert stats["merge_fallbacks"] == 1 and stats["merged_groups"] == 0
+    assert len(ran) == 1 + len(reqs)
+    for req, resp in zip(reqs, responses):
+        assert "merged_batch_query" not in resp.warnings
+        assert _rows(resp) == _rows(run_request(req))
+
+
+def test_approx_and_multi_location_requests_are_not_merged(monkeypatch):
+    monkeypatch.setattr(settings, "approx_enabled", False)  # runs exact without starting a sample build
+    reqs = [_req(loc, approx={}) for loc in JURISDICTIONS[:2]]
+    multi = _req("ventura")
+    reqs.append(multi.model_copy(update={"filters": multi.filters.model_copy(update={"location": JURISDICTIONS})}))
+    _, stats, ran = _batch(reqs)
+    assert stats["merged_groups"] == 0 and len(ran) == 3
+
+
+def test_sql_agent_batch_results_keep_their_own_request_ids(monkeypatch):
+    by_question = {f"avg pay in {loc}": _req(loc) for loc in JURISDICTIONS}
+
+    async def intent(question, request_id, session_id):
+        if question not in by_question:
+            raise ValueError("no intent")
+        return by_question[question], "bypass", "fast"
+
+    monkeypatch.setattr(main, "_intent", intent)
+    questions = list(by_question) + ["gibberish"]
+    envelope = asyncio.run(call_tool("sql_agent_batch", {"questions": questions, "request_id": "b"}))
+    assert envelope["metadata"]["request_id"] == "b" and envelope["metadata"]["batch"]["merged_groups"] == 1
+    results = envelope["data"]["results"]
+    assert [r["metadata"]["request_id"] for r in results] == ["b:0", "b:1", "b:2", "b:3"]
+    for question, result in zip(questions, results[:3]):
+        assert result["data"]["question"] == question
+        assert result["metadata"]["rows"] == run_request(by_question[question]).rows
+    assert results[3]["error"] == "ValueError: no intent"
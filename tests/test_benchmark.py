@@ -0,0 +1,55 @@
+"""Benchmark harness: intent stub, workload loading, regression comparison and an in-process smoke run."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import main
+from benchmark import compare, load_workload, run_benchmark, stub_request
+
+WORKLOAD = "bench/workload.jsonl"
+
+
+@pytest.mark.parametrize("question, agg, dims, location, limit", [
+    ("List 5 job titles in Ventura", "avg", ["jurisdiction", "title"], ["ventura"], 5),
+    ("Max pay by grade in San Bernardino", "max", ["jurisdiction", "grade"], ["sanbernardino"], 10),
+    ("How many salary steps in sdcounty", "count", ["jurisdiction", "title"], ["sdcounty"], 10),
+    ("Average pay for all jobs", "avg", ["jurisdiction", "title"], None, 10),
+])
+def test_stub_request(question, agg, dims, location, limit):
+    req = stub_request(question)
+    assert req["metrics"] == [{"name": "amount", "agg": agg}]
+    assert req["dimensions"] == dims
+    assert req["filters"]["location"] == location
+    assert req["limit"] == limit
+
+
+def test_load_workload_keeps_request_overrides(tmp_path):
+    path = tmp_path / "w.jsonl"
+    path.write_text('{"title": "Min pay in ventura"}\n\n{"question": "q", "sql_request": {"limit": 3}}\n')
+    assert load_workload(str(path)) == [
+        {"title": "Min pay in ventura", "question": "Min pay in ventura"},
+        {"question": "q", "sql_request": {"limit": 3}},
+    ]
+
+
+def _level(c: int, p50: float, p95: float, p99: float, rps: float) -> dict:
+    return {"concurrency": c, "latency_ms": {"p50": p50, "p95": p95, "p99": p99}, "throughput_rps": rps}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"levels": [_level(1, 10, 20, 30, 100), _level(8, 10, 20, 30, 400)]}
+    current = {"levels": [_level(1, 10.9, 25, 20, 95), _level(8, 5, 10, 15, 300), _level(32, 99, 99, 99, 1)]}
+    assert compare(current, baseline, 0.10) == ["c=1 p95: 20 → 25 ms", "c=8 throughput: 400 → 300 rps"]
+
+
+def test_smoke_run_answers_the_workload(monkeypatch):
+    monkeypatch.setattr(main, "question_to_sql_request_async", main.question_to_sql_request_async)  # the run stubs it
+    workload = load_workload(WORKLOAD)
+    report = asyncio.run(run_benchmark(workload, [1, 4], repeat=1, llm_ms=0.0, warmup=False))
+    assert [lvl["concurrency"] for lvl in report["levels"]] == [1, 4]
+    for lvl in report["levels"]:
+        assert lvl["requests"] == len(workload) and lvl["errors"] == 0
+        assert lvl["latency_ms"]["p50"] is not None and lvl["throughput_rps"] > 0
+        assert "execute" in lvl["server_stages_ms"]
@@ -0,0 +1,26 @@
+"""DB_BACKEND=local: the in-process columnar engine returns what build_sql returns on a database of the same CSVs."""
+from __future__ import annotations
+
+from columnar import execute_request, get_store
+from db import execute_query
+from sql_builder import build_sql
+from support import JURISDICTIONS, normalized, request_grid
+
+
+def test_store_loads_bundled_csvs():
+    store = get_store()
+    assert store.n_rows > 0
+    assert sorted(v for v in store.dims["jurisdiction"].values if v is not None) == JURISDICTIONS
+
+
+def test_local_engine_matches_sql():
+    mismatches = []
+    grid = request_grid()
+    for req in grid:
+        sql, params, _ = build_sql(req)
+        expected = normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit))
+        got = normalized(execute_request(req, limit=req.limit))
+        if expected != got:
+            mismatches.append((req.model_dump_json(), expected, got))
+    assert not mismatches, f"{len(mismatches)} of {len(grid)} differ; first: {mismatches[0]}"
+
@@ -0,0 +1,60 @@
+"""MySQL timeout hints: bucketed so per-request budgets do not make every statement text unique."""
+from __future__ import annotations
+
+import re
+
+import asyncio
+
+import db
+from config import settings
+from db import _with_timeout_hint
+from paging import stream_page
+from schemas import SQLRequest
+
+SQL = "SELECT AVG(s.amount) AS avg_amount FROM salaries s WHERE s.jurisdiction = :loc_0 LIMIT :row_limit"
+
+
+def _hinted_ms(sql: str) -> int:
+    return int(re.search(r"MAX_EXECUTION_TIME\((\d+)\)", sql).group(1))
+
+
+def test_session_default_and_other_dialects_get_no_hint():
+    assert _with_timeout_hint(SQL, "mysql", settings.sql_timeout_sec) == SQL
+    assert _with_timeout_hint(SQL, "sqlite", 0.25) == SQL
+
+
+def test_remaining_budgets_share_a_few_statement_texts():
+    budgets = [settings.sql_timeout_sec * i / 1000 for i in range(1, 1000)]
+    texts = {_with_timeout_hint(SQL, "mysql", t) for t in budgets}
+    assert len(texts) <= 16
+    for t in budgets:
+        hinted = _with_timeout_hint(SQL, "mysql", t)
+        assert hinted.endswith(SQL[len("SELECT "):])
+        ms = _hinted_ms(hinted)
+        assert ms <= t * 1000 < 2 * ms  # never longer than the budget, never less than half of it
+
+
+def test_tiny_budget_still_gets_a_positive_hint():
+    assert _hinted_ms(_with_timeout_hint(SQL, "mysql", 0.0001)) == 1
+
+
+def test_longer_timeouts_are_hinted_up():
+    for t in (settings.sql_timeout_sec + 0.5, settings.sql_timeout_sec * 3, settings.sql_stream_timeout_sec):
+        ms = _hinted_ms(_with_timeout_hint(SQL, "mysql", t))
+        assert t * 1000 <= ms < 2 * t * 1000  # never shorter than asked
+
+
+def test_export_stream_runs_under_the_stream_timeout_on_mysql(monkeypatch):
+    """Exports stream with SQL_STREAM_TIMEOUT_SEC, above the session default: MySQL must get a hint for it."""
+    hint = db._with_timeout_hint
+    hinted: list[str] = []
+
+    def as_mysql(sql, dialect, timeout_sec):
+        hinted.append(hint(sql, "mysql", timeout_sec))
+        return sql  # the statement itself still runs on the SQLite test database
+
+    monkeypatch.setattr(db, "_with_timeout_hint", as_mysql)
+    req = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "count"}], dimensions=["title"])
+    page = asyncio.run(stream_page(req, None, 10))
+    assert page.row_count > 0
+    assert len(hinted) == 1 and _hinted_ms(hinted[0]) >= settings.sql_stream_timeout_sec * 1000
@@ -0,0 +1,63 @@
+"""Columnar response encoding: lossless against the row format, dictionaries only where strings repeat."""
+from __future__ import annotations
+
+import asyncio
+import json
+from decimal import Decimal
+from typing import Any
+
+import pytest
+
+from encoding import dumps, encode_columnar, tool_result
+from sql_runner import run_request
+from support import call_tool, request_grid
+
+
+def decode(table: dict[str, Any]) -> list[list[Any]]:
+    columns = []
+    for name, values in zip(table["columns"], table["values"]):
+        d = table["dictionaries"].get(name)
+        columns.append([d[c] if d is not None and c is not None else c for c in values])
+    return [list(r) for r in zip(*columns)] if columns else []
+
+
+def test_repeated_strings_are_dictionary_encoded():
+    rows = [["ventura", "A", 1.5], ["ventura", "B", None], [None, "C", 2], ["sdcounty", "D", 3]]
+    table = encode_columnar(["jurisdiction", "title", "avg_amount"], rows)
+    assert table["dictionaries"] == {"jurisdiction": ["ventura", "sdcounty"]}
+    assert table["values"] == [[0, 0, None, 1], ["A", "B", "C", "D"], [1.5, None, 2, 3]]
+    assert table["row_count"] == 4 and decode(table) == rows
+
+
+def test_mixed_column_stays_plain():
+    rows = [["a", 1], ["a", 2], [7, 3], ["a", 4]]
+    table = encode_columnar(["code", "n"], rows)
+    assert table["dictionaries"] == {} and decode(table) == rows
+
+
+def test_empty_result():
+    assert encode_columnar(["avg_amount"], []) == {"columns": ["avg_amount"], "row_count": 0, "values": [[]],
+                                                   "dictionaries": {}}
+
+
+@pytest.mark.parametrize("req", request_grid()[::7])
+def test_round_trip_over_query_results(req):
+    resp = run_request(req)
+    assert resp.ok
+    assert decode(encode_columnar(resp.columns, resp.rows)) == resp.rows
+
+
+def test_decimals_serialize_as_strings():
+    assert json.loads(dumps({"v": Decimal("12.50")})) == {"v": "12.50"}
+    assert json.loads(tool_result({"rows": [[Decimal("1.0")]]}).content[0].text) == {"rows": [["1.0"]]}
+
+
+def test_columnar_tool_response_matches_rows():
+    request = {"dataset": "gov_jobs", "metrics": [{"name": "amount", "agg": "avg"}], "dimensions": ["jurisdiction", "title"],
+               "order_by": [{"field": "avg_amount", "dir": "desc"}]}
+    rows = asyncio.run(call_tool("sql_query", {"request": request}))
+    columnar = asyncio.run(call_tool("sql_query", {"request": request, "response_format": "columnar"}))
+    table = columnar["metadata"]["table"]
+    assert "rows" not in columnar["metadata"] and table["columns"] == rows["metadata"]["columns"]
+    assert decode(table) == rows["metadata"]["rows"]
+    assert "jurisdiction" in table["dictionaries"]
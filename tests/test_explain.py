@@ -0,0 +1,59 @@
+"""EXPLAIN cost gate: estimates on the active backend, under db admission control."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from admission import Overloaded, db_limiter
+from config import settings
+from db import dispose_async_engine, pool_stats
+from explain import cost_estimator
+from sql_runner import run_request_async
+from support import request_grid
+
+
+@pytest.fixture(autouse=True)
+def gate(monkeypatch):
+    monkeypatch.setattr(settings, "explain_gate", "reject")
+    monkeypatch.setattr(settings, "explain_max_rows", 1)
+    cost_estimator.clear()
+    yield
+    cost_estimator.clear()
+
+
+@pytest.mark.parametrize("backend", ["sync", "async"])
+def test_gate_rejects_on_either_backend(monkeypatch, backend):
+    monkeypatch.setattr(settings, "db_backend", backend)
+    req = request_grid()[0]
+    checkouts, explains = pool_stats()["checkouts"], cost_estimator.stats()["explains"]
+
+    async def run():
+        try:
+            return await run_request_async(req)
+        finally:
+            await dispose_async_engine()
+
+    resp = asyncio.run(run())
+    assert not resp.ok
+    assert any(w.startswith("cost_exceeded") for w in resp.warnings)
+    assert cost_estimator.stats()["explains"] == explains + 1
+    assert pool_stats()["checkouts"] == checkouts + 1  # EXPLAIN went through the timed pool checkout
+
+
+def test_explain_waits_for_a_db_slot(monkeypatch):
+    monkeypatch.setattr(settings, "db_backend", "async")
+    monkeypatch.setattr(db_limiter, "limit", 1)
+    monkeypatch.setattr(db_limiter, "in_flight", 1)  # the only slot is taken
+    monkeypatch.setattr(db_limiter, "max_queue", 0)
+    explains = cost_estimator.stats()["explains"]
+
+    async def run():
+        try:
+            return await run_request_async(request_grid()[0])
+        finally:
+            await dispose_async_engine()
+
+    with pytest.raises(Overloaded):
+        asyncio.run(run())
+    assert cost_estimator.stats()["explains"] == explains
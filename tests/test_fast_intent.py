@@ -0,0 +1,105 @@
+"""Fast-path intent parser: template questions → expected SQLRequests; everything else falls back to the LLM."""
+from __future__ import annotations
+
+import pytest
+
+import fast_intent
+from config import settings
+from fast_intent import fast_request, parse, set_jurisdictions
+from support import JURISDICTIONS
+
+
+@pytest.fixture(autouse=True)
+def vocabulary(monkeypatch):
+    monkeypatch.setattr(fast_intent, "_aliases", None)
+    monkeypatch.setattr(settings, "fast_intent_enabled", True)
+    set_jurisdictions(JURISDICTIONS)
+
+
+def _summary(question: str) -> dict | None:
+    req = fast_request(question)
+    if req is None:
+        return None
+    f = req.filters
+    return {
+        "aggs": [m.agg for m in req.metrics],
+        "dims": req.dimensions,
+        "location": f.location if f else None,
+        "titles": f.job_title_contains if f else None,
+        "limit": req.limit,
+        "order": [(o.field, o.dir) for o in req.order_by],
+    }
+
+
+def _expect(aggs, dims, location=None, titles=None, limit=None, order=()):
+    return {
+        "aggs": aggs,
+        "dims": dims,
+        "location": location,
+        "titles": titles,
+        "limit": limit or settings.default_limit,
+        "order": list(order),
+    }
+
+
+ANSWERED = [
+    ("List 5 job titles in Ventura", _expect(["avg"], ["jurisdiction", "title"], ["ventura"], limit=5)),
+    ("max pay by grade in San Bernardino", _expect(["max"], ["jurisdiction", "grade"], ["sanbernardino"])),
+    ("What is the average pay by grade in Ventura?", _expect(["avg"], ["jurisdiction", "grade"], ["ventura"])),
+    ("average salary for engineer in Ventura", _expect(["avg"], ["jurisdiction", "title"], ["ventura"], ["engineer"])),
+    ("average salary for deputy sheriff in san bernardino",
+     _expect(["avg"], ["jurisdiction", "title"], ["sanbernardino"], ["deputy sheriff"])),
+    ("lowest paid positions in san diego",
+     _expect(["min"], ["jurisdiction", "title"], ["sdcounty"], order=[("min_amount", "asc")])),
+    ("5 highest paid titles", _expect(["max"], ["jurisdiction", "title"], limit=5, order=[("max_amount", "desc")])),
+    ("what is the average salary of the 5 lowest paid titles in ventura",
+     _expect(["avg"], ["jurisdiction", "title"], ["ventura"], limit=5, order=[("avg_amount", "asc")])),
+    ("highest salary in ventura", _expect(["max"], ["jurisdiction"], ["ventura"])),
+    ("total salary by jurisdiction", _expect(["sum"], ["jurisdiction"])),
+]
+
+# Unsupported statistics, unused numbers and off-template questions must go to the LLM.
+FALLBACK = [
+    "what is the median salary in ventura",
+    "90th percentile of pay in sdcounty",
+    "what is the salary range in ventura",
+    "compare average salary in ventura and sdcounty",
+    "average salary in ventura in 2024",
+    "average salary in ventura for grade 3",
+    "tell me something interesting about these counties",
+    "average salary of jobs not in ventura",
+    "average salary for non engineer titles in ventura",
+    "average salary for non-engineer titles in ventura",
+    "max pay by grade without sdcounty",
+    "average salary excluding ventura",
+    "average salary in counties except ventura",
+    "average salary outside ventura",
+    "average salary in other counties than ventura",
+    "list 5 job titles in ventura that aren't engineer",
+    "",
+]
+
+
+@pytest.mark.parametrize("question, expected", ANSWERED)
+def test_answered(question, expected):
+    assert _summary(question) == expected
+
+
+@pytest.mark.parametrize("question", FALLBACK)
+def test_falls_back_to_llm(question):
+    assert fast_request(question) is None
+
+
+def test_named_aggregate_is_not_mixed_with_rank():
+    result = parse("what is the average salary of the 5 lowest paid titles in ventura")
+    assert [m.agg for m in result.request.metrics] == ["avg"]
+
+
+def test_no_vocabulary_means_no_fast_path(monkeypatch):
+    monkeypatch.setattr(fast_intent, "_aliases", None)
+    assert parse("max pay by grade in ventura") is None
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "fast_intent_enabled", False)
+    assert fast_request("max pay by grade in ventura") is None
@@ -0,0 +1,80 @@
+"""CSV ingest into a private copy of the test database: versions, skips, stale staging tables, racing ingests."""
+from __future__ import annotations
+
+import shutil
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+import ingest as ingest_mod
+from db import create_sync_engine, database_uri
+from ingest import ingest
+
+DATA_DIR = "data/raw-data"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    path = tmp_path / "ingest.db"
+    shutil.copyfile(make_url(database_uri()).database, path)
+    engine = create_sync_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(ingest_mod, "get_engine", lambda: engine)
+    yield engine
+    engine.dispose()
+
+
+def _versions(engine) -> list[tuple[int, str]]:
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(text("SELECT version, table_name FROM dataset_versions ORDER BY 1, 2"))]
+
+
+def test_first_load_then_unchanged_files_are_skipped(engine):
+    first = ingest(DATA_DIR)
+    assert first.version == 1 and sorted(first.loaded) == sorted(ingest_mod.TABLES)
+    again = ingest(DATA_DIR)
+    assert again.version == 1 and not again.loaded and sorted(again.skipped) == sorted(ingest_mod.TABLES)
+    assert ingest(DATA_DIR, force=True).version == 2
+    assert _versions(engine) == [(v, t) for v in (1, 2) for t in sorted(ingest_mod.TABLES)]
+
+
+def test_stale_staging_table_does_not_block_ingest(engine):
+    table = ingest_mod.TABLES[0]
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {table}__staging (leftover INTEGER)"))
+    assert ingest(DATA_DIR).version == 1
+    with engine.connect() as conn:
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar_one() > 0
+
+
+def test_version_recorded_meanwhile_is_not_reused(engine, monkeypatch):
+    """Another ingest records version 2 after this one read version 1 and before its swap: this load is version 3."""
+    ingest(DATA_DIR)
+    swap = ingest_mod._swap
+
+    def racing_swap(conn, tables, index_ddl):
+        with engine.begin() as other:
+            other.execute(text(
+                "INSERT INTO dataset_versions (version, table_name, source, checksum, row_count, loaded_at) "
+                "VALUES (2, 'racing', 'racing.csv', 'x', 0, 0)"
+            ))
+        swap(conn, tables, index_ddl)
+
+    monkeypatch.setattr(ingest_mod, "_swap", racing_swap)
+    assert ingest(DATA_DIR, force=True).version == 3
+
+
+def test_failed_swap_leaves_the_old_tables(engine, monkeypatch):
+    """The swap fails after its DROP TABLE: the rollback restores the old tables, and no version is recorded."""
+    ingest(DATA_DIR)
+    table = ingest_mod.TABLES[0]
+    with engine.begin() as conn:  # tells the old table apart from the reloaded export
+        conn.execute(text(f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table})"))
+    create_staging = ingest_mod._create_staging
+    monkeypatch.setattr(ingest_mod, "_create_staging",
+                        lambda conn, t, staging: create_staging(conn, t, staging) + ["CREATE INDEX broken"])
+    with pytest.raises(Exception):
+        ingest(DATA_DIR, force=True)
+    with engine.connect() as conn:
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar_one() == 1
+    assert {v for v, _ in _versions(engine)} == {1}
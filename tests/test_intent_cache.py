@@ -0,0 +1,117 @@
+"""IntentCache single-flight: one load per question, and a loading caller's failure or cancellation."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from intent_cache import IntentCache
+from schemas import SQLRequest
+
+REQ = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}], dimensions=["jurisdiction"])
+
+
+def _cache() -> IntentCache:
+    return IntentCache(max_entries=16, ttl_sec=60, max_question_chars=500)
+
+
+class Loader:
+    """Counts calls; each call waits for release (or delay seconds), then returns REQ or raises error."""
+
+    def __init__(self, delay: float = 0.05, error: Exception | None = None) -> None:
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self) -> SQLRequest:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return REQ
+
+
+def test_hit_after_miss_and_normalized_key():
+    async def run():
+        cache, load = _cache(), Loader()
+        first = await cache.get_or_load("Average pay in Ventura?", load)
+        second = await cache.get_or_load("  average PAY in ventura ", load)
+        return first[1], second[1], load.calls
+
+    assert asyncio.run(run()) == ("miss", "hit", 1)
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache, load = _cache(), Loader()
+        results = await asyncio.gather(*(cache.get_or_load("avg pay", load) for _ in range(5)))
+        return sorted(status for _, status in results), load.calls
+
+    statuses, calls = asyncio.run(run())
+    assert statuses == ["coalesced"] * 4 + ["miss"]
+    assert calls == 1
+
+
+def test_leader_error_reaches_followers_and_is_not_cached():
+    async def run():
+        cache, load = _cache(), Loader(error=ValueError("bad intent"))
+        results = await asyncio.gather(*(cache.get_or_load("avg pay", load) for _ in range(3)), return_exceptions=True)
+        load.error = None
+        retry = await cache.get_or_load("avg pay", load)
+        return results, retry[1], load.calls
+
+    results, retry_status, calls = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retry_status == "miss"
+    assert calls == 2
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def run():
+        cache, load = _cache(), Loader(delay=0.1)
+        leader = asyncio.create_task(cache.get_or_load("avg pay", load))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.get_or_load("avg pay", load)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        results = await asyncio.gather(*followers)
+        return results, load.calls, cache.reloads
+
+    results, calls, reloads = asyncio.run(run())
+    assert all(req == REQ for req, _ in results)
+    assert sorted(status for _, status in results) == ["coalesced", "coalesced", "miss"]
+    assert calls == 2  # the cancelled load plus one reload by a follower
+    assert reloads == 3
+
+
+def test_leader_deadline_does_not_bound_followers():
+    async def run():
+        cache, load = _cache(), Loader(delay=0.1)
+        short = asyncio.create_task(asyncio.wait_for(cache.get_or_load("avg pay", load), 0.02))
+        await asyncio.sleep(0.005)
+        long = asyncio.create_task(asyncio.wait_for(cache.get_or_load("avg pay", load), 5))
+        with pytest.raises(TimeoutError):
+            await short
+        return await long
+
+    req, status = asyncio.run(run())
+    assert req == REQ
+    assert status == "miss"
+
+
+def test_cancelled_follower_leaves_load_running():
+    async def run():
+        cache, load = _cache(), Loader(delay=0.05)
+        leader = asyncio.create_task(cache.get_or_load("avg pay", load))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(cache.get_or_load("avg pay", load))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader, load.calls
+
+    (req, status), calls = asyncio.run(run())
+    assert (req, status, calls) == (REQ, "miss", 1)
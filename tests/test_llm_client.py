@@ -0,0 +1,75 @@
+"""Shared async LLM client (keep-alive reuse, hedging) and the speculative DB checkout, against tests/fake_llm.py."""
+from __future__ import annotations
+
+import asyncio
+
+from config import settings
+from db import pool_stats
+from fake_llm import INTENT
+from orchestrator import close_llm, llm_stats, question_to_sql_request_async, warm_llm
+
+
+def run(coro_fn):
+    """asyncio.run(coro_fn()), closing the shared LLM client before its event loop goes away."""
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await close_llm()
+
+    return asyncio.run(main())
+
+
+def test_sequential_questions_reuse_one_connection(fake_llm):
+    async def call():
+        await warm_llm()  # opens the connection the questions then reuse
+        return [await question_to_sql_request_async(f"question {i}") for i in range(5)]
+
+    requests = run(call)
+    assert all(r.model_dump(exclude_none=True)["dimensions"] == INTENT["dimensions"] for r in requests)
+    assert fake_llm.calls == 5
+    assert len(fake_llm.clients) == 1
+
+
+def test_concurrent_questions_stay_within_the_connection_limit(fake_llm):
+    fake_llm.delays = [0.05] * 16
+
+    async def call():
+        return await asyncio.gather(*(question_to_sql_request_async(f"q{i}") for i in range(16)))
+
+    assert len(run(call)) == 16
+    assert fake_llm.calls == 16
+    assert len(fake_llm.clients) <= settings.openai_max_connections
+
+
+def test_hedged_call_answers_from_the_second_request(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "openai_hedge_after_sec", 0.05)
+    fake_llm.delays = [2.0]  # first call stalls; the hedge (second call) answers at once
+    hedge_wins = llm_stats()["hedge_wins"]
+
+    async def call():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        req = await question_to_sql_request_async("slow question")
+        return req, loop.time() - started
+
+    req, elapsed = run(call)
+    assert req.limit == INTENT["limit"]
+    assert elapsed < 1.0
+    assert fake_llm.calls == 2
+    assert llm_stats()["hedge_wins"] == hedge_wins + 1
+
+
+def test_llm_intent_primes_a_db_connection(fake_llm, monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "db_speculative_checkout", True)
+    primes = pool_stats()["primes"]
+
+    async def call():
+        req = await main._llm_intent("average pay by grade in ventura", "r1", None)
+        await asyncio.gather(*main._primes)
+        return req
+
+    assert run(call).dimensions == INTENT["dimensions"]
+    assert pool_stats()["primes"] == primes + 1
@@ -0,0 +1,88 @@
+"""Stage timings per request and the Prometheus /metrics exposition."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+
+import main
+from metrics import Counter, Histogram, record_request, render_prometheus, request_timings, stage, timings_ms
+from schemas import SQLRequest
+from sql_runner import run_request
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "test", "stage", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe("x", v)
+    assert h.render() == [
+        "# HELP t_seconds test",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="x",le="0.1"} 1',
+        't_seconds_bucket{stage="x",le="1.0"} 2',
+        't_seconds_bucket{stage="x",le="+Inf"} 3',
+        't_seconds_count{stage="x"} 3',
+        't_seconds_sum{stage="x"} 5.550000',
+    ]
+
+
+def test_counter_renders_per_label():
+    c = Counter("t_total", "test", "kind")
+    c.inc("b")
+    c.inc("a", 2)
+    c.inc("b")
+    assert c.render()[2:] == ['t_total{kind="a"} 2', 't_total{kind="b"} 2']
+
+
+def test_stages_add_up_per_request_and_reach_worker_threads():
+    def work() -> None:
+        with stage("execute"):
+            time.sleep(0.002)
+
+    async def call() -> dict[str, float]:
+        with request_timings() as timings:
+            with stage("build"):
+                pass
+            await asyncio.to_thread(work)
+            await asyncio.to_thread(work)
+        return timings
+
+    timings = asyncio.run(call())
+    assert set(timings) == {"build", "execute"} and timings["execute"] >= 4
+    with stage("execute"):  # outside a request: histogram only
+        pass
+
+
+def test_timings_ms_keeps_pipeline_order():
+    assert list(timings_ms({"custom": 1.0, "fetch": 2.0, "intent": 3.0, "build": 0.1234567})) == [
+        "intent", "build", "fetch", "custom"]
+    assert timings_ms({"build": 0.1234567}) == {"build": 0.123}
+
+
+def test_run_request_reports_its_stages():
+    req = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}], dimensions=["title"])
+    with request_timings() as timings:
+        assert run_request(req).ok
+    assert {"build", "checkout", "execute"} <= set(timings)
+
+
+def test_render_prometheus_keeps_numeric_gauges_only():
+    record_request("metrics_test", 0.01, error_kind="sql", truncated=True, cache_hits=("result",), intent_path="fast")
+    text = render_prometheus({"pool_size": 5, "ratio": 0.5, "ready": True, "name": "x", "nested": {"a": 1}})
+    assert 'sql_agent_requests_total{tool="metrics_test"}' in text
+    assert 'sql_agent_errors_total{kind="sql"}' in text
+    assert 'sql_agent_intent_paths_total{path="fast"}' in text
+    assert "pool_size 5\n" in text and "ratio 0.5\n" in text
+    assert "ready" not in text and "name x" not in text and "nested" not in text
+
+
+def test_metrics_endpoint():
+    async def get() -> httpx.Response:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/metrics")
+
+    resp = asyncio.run(get())
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE sql_agent_stage_seconds histogram" in resp.text
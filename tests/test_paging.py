@@ -0,0 +1,106 @@
+"""Keyset paging: pages concatenate to the full ordered result, also across NULL sort keys; tokens round-trip."""
+from __future__ import annotations
+
+import asyncio
+import shutil
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+import db
+from config import settings
+from paging import decode_token, encode_token, stream_page
+from schemas import SQLRequest
+from sql_builder import build_page_sql
+
+
+@pytest.fixture
+def nulls(tmp_path, monkeypatch):
+    """A copy of the test database with a NULL grade and a grade whose amounts are all NULL."""
+    path = tmp_path / "paging.db"
+    shutil.copyfile(make_url(db.database_uri()).database, path)
+    engine = db.create_sync_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        code = conn.execute(text("SELECT code FROM job_descriptions WHERE jurisdiction = 'ventura' LIMIT 1")).scalar_one()
+        for i, (grade, amount) in enumerate([(None, 10.0), (None, 20.0), ("99", None), ("98", None)]):
+            conn.execute(text("INSERT INTO salaries (id, jurisdiction, job_code, grade, amount) "
+                              "VALUES (:id, 'ventura', :code, :grade, :amount)"),
+                         {"id": 9000 + i, "code": code, "grade": grade, "amount": amount})
+    monkeypatch.setattr(db, "_engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def _req(dims: list[str], order_by: list[tuple[str, str]]) -> SQLRequest:
+    return SQLRequest(
+        dataset="gov_jobs",
+        metrics=[{"name": "amount", "agg": "avg"}],
+        dimensions=dims,
+        limit=500,
+        order_by=[{"field": f, "dir": d} for f, d in order_by],
+    )
+
+
+def _all_pages(req: SQLRequest, page_size: int) -> list[list]:
+    rows, after = [], None
+    for _ in range(100):
+        page = asyncio.run(stream_page(req, after, page_size))
+        rows.extend(page.rows)
+        if page.next_page_token is None:
+            return rows
+        token_req, after = decode_token(page.next_page_token)
+        assert token_req == req
+    raise AssertionError("paging did not finish")
+
+
+def _unpaged(req: SQLRequest) -> list[list]:
+    sql, params, _ = build_page_sql(req, None, 10_000)
+    return [list(r) for r in db.stream_query(sql, params, 30, 10_000) for r in r[1]]
+
+
+SHAPES = [
+    (["grade"], [("grade", "asc")]),
+    (["grade"], [("grade", "desc")]),
+    (["grade"], [("avg_amount", "asc")]),
+    (["grade"], [("avg_amount", "desc")]),
+    (["title", "grade"], [("avg_amount", "desc")]),
+    (["jurisdiction", "grade"], [("jurisdiction", "asc"), ("avg_amount", "asc")]),
+]
+
+
+@pytest.mark.parametrize("dims, order_by", SHAPES)
+@pytest.mark.parametrize("page_size", [1, 2, 5])
+def test_pages_cover_null_keys_in_order(nulls, dims, order_by, page_size):
+    req = _req(dims, order_by)
+    expected = _unpaged(req)
+    assert any(None in r for r in expected)
+    assert _all_pages(req, page_size) == expected
+
+
+@pytest.mark.parametrize("page_size", [1, 4])
+def test_pages_cover_the_bundled_data(page_size):
+    req = _req(["jurisdiction", "title"], [("avg_amount", "desc")])
+    expected = _unpaged(req)
+    assert len(expected) > page_size
+    assert _all_pages(req, page_size) == expected
+
+
+def test_page_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "sql_page_max_rows", 2)
+    page = asyncio.run(stream_page(_req(["title"], [("title", "asc")]), None, 50))
+    assert page.row_count == 2 and page.next_page_token is not None
+
+
+def test_token_round_trips_decimals_and_rejects_garbage():
+    req = _req(["grade"], [("avg_amount", "desc")])
+    after = [Decimal("12.50"), None, "x"]
+    assert decode_token(encode_token(req, after)) == (req, after)
+    with pytest.raises(ValueError, match="invalid page_token"):
+        decode_token("not-a-token")
+
+
+def test_token_keys_must_match_the_request():
+    with pytest.raises(ValueError, match="does not match"):
+        build_page_sql(_req(["grade"], [("grade", "asc")]), ["1", "extra"], 10)
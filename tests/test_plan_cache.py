@@ -0,0 +1,89 @@
+"""Plan cache: one compiled statement per query shape, reused across filter values and limits, bounded LRU."""
+from __future__ import annotations
+
+import pytest
+
+from config import settings
+from db import execute_query
+from schemas import SQLRequest
+from sql_builder import build_sql, clear_plan_cache, plan_cache_info, shape_of
+from support import normalized
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_plan_cache()
+    yield
+    clear_plan_cache()
+
+
+def _req(location: list[str] | None = None, limit: int = 200, dims: list[str] | None = None,
+         title: list[str] | None = None) -> SQLRequest:
+    return SQLRequest(
+        dataset="gov_jobs",
+        metrics=[{"name": "amount", "agg": "avg"}],
+        dimensions=dims if dims is not None else ["title"],
+        filters={"location": location, "job_title_contains": title},
+        limit=limit,
+        order_by=[{"field": "avg_amount", "dir": "desc"}],
+    )
+
+
+def _run(req: SQLRequest):
+    sql, params, _ = build_sql(req)
+    return normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit))
+
+
+def test_same_shape_reuses_the_plan_with_new_values():
+    before = plan_cache_info()
+    sql_a, params_a, _ = build_sql(_req(["ventura"], limit=5))
+    sql_b, params_b, _ = build_sql(_req(["sdcounty"], limit=50))
+    after = plan_cache_info()
+    assert sql_a == sql_b
+    assert (params_a["loc_0"], params_a["row_limit"]) == ("ventura", 5)
+    assert (params_b["loc_0"], params_b["row_limit"]) == ("sdcounty", 50)
+    assert after["misses"] - before["misses"] == 1 and after["hits"] - before["hits"] == 1
+    assert shape_of(_req(["ventura"])) == shape_of(_req(["sdcounty"], limit=7))
+
+
+@pytest.mark.parametrize("other", [
+    _req(["ventura", "sdcounty"]),  # location arity
+    _req(["ventura"], dims=["grade"]),
+    _req(["ventura"], title=["officer"]),
+])
+def test_different_shapes_get_their_own_plan(other):
+    build_sql(_req(["ventura"]))
+    before = plan_cache_info()["misses"]
+    build_sql(other)
+    assert plan_cache_info()["misses"] == before + 1
+    assert shape_of(other) != shape_of(_req(["ventura"]))
+
+
+def test_cached_plan_answers_like_a_fresh_one():
+    expected = _run(_req(["sanbernardino"]))
+    clear_plan_cache()
+    _run(_req(["ventura"]))  # compiles the shape with other values
+    assert _run(_req(["sanbernardino"])) == expected
+    assert expected[1]
+
+
+def test_cache_is_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(settings, "plan_cache_size", 2)
+    first, second, third = _req(dims=["title"]), _req(dims=["grade"]), _req(dims=["jurisdiction"])
+    for req in (first, second, first, third):  # touching first makes second the least recently used
+        build_sql(req)
+    assert plan_cache_info()["size"] == 2
+    misses = plan_cache_info()["misses"]
+    build_sql(first)
+    assert plan_cache_info()["misses"] == misses
+    build_sql(second)
+    assert plan_cache_info()["misses"] == misses + 1
+
+
+def test_invalid_shapes_are_not_cached():
+    bad = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}], dimensions=["title"],
+                     order_by=[{"field": "password", "dir": "asc"}])
+    for _ in range(2):
+        with pytest.raises(ValueError, match="order_by field not allowed"):
+            build_sql(bad)
+    assert plan_cache_info()["size"] == 0
@@ -0,0 +1,95 @@
+"""Opt-in profiler: off unless enabled, speedscope / collapsed files per call, worker stages sampled, old files pruned."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from contextlib import nullcontext
+
+import pytest
+
+import profiling
+from config import settings
+from metrics import stage
+from profiling import profile_call
+from support import call_tool
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profile_enabled", True)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_interval_ms", 1.0)
+    return tmp_path
+
+
+def _spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def _profiled_call(request_id: str, requested: bool = True) -> profiling.Profile | None:
+    with profile_call(request_id, "test_tool", requested) as prof:
+        _spin(0.03)
+
+        def worker() -> None:
+            with stage("execute"):
+                _spin(0.03)
+
+        await asyncio.to_thread(worker)
+        if prof is not None:
+            assert isinstance(profile_call("nested", "test_tool", True), nullcontext)  # one profile per call
+    return prof
+
+
+def test_disabled_profiler_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(settings, "profile_enabled", False)
+    assert isinstance(profile_call("r", "t", True), nullcontext)
+    assert asyncio.run(_profiled_call("r")) is None
+
+
+def test_speedscope_profile_covers_the_loop_and_worker_threads(enabled):
+    prof = asyncio.run(_profiled_call("call-1"))
+    assert prof.info() == {"path": str(enabled / "call-1.speedscope.json"), "format": "speedscope", "interval_ms": 1.0}
+    doc = json.loads((enabled / "call-1.speedscope.json").read_text())
+    names = [f["name"] for f in doc["shared"]["frames"]]
+    assert any(n.startswith("_spin ") for n in names) and "(worker)" in names
+    profile = doc["profiles"][0]
+    assert profile["type"] == "sampled" and len(profile["samples"]) == len(profile["weights"])
+    # one weight per thread stack in a tick: at least a tick per sample, more while loop and worker both ran
+    assert sum(profile["weights"]) >= prof.samples * settings.profile_interval_ms and profile["endValue"] >= 50
+    assert profiling.running == 0 and not prof._threads
+
+
+def test_collapsed_format_and_safe_file_names(enabled, monkeypatch):
+    monkeypatch.setattr(settings, "profile_format", "collapsed")
+    prof = asyncio.run(_profiled_call("../a b"))
+    assert prof.path == str(enabled / "_a_b.collapsed.txt")
+    lines = (enabled / "_a_b.collapsed.txt").read_text().splitlines()
+    assert all(line.startswith("test_tool;") and line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(";(worker);" in line for line in lines)
+
+
+def test_sample_rate_profiles_unrequested_calls(enabled, monkeypatch):
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    assert asyncio.run(_profiled_call("sampled", requested=False)) is not None
+    monkeypatch.setattr(settings, "profile_sample_rate", 0.0)
+    assert asyncio.run(_profiled_call("skipped", requested=False)) is None
+
+
+def test_oldest_profiles_are_pruned(enabled, monkeypatch):
+    monkeypatch.setattr(settings, "profile_max_files", 2)
+    (enabled / "notes.txt").write_text("not a profile")
+    for i in range(4):
+        asyncio.run(_profiled_call(f"p{i}"))
+        os.utime(enabled / f"p{i}.speedscope.json", (i, i))  # distinct, increasing mtimes
+    assert sorted(os.listdir(enabled)) == ["notes.txt", "p2.speedscope.json", "p3.speedscope.json"]
+
+
+def test_sql_query_profile_metadata(enabled):
+    request = {"dataset": "gov_jobs", "metrics": [{"name": "amount", "agg": "avg"}], "dimensions": ["title"]}
+    meta = asyncio.run(call_tool("sql_query", {"request": request, "request_id": "q-prof", "profile": True}))["metadata"]
+    assert meta["ok"] and meta["profile"]["path"] == str(enabled / "q-prof.speedscope.json")
+    assert os.path.exists(meta["profile"]["path"])
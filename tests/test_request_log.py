@@ -0,0 +1,139 @@
+"""Request log capture and rotation, the hot-query analyzer, and prewarming the caches from logged traffic."""
+from __future__ import annotations
+
+import asyncio
+import os
+
+import orjson
+import pytest
+
+import request_log as request_log_mod
+from config import settings
+from intent_cache import intent_cache
+from request_log import RequestLog, hot_queries, log_files, log_request, prewarm, read_records
+from schemas import SQLRequest, SQLResponse
+from sql_builder import shape_of
+from support import call_tool
+
+
+def _req(agg: str = "avg", location: str | None = None) -> SQLRequest:
+    return SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": agg}], dimensions=["title"],
+                      filters={"location": [location] if location else None})
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """A fresh log at a temporary path, enabled, as the module's request_log."""
+    path = str(tmp_path / "requests.jsonl")
+    monkeypatch.setattr(settings, "request_log_enabled", True)
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "request_log_path", path)
+    monkeypatch.setattr(settings, "request_log_backups", 2)
+    log = RequestLog(path, max_bytes=10**6, backups=2, queue_size=100)
+    monkeypatch.setattr(request_log_mod, "request_log", log)
+    yield log
+    log.close()
+
+
+def _record(tool: str, question: str | None, req: SQLRequest, fingerprint: str, path: str = "llm",
+            ok: bool = True) -> None:
+    resp = SQLResponse(ok=ok, fingerprint=fingerprint, row_count=1)
+    log_request(tool, "r", question, req, resp, path, {"execute": 1.0}, 0.01)
+
+
+def test_records_are_written_off_the_loop_with_normalized_questions(log):
+    _record("sql_agent", "  Average PAY, by title? ", _req(), "f1")
+    log.flush()
+    [record] = list(read_records())
+    assert record["question"] == "average pay by title"
+    assert record["request"]["metrics"] == [{"name": "amount", "agg": "avg"}]
+    assert "location" not in record["request"]["filters"]  # exclude_none
+    assert log.stats()["written"] == 1
+
+
+def test_disabled_or_unsampled_calls_are_not_recorded(log, monkeypatch):
+    monkeypatch.setattr(settings, "request_log_sample_rate", 0.0)
+    _record("sql_agent", "q", _req(), "f1")
+    monkeypatch.setattr(settings, "request_log_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "request_log_enabled", False)
+    _record("sql_agent", "q", _req(), "f1")
+    log.flush()
+    assert not os.path.exists(log.path) and log.stats()["written"] == 0
+
+
+def test_rotation_keeps_backups_oldest_first(log):
+    log.max_bytes = 300
+    for i in range(30):
+        _record("sql_query", None, _req(), f"f{i}")
+        log.flush()
+    assert log.rotations > 2
+    assert log_files() == [log.path + ".2", log.path + ".1", log.path]
+    fingerprints = [r["fingerprint"] for r in read_records()]
+    assert fingerprints == sorted(fingerprints, key=lambda f: int(f[1:])) and fingerprints[-1] == "f29"
+
+
+def test_no_backups_drops_the_old_file(tmp_path):
+    log = RequestLog(str(tmp_path / "r.jsonl"), max_bytes=1, backups=0, queue_size=10)
+    log._write([b"{}\n"])
+    log._write([b'{"a":1}\n'])
+    assert os.listdir(tmp_path) == ["r.jsonl"] and open(log.path).read() == '{"a":1}\n'
+
+
+def test_full_queue_drops_records(tmp_path):
+    log = RequestLog(str(tmp_path / "r.jsonl"), max_bytes=10**6, backups=1, queue_size=1)
+    log._thread = object()  # no writer: the queue fills
+    log.record({}, _req())
+    log.record({}, _req())
+    assert log.stats()["dropped"] == 1
+
+
+def test_truncated_lines_are_skipped(log):
+    with open(log.path, "wb") as f:
+        f.write(orjson.dumps({"tool": "sql_query"}) + b"\n" + b'{"tool": "sql_q')
+    assert list(read_records()) == [{"tool": "sql_query"}]
+
+
+def test_hot_queries_rank_questions_shapes_and_fingerprints(log):
+    for _ in range(3):
+        _record("sql_agent", "avg pay", _req(), "hot")
+    _record("sql_agent", "avg pay", _req(), "hot", path="cache")
+    _record("sql_agent", "max pay in ventura", _req("max", "ventura"), "cold")
+    _record("sql_agent", "fast one", _req("max", "sdcounty"), "warm", path="fast")
+    _record("sql_agent", "fast one", _req("max", "sdcounty"), "warm", path="fast")
+    log.flush()
+    hot = hot_queries(read_records(), top=2)
+    assert hot["records"] == 7 and hot["tools"] == {"sql_agent": 7}
+    assert [(q["question"], q["count"]) for q in hot["questions"]] == [("avg pay", 4), ("max pay in ventura", 1)]
+    assert [(f["fingerprint"], f["count"]) for f in hot["fingerprints"]] == [("hot", 4), ("warm", 2)]
+    assert [(s["shape"], s["count"]) for s in hot["shapes"]] == [(shape_of(_req()), 4), (shape_of(_req("max", "x")), 3)]
+
+
+def test_prewarm_fills_the_intent_cache_and_replays_successful_queries(log, monkeypatch):
+    monkeypatch.setattr(settings, "intent_cache_enabled", True)
+    intent_cache.clear()
+    _record("sql_agent", "Average pay?", _req(), "hot")
+    _record("sql_agent", "max pay in ventura", _req("max", "ventura"), "broken", ok=False)
+    _record("sql_query", None, _req("sum", "sdcounty"), "flaky")
+    log.flush()
+    ran: list[SQLRequest] = []
+
+    async def run(req: SQLRequest, request_id: str) -> SQLResponse:
+        ran.append(req)
+        if req.metrics[0].agg == "sum":
+            raise RuntimeError("database down")
+        return SQLResponse(ok=True, request_id=request_id)
+
+    out = asyncio.run(prewarm(run, top_n=10))
+    assert out == {"intents": 2, "results": 1, "failed": 1}
+    assert intent_cache.get("average pay") == _req()
+    assert sorted(r.metrics[0].agg for r in ran) == ["avg", "sum"]  # the failing fingerprint is not replayed
+    intent_cache.clear()
+
+
+def test_sql_query_calls_are_logged(log):
+    request = {"dataset": "gov_jobs", "metrics": [{"name": "amount", "agg": "count"}], "dimensions": ["grade"]}
+    asyncio.run(call_tool("sql_query", {"request": request, "request_id": "logged"}))
+    log.flush()
+    [record] = list(read_records())
+    assert (record["tool"], record["request_id"], record["intent_path"], record["ok"]) == ("sql_query", "logged", "direct", True)
+    assert record["fingerprint"] and record["timings_ms"]["execute"] > 0
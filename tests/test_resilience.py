@@ -0,0 +1,80 @@
+"""Database circuit breaker: only connectivity failures and timeouts count, not errors caused by the request."""
+from __future__ import annotations
+
+import pymysql
+import pytest
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+import sql_runner
+from config import settings
+from db import create_sync_engine, execute_query
+from db_router import _is_connectivity_error, is_db_failure
+from resilience import CircuitBreaker, CircuitOpen, db_breaker
+from schemas import SQLRequest
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh breaker with the db classifier that opens after 3 of 3 calls failed."""
+    monkeypatch.setattr(settings, "breaker_min_calls", 3)
+    monkeypatch.setattr(settings, "breaker_failure_ratio", 1.0)
+    return CircuitBreaker("db-test", 10.0, db_breaker.counts)
+
+
+def _mysql(errno: int, message: str) -> OperationalError:
+    return OperationalError("SELECT 1", {}, pymysql.err.OperationalError(errno, message))
+
+
+@pytest.mark.parametrize("error, connectivity, failure", [
+    (_mysql(2013, "Lost connection to MySQL server during query"), True, True),
+    (_mysql(2003, "Can't connect to MySQL server"), True, True),
+    (_mysql(1040, "Too many connections"), True, True),
+    (_mysql(3024, "maximum statement execution time exceeded"), False, True),
+    (_mysql(1054, "Unknown column 'x' in 'field list'"), False, False),
+    (ProgrammingError("SELECT", {}, pymysql.err.ProgrammingError(1064, "syntax error")), False, False),
+    (TimeoutError(), False, True),
+    (ValueError("fan-out over more than 10000 groups per shard"), False, False),
+])
+def test_error_classification(error, connectivity, failure):
+    assert _is_connectivity_error(error) is connectivity
+    assert is_db_failure(error) is failure
+
+
+def test_sql_errors_do_not_open_the_breaker(breaker):
+    for _ in range(10):
+        with pytest.raises(OperationalError):
+            with breaker.guard():
+                execute_query("SELECT no_such_column FROM salaries", {}, timeout_sec=5, limit=1)
+    assert breaker.state == "closed" and breaker.stats()["window_calls"] == 0
+
+
+def test_unreachable_database_opens_the_breaker(breaker, tmp_path):
+    engine = create_sync_engine(f"sqlite:///{tmp_path / 'missing' / 'down.db'}")
+    for _ in range(3):
+        with pytest.raises(OperationalError):
+            with breaker.guard():
+                execute_query("SELECT 1", {}, timeout_sec=5, limit=1, engine=engine)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        with breaker.guard():
+            pass
+
+
+def test_timeouts_open_the_breaker(breaker):
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            with breaker.guard():
+                raise TimeoutError
+    assert breaker.state == "open"
+
+
+def test_failed_request_is_not_held_against_the_database(monkeypatch):
+    def bad_query(req, sql, params, timeout_sec, limit):
+        return execute_query("SELECT no_such_column FROM salaries", params, timeout_sec=timeout_sec, limit=limit)
+
+    monkeypatch.setattr(sql_runner, "execute_routed", bad_query)
+    before = db_breaker.stats()
+    resp = sql_runner.run_request(SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}]))
+    assert not resp.ok
+    after = db_breaker.stats()
+    assert (after["window_calls"], after["window_failures"]) == (before["window_calls"], before["window_failures"])
@@ -0,0 +1,94 @@
+"""Rollup tables: build_sql routes covered shapes to them with the same answers, refreshes swap atomically."""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import inspect, text
+
+import rollups
+from config import settings
+from db import execute_query, get_engine
+from rollups import Rollup, _swap_statements, refresh_rollup, refresh_rollups
+from schemas import SQLRequest
+from sql_builder import build_sql, clear_plan_cache
+from support import normalized, request_grid
+
+GRAINS = "jurisdiction,title,grade,job_code;jurisdiction,grade"
+
+
+def _drop_rollup_tables() -> None:
+    with get_engine().begin() as conn:
+        for table in inspect(conn).get_table_names():
+            if table.startswith("rollup_"):
+                conn.execute(text(f"DROP TABLE {table}"))
+
+
+@pytest.fixture
+def active(monkeypatch):
+    monkeypatch.setattr(settings, "rollup_grains", GRAINS)
+    yield refresh_rollups()
+    monkeypatch.setattr(settings, "rollup_grains", "")
+    refresh_rollups()  # deactivates them and drops cached plans
+    _drop_rollup_tables()
+
+
+def _source(req: SQLRequest) -> str:
+    return next((w for w in build_sql(req)[2] if w.startswith("source:")), "source:base")
+
+
+def _run(req: SQLRequest):
+    sql, params, _ = build_sql(req)
+    return normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit))
+
+
+def test_refresh_reroutes_cached_plans(monkeypatch):
+    req = request_grid()[15]  # by jurisdiction
+    clear_plan_cache()
+    assert _source(req) == "source:base"
+    monkeypatch.setattr(settings, "rollup_grains", GRAINS)
+    try:
+        assert sorted(refresh_rollups()) == sorted(r.table for r in rollups.configured_rollups())
+        assert _source(req) == "source:rollup_gov_jobs__jurisdiction__grade"  # the smallest covering grain
+    finally:
+        monkeypatch.setattr(settings, "rollup_grains", "")
+        refresh_rollups()
+        _drop_rollup_tables()
+    assert _source(req) == "source:base"
+
+
+def test_rollup_answers_match_the_base_join(active):
+    grid = request_grid()
+    routed = []
+    for req in grid:
+        routed.append((_source(req), _run(req)))
+    assert {s for s, _ in routed} >= {"source:base", "source:rollup_gov_jobs__jurisdiction__grade",
+                                      "source:rollup_gov_jobs__jurisdiction__title__grade__job_code"}
+    rollups._active.clear()
+    clear_plan_cache()
+    mismatches = [(req.model_dump_json(), source) for req, (source, got) in zip(grid, routed) if _run(req) != got]
+    assert not mismatches, f"{len(mismatches)} of {len(grid)} differ; first: {mismatches[0]}"
+
+
+def test_uncovered_shapes_use_the_base_join(active):
+    by_code = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}], dimensions=["code"])
+    assert _source(by_code) == "source:base"
+    with_extra = SQLRequest(dataset="gov_jobs", metrics=[{"name": "amount", "agg": "avg"}], dimensions=["grade"],
+                            filters={"extra": {"step": "1"}})
+    assert _source(with_extra) == "source:base"
+
+
+def test_failed_refresh_keeps_the_previous_table(active, monkeypatch):
+    rollup = Rollup(dataset="gov_jobs", dims=("jurisdiction", "grade"))
+    with get_engine().begin() as conn:  # tells the previous table apart from a rebuilt one
+        conn.execute(text(f"DELETE FROM {rollup.table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {rollup.table})"))
+    monkeypatch.setattr(rollups, "_swap_statements", lambda *a: _swap_statements(*a) + ["CREATE INDEX broken"])
+    with pytest.raises(Exception):
+        refresh_rollup(rollup)
+    with get_engine().connect() as conn:
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {rollup.table}")).scalar_one() == 1
+        assert not inspect(conn).has_table(f"{rollup.table}__staging")
+
+
+def test_mysql_swap_clears_a_stale_old_table_first():
+    stmts = _swap_statements("mysql", "rollup_t", "rollup_t__staging")
+    assert stmts[0] == "DROP TABLE IF EXISTS rollup_t__old"
+    assert stmts.index("DROP TABLE IF EXISTS rollup_t__old") < next(i for i, s in enumerate(stmts) if "RENAME" in s)
@@ -0,0 +1,85 @@
+"""Approximate answers from a small stratified sample: estimates, and the warnings for what a sample can drop."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import sampling
+from config import settings
+from schemas import SQLRequest
+from sql_runner import run_request
+
+
+@pytest.fixture
+def sample(monkeypatch):
+    """Three rows per jurisdiction: every jurisdiction has more in the bundled data, so no stratum is sampled in full."""
+    monkeypatch.setattr(settings, "approx_sample_rows", 3)
+    monkeypatch.setattr(sampling, "_sample", None)
+    return sampling.build_sample()
+
+
+def _approx(dimensions: list[str], limit: int = 200) -> SQLRequest:
+    return SQLRequest(
+        dataset="gov_jobs",
+        metrics=[{"name": "amount", "agg": "avg"}],
+        dimensions=dimensions,
+        limit=limit,
+        order_by=[{"field": "avg_amount", "dir": "desc"}],
+        approx={},
+    )
+
+
+def test_sample_is_partial(sample):
+    assert bool((sample.taken < sample.population).all())
+
+
+def test_ungrouped_estimate_has_no_missing_group_warning(sample):
+    resp = run_request(_approx([]))
+    assert resp.ok and resp.row_count == 1
+    assert resp.warnings == ["approximate:stratified"]
+
+
+def test_grouped_estimate_warns_groups_may_be_missing(sample):
+    resp = run_request(_approx(["title"]))
+    assert resp.ok
+    assert "approx_groups_may_be_missing" in resp.warnings
+    assert "truncated_to_limit" not in resp.warnings
+
+
+def test_limit_truncation_is_reported(sample):
+    resp = run_request(_approx(["jurisdiction", "title"], limit=3))
+    assert resp.ok and resp.row_count == 3
+    assert len(resp.approx["intervals"]) == 3
+    assert "truncated_to_limit" in resp.warnings
+
+
+def test_full_sample_runs_exact(monkeypatch):
+    monkeypatch.setattr(settings, "approx_sample_rows", 10**7)
+    monkeypatch.setattr(sampling, "_sample", None)
+    sampling.build_sample()
+    resp = run_request(_approx(["title"]))
+    assert resp.ok and resp.approx is None
+    assert "approx_skipped:full_population" in resp.warnings
+
+
+def test_first_approx_request_builds_the_sample(monkeypatch):
+    monkeypatch.setattr(settings, "approx_sample_rows", 3)
+    monkeypatch.setattr(sampling, "_sample", None)
+    resp = run_request(_approx([]))
+    assert resp.ok and resp.approx is None
+    assert "approx_skipped:no_sample" in resp.warnings
+    for thread in threading.enumerate():
+        if thread.name == "approx-sample":
+            thread.join(timeout=10)
+    assert sampling.sample_stats()["built"]
+    resp = run_request(_approx([]))
+    assert resp.ok and resp.warnings == ["approximate:stratified"]
+
+
+def test_disabled_runs_exact_without_building(monkeypatch):
+    monkeypatch.setattr(settings, "approx_enabled", False)
+    monkeypatch.setattr(sampling, "_sample", None)
+    resp = run_request(_approx([]))
+    assert resp.ok and "approx_skipped:disabled" in resp.warnings
+    assert sampling.sample_stats() == {"built": False, "building": False}
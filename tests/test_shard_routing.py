@@ -0,0 +1,110 @@
+"""DB_SHARDS / DB_REPLICA_URLS over per-jurisdiction SQLite files: routed answers match the single database."""
+from __future__ import annotations
+
+import asyncio
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy.engine import make_url
+
+import db_router
+from config import settings
+from db import database_uri, dispose_async_engine, execute_query
+from db_router import execute_routed, get_router
+from sql_builder import build_sql
+from sql_runner import run_request_async
+from support import normalized, request_grid
+
+
+def _shard_copy(path: str, keep: list[str]) -> str:
+    """A copy of the test database holding only the rows of the keep jurisdictions."""
+    shutil.copyfile(make_url(database_uri()).database, path)
+    conn = sqlite3.connect(path)
+    try:
+        marks = ", ".join("?" for _ in keep)
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            if any(c[1] == "jurisdiction" for c in conn.execute(f"PRAGMA table_info({table})")):
+                conn.execute(f"DELETE FROM {table} WHERE jurisdiction NOT IN ({marks})", keep)
+        conn.commit()
+    finally:
+        conn.close()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture(scope="module")
+def shard_urls(tmp_path_factory):
+    d = tmp_path_factory.mktemp("shards")
+    return {
+        "default": _shard_copy(str(d / "sanbernardino.db"), ["sanbernardino"]),
+        "sdcounty": _shard_copy(str(d / "sdcounty.db"), ["sdcounty"]),
+        "ventura": _shard_copy(str(d / "ventura.db"), ["ventura"]),
+        # a file in a directory that does not exist: connecting fails like a server that is down
+        "down": f"sqlite:///{d / 'missing' / 'down.db'}",
+    }
+
+
+@pytest.fixture
+def routed(shard_urls, monkeypatch):
+    """sanbernardino on a replica of the default group (the full primary behind it), the others on their own shards."""
+    monkeypatch.setattr(settings, "db_replica_urls", shard_urls["default"])
+    monkeypatch.setattr(settings, "db_shards", f"sdcounty={shard_urls['sdcounty']};"
+                                               f"ventura={shard_urls['down']}|{shard_urls['ventura']}")
+    monkeypatch.setattr(db_router, "_router", None)
+    yield get_router()
+    monkeypatch.setattr(db_router, "_router", None)
+
+
+def test_routed_grid_matches_single_database(routed):
+    mismatches = []
+    grid = request_grid()
+    for req in grid:
+        sql, params, _ = build_sql(req)
+        expected = normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit))
+        got = normalized(execute_routed(req, sql, params, 30, req.limit))
+        if expected != got:
+            mismatches.append((req.model_dump_json(), expected, got))
+    assert not mismatches, f"{len(mismatches)} of {len(grid)} differ; first: {mismatches[0]}"
+    assert routed.fanouts > 0
+
+
+def test_fan_out_is_reported_and_single_shard_is_not(routed):
+    req = request_grid()[0]  # avg, no dimensions, all locations
+    sql, params, _ = build_sql(req)
+    assert execute_routed(req, sql, params, 30, req.limit)[2] == ["fanout:3"]
+    one = req.model_copy(update={"filters": req.filters.model_copy(update={"location": ["sdcounty"]})})
+    sql, params, _ = build_sql(one)
+    assert not any(w.startswith("fanout:") for w in execute_routed(one, sql, params, 30, one.limit)[2])
+
+
+def test_unreachable_copy_fails_over_and_is_marked_down(routed):
+    req = request_grid()[0]
+    req = req.model_copy(update={"filters": req.filters.model_copy(update={"location": ["ventura"]})})
+    sql, params, _ = build_sql(req)
+    for _ in range(3):
+        assert normalized(execute_routed(req, sql, params, 30, req.limit)) == normalized(
+            execute_query(sql, params, timeout_sec=30, limit=req.limit))
+    down, up = routed.stats()["groups"]["shard:ventura"]["backends"]
+    assert down["failures"] == 1 and not down["healthy"]  # skipped for the cooldown after the first failure
+    assert up["queries"] == 3
+
+
+def test_async_backend_routes_through_the_shards(routed, monkeypatch):
+    """DB_BACKEND=async with DB_SHARDS: execution goes through the router, not straight to the async primary."""
+    monkeypatch.setattr(settings, "db_backend", "async")
+    grid = request_grid()[::5]
+
+    async def run():
+        try:
+            return [await run_request_async(req) for req in grid]
+        finally:
+            await dispose_async_engine()
+
+    fanouts = routed.fanouts
+    for req, resp in zip(grid, asyncio.run(run())):
+        sql, params, _ = build_sql(req)
+        assert resp.ok
+        assert normalized((resp.columns, resp.rows, [])) == normalized(
+            execute_query(sql, params, timeout_sec=30, limit=req.limit))
+    assert routed.fanouts > fanouts
@@ -0,0 +1,70 @@
+"""sql_query / sql_query_bulk: SQLRequest in, same envelope as sql_agent, no intent stage."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from mcp.server.fastmcp.exceptions import ToolError
+
+import main
+from config import settings
+from schemas import SQLRequest
+from sql_runner import run_request
+from support import call_tool
+
+REQUEST = {"dataset": "gov_jobs", "metrics": [{"name": "amount", "agg": "avg"}], "dimensions": ["jurisdiction"],
+           "order_by": [{"field": "avg_amount", "dir": "desc"}]}
+
+
+@pytest.fixture(autouse=True)
+def no_intent(monkeypatch):
+    async def fail(*args, **kwargs):
+        raise AssertionError("structured tools must not extract an intent")
+
+    monkeypatch.setattr(main, "question_to_sql_request_async", fail)
+
+
+def _req(location: str) -> dict:
+    return {**REQUEST, "filters": {"location": [location]}}
+
+
+def test_sql_query_matches_run_request():
+    envelope = asyncio.run(call_tool("sql_query", {"request": REQUEST, "request_id": "q-1"}))
+    direct = run_request(SQLRequest.model_validate(REQUEST))
+    meta = envelope["metadata"]
+    assert envelope["error"] is None and envelope["data"]["question"] == ""
+    assert meta["ok"] and meta["request_id"] == "q-1" and meta["intent_path"] == "direct"
+    assert meta["rows"] == direct.rows and meta["sql"] == direct.query
+    assert "intent" not in meta["timings_ms"]
+
+
+def test_sql_query_reports_invalid_requests():
+    bad = {**REQUEST, "order_by": [{"field": "secret", "dir": "asc"}]}
+    meta = asyncio.run(call_tool("sql_query", {"request": bad}))["metadata"]
+    assert not meta["ok"] and any("order_by field not allowed" in w for w in meta["warnings"])
+    with pytest.raises(ToolError):
+        asyncio.run(call_tool("sql_query", {"request": {**REQUEST, "metrics": [{"name": "amount", "agg": "median"}]}}))
+
+
+def test_sql_query_bulk_answers_in_order_and_merges():
+    requests = [_req("ventura"), _req("sdcounty"), _req("ventura"), REQUEST]
+    envelope = asyncio.run(call_tool("sql_query_bulk", {"requests": requests, "request_id": "b"}))
+    batch = envelope["metadata"]["batch"]
+    assert batch["requests"] == 4 and batch["unique_requests"] == 3 and batch["merged_groups"] == 1
+    assert batch["db_queries"] == 2
+    results = envelope["data"]["results"]
+    assert [r["metadata"]["request_id"] for r in results] == ["b:0", "b:1", "b:2", "b:3"]
+    for req, result in zip(requests, results):
+        assert result["metadata"]["rows"] == run_request(SQLRequest.model_validate(req)).rows
+
+
+def test_sql_query_bulk_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_questions", 2)
+    envelope = asyncio.run(call_tool("sql_query_bulk", {"requests": [REQUEST] * 3}))
+    assert envelope["data"] is None and "at most 2 requests" in envelope["error"]
+
+
+def test_tools_advertise_the_request_schema():
+    tools = {t.name: t for t in asyncio.run(main.mcp.list_tools())}
+    assert "request" in tools["sql_query"].inputSchema["required"]
+    assert tools["sql_query_bulk"].inputSchema["properties"]["requests"]["type"] == "array"
@@ -0,0 +1,82 @@
+"""Warmup steps: critical ones gate readiness, failed ones retry in the background with backoff."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from config import settings
+from startup import Startup, Step
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "startup_retry_initial_sec", 0.01)
+    monkeypatch.setattr(settings, "startup_retry_max_sec", 0.02)
+
+
+def flaky(failures: int):
+    """A step that raises on its first `failures` runs."""
+    calls = []
+
+    async def run() -> None:
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("down")
+
+    return run
+
+
+def test_failed_critical_step_retries_until_ready():
+    startup = Startup()
+
+    async def main():
+        warming = await startup.run([Step("db", flaky(2), critical=True)])
+        assert not startup.ready and startup.steps["db"]["state"] == "retrying"
+        await warming
+
+    asyncio.run(main())
+    assert startup.ready
+    assert startup.steps["db"] == {"critical": True, "state": "ok", "ms": startup.steps["db"]["ms"], "attempts": 3,
+                                   "error": None}
+
+
+def test_background_steps_retry_only_when_asked():
+    startup = Startup()
+
+    async def main():
+        warming = await startup.run([
+            Step("db", flaky(0), critical=True),
+            Step("jurisdictions", flaky(1), retry=True),
+            Step("rollups", flaky(1)),
+        ])
+        assert startup.ready
+        await warming
+
+    asyncio.run(main())
+    assert startup.warm
+    assert (startup.steps["jurisdictions"]["state"], startup.steps["jurisdictions"]["attempts"]) == ("ok", 2)
+    assert (startup.steps["rollups"]["state"], startup.steps["rollups"]["attempts"]) == ("failed", 1)
+
+
+def test_cancelling_warmup_stops_retries():
+    startup = Startup()
+
+    async def main():
+        warming = await startup.run([Step("db", flaky(10**6), critical=True)])
+        await asyncio.sleep(0.05)
+        warming.cancel()
+        await asyncio.gather(warming, return_exceptions=True)
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
+    assert not startup.ready and startup.steps["db"]["attempts"] > 1
+
+
+def test_only_the_database_gates_readiness():
+    from main import _startup_steps
+
+    steps = {s.name: s for s in _startup_steps([])}
+    assert [n for n, s in steps.items() if s.critical] == ["db"]
+    assert steps["jurisdictions"].retry
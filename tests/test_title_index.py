@@ -0,0 +1,77 @@
+"""Trigram title index: job_title_contains served as (jurisdiction, code) keys, LIKE when the index cannot help."""
+from __future__ import annotations
+
+import pytest
+
+import title_index
+from config import settings
+from db import execute_query
+from schemas import SQLRequest
+from sql_builder import build_sql, clear_plan_cache
+from support import normalized, request_grid
+from title_index import build_title_index, clear_title_index
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(settings, "title_index_enabled", True)
+    clear_plan_cache()
+    yield build_title_index()
+    clear_title_index()
+    clear_plan_cache()
+
+
+def _titles(sub: str, location: list[str] | None = None) -> SQLRequest:
+    return SQLRequest(
+        dataset="gov_jobs",
+        metrics=[{"name": "amount", "agg": "avg"}],
+        dimensions=["jurisdiction", "title"],
+        filters={"location": location, "job_title_contains": [sub]},
+    )
+
+
+def _uses_index(req: SQLRequest) -> bool:
+    return any(k.startswith("tk_") for k in build_sql(req)[1])
+
+
+def test_location_matches_case_insensitively(index):
+    assert index.lookup(["officer"], ["Ventura"], 100) == index.lookup(["officer"], ["ventura"], 100) != []
+    sql, params, _ = build_sql(_titles("officer", ["VENTURA"]))
+    assert "1 = 0" not in sql
+    assert {v for k, v in params.items() if k.startswith("tk_j")} == {"ventura"}
+
+
+@pytest.mark.parametrize("sub", ["of", "a_s", "50%", "café"])
+def test_unindexable_substrings_keep_like(index, sub):
+    assert index.lookup([sub], None, 100) is None
+    assert not _uses_index(_titles(sub))
+
+
+def test_unselective_substring_keeps_like(index, monkeypatch):
+    assert _uses_index(_titles("officer"))
+    monkeypatch.setattr(settings, "title_index_max_keys", 1)
+    clear_plan_cache()
+    assert not _uses_index(_titles("officer"))
+
+
+def test_not_built_or_disabled_keeps_like(index, monkeypatch):
+    clear_title_index()
+    assert not _uses_index(_titles("officer"))
+    build_title_index()
+    monkeypatch.setattr(settings, "title_index_enabled", False)
+    assert not _uses_index(_titles("officer"))
+
+
+def test_indexed_grid_matches_like(index):
+    grid = [r for r in request_grid() if r.filters.job_title_contains]
+    with_index = []
+    for req in grid:
+        sql, params, _ = build_sql(req)
+        with_index.append(normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit)))
+    stats = title_index.title_index_stats()
+    assert stats["rewrites"] > 0
+    clear_title_index()
+    clear_plan_cache()
+    for req, expected in zip(grid, with_index):
+        sql, params, _ = build_sql(req)
+        assert normalized(execute_query(sql, params, timeout_sec=30, limit=req.limit)) == expected
@@ -0,0 +1,128 @@
+"""In-process trigram index over job titles: job_title_contains substrings → (jurisdiction, code) keys."""
+from __future__ import annotations
+
+import logging
+import threading
+import unicodedata
+from typing import Any, Iterable
+
+from sqlalchemy import text
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _norm(s: str) -> str:
+    """Case- and accent-folded form. Matches at least everything SQL LIKE matches (MySQL *_ai_ci, SQLite ASCII nocase)."""
+    decomposed = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TitleIndex:
+    """
+    Distinct titles with their trigram postings. lookup() returns a superset of the keys whose title LIKE
+    '%sub%'; callers keep the LIKE as a residual check, so results stay exact.
+    """
+
+    def __init__(self, rows: Iterable[tuple[str, str, str]]) -> None:
+        keys_by_title: dict[str, list[tuple[str, str]]] = {}
+        for jurisdiction, code, title in rows:
+            if jurisdiction is None or code is None or title is None:
+                continue
+            keys_by_title.setdefault(title, []).append((jurisdiction, code))
+        self.titles: list[str] = list(keys_by_title)
+        self.normed: list[str] = [_norm(t) for t in self.titles]
+        self.keys: list[list[tuple[str, str]]] = [keys_by_title[t] for t in self.titles]
+        self.postings: dict[str, set[int]] = {}
+        for i, t in enumerate(self.normed):
+            for g in _trigrams(t):
+                self.postings.setdefault(g, set()).add(i)
+        self.n_keys = sum(len(k) for k in self.keys)
+
+    def _title_ids(self, sub: str) -> set[int]:
+        s = _norm(sub)
+        grams = sorted(_trigrams(s), key=lambda g: len(self.postings.get(g, ())))
+        if not grams:
+            return set()
+        candidates = set(self.postings.get(grams[0], ()))
+        for g in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self.postings.get(g, set())
+        return {i for i in candidates if s in self.normed[i]}
+
+    def lookup(self, subs: list[str], locations: list[str] | None, max_keys: int) -> list[tuple[str, str]] | None:
+        """
+        Sorted (jurisdiction, code) keys with a title containing any of subs (within locations, if given).
+        None means "use LIKE": a substring shorter than 3 characters, containing LIKE wildcards or non-ASCII
+        text, or more than max_keys matching keys.
+        """
+        if any(len(s) < 3 or "%" in s or "_" in s or not s.isascii() for s in subs):
+            return None
+        # Case-insensitive, like jurisdiction IN (...) under MySQL's default collation (and columnar / batch).
+        allowed = {loc.casefold() for loc in locations} if locations else None
+        keys: set[tuple[str, str]] = set()
+        for sub in subs:
+            for i in self._title_ids(sub):
+                keys.update(k for k in self.keys[i] if allowed is None or k[0].casefold() in allowed)
+                if len(keys) > max_keys:
+                    return None
+        return sorted(keys)
+
+
+_index: TitleIndex | None = None
+_lock = threading.Lock()
+_stats = {"lookups": 0, "rewrites": 0, "fallbacks": 0}
+
+
+def build_title_index() -> TitleIndex:
+    """(Re)build from job_descriptions and install it. Call at startup and after every data reload."""
+    global _index
+    from db_router import query_each_shard
+
+    def load(engine: Any) -> list[Any]:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT DISTINCT jurisdiction, code, title FROM job_descriptions")).all()
+
+    index = TitleIndex(row for rows in query_each_shard(load) for row in rows)  # keys cover every shard
+    with _lock:
+        _index = index
+    logger.info("title index: %d titles, %d keys, %d trigrams", len(index.titles), index.n_keys, len(index.postings))
+    return index
+
+
+def clear_title_index() -> None:
+    """Drop the index (title filters use LIKE until the next build)."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def title_keys(subs: list[str], locations: list[str] | None) -> list[tuple[str, str]] | None:
+    """Keys for a job_title_contains filter, or None to keep the LIKE scan (index disabled, not built, unselective)."""
+    if not settings.title_index_enabled or settings.db_backend == "local":
+        return None
+    with _lock:
+        index = _index
+    if index is None:
+        return None
+    keys = index.lookup(subs, locations, settings.title_index_max_keys)
+    with _lock:
+        _stats["lookups"] += 1
+        _stats["rewrites" if keys is not None else "fallbacks"] += 1
+    return keys
+
+
+def title_index_stats() -> dict[str, Any]:
+    with _lock:
+        index = _index
+        out: dict[str, Any] = dict(_stats)
+    out["built"] = index is not None
+    if index is not None:
+        out.update(titles=len(index.titles), keys=index.n_keys, trigrams=len(index.postings))
+    return out